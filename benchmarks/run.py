@@ -0,0 +1,353 @@
+"""Offline micro-benchmarks for the bot's hot paths
+
+Speeds are compared as ratios to a fixed pure-Python reference workload
+measured in the same run, so baseline.json holds across machines.
+
+    python -m benchmarks.run                # run and compare with baseline.json
+    python -m benchmarks.run --save         # run and overwrite the baseline
+    python -m benchmarks.run -k fsm         # only benchmarks whose name contains "fsm"
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+# Everything runs against local fakes: dummy credentials, state files in a temp dir
+TMP_DIR = tempfile.mkdtemp(prefix="bot-bench-")
+for name, value in {
+    "BOT_TOKEN": "1:bench",
+    "OPENAI_API_KEY": "bench",
+    "RUNWAY_API_KEY": "bench",
+    "OPENAI_RERANK": "0",
+    "FSM_SQLITE_PATH": os.path.join(TMP_DIR, "fsm.sqlite3"),
+    "VIDEO_CACHE_PATH": os.path.join(TMP_DIR, "video_cache.sqlite3"),
+    "VIDEO_QUEUE_PATH": os.path.join(TMP_DIR, "video_jobs.sqlite3"),
+    "GEOCODE_CACHE_PATH": "",
+    "PASTVU_CACHE_PATH": "",
+}.items():
+    os.environ[name] = value
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from bot.keyboards import inline
+from bot.services import openai_service
+from bot.services.openai_service import OpenAIService
+from bot.services.pastvu import PastVuAPI
+from bot.services.photo_store import PhotoStore
+from bot.utils import progress
+from bot.utils.edit_scheduler import EditScheduler
+from bot.utils.fsm_storage import SQLiteStorage
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Each benchmark runs for about this long
+TARGET_SECONDS = 0.5
+# Single-op runs used to measure peak memory per operation
+MEMORY_SAMPLES = 20
+
+Operation = Callable[[], Union[None, Awaitable[None]]]
+
+# Progress benchmarks share one scheduler without rate limits
+FAST_SCHEDULER = EditScheduler(rate=1e9, chat_interval=0)
+
+TITLES = [
+    "Вид на Кремль с Москворецкого моста",
+    "Тверская улица, дом Моссовета",
+    "Портрет неизвестной женщины",
+    "Трамвай на Арбатской площади",
+    "Церковь Николая Чудотворца",
+    "Интерьер квартиры",
+    "Набережная и пароход у пристани",
+    "Группа рабочих у завода",
+]
+
+
+def make_photos(count: int = 30, seed: int = 1) -> List[Dict[str, Any]]:
+    """PastVu-shaped photos around central Moscow"""
+    rng = random.Random(seed)
+    photos = []
+    for i in range(count):
+        year = rng.randint(1860, 1960)
+        photos.append({
+            "cid": 100000 + i,
+            "geo": [55.75 + rng.uniform(-0.01, 0.01), 37.61 + rng.uniform(-0.01, 0.01)],
+            "year": year,
+            "year2": year + rng.randint(0, 5),
+            "title": rng.choice(TITLES),
+            "file": f"{i:x}/{i:x}/{i:08x}.jpg",
+            "dir": "n",
+        })
+    return photos
+
+
+class FakeMessage:
+    """Just enough of aiogram's Message for the edit scheduler"""
+    
+    class Chat:
+        def __init__(self, chat_id: int):
+            self.id = chat_id
+    
+    def __init__(self, chat_id: int = 1, message_id: int = 1):
+        self.chat = self.Chat(chat_id)
+        self.message_id = message_id
+    
+    async def edit_text(self, text: str):
+        return None
+
+
+class FakeOpenAIClient:
+    """Returns a fixed answer without touching the network"""
+    
+    class _Completions:
+        async def create(self, **kwargs):
+            message = type("Message", (), {"content": " 1 "})()
+            choice = type("Choice", (), {"message": message})()
+            return type("Response", (), {"choices": [choice]})()
+    
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": self._Completions()})()
+
+
+# --- benchmarks -------------------------------------------------------------
+
+def bench_reference() -> Operation:
+    """Fixed interpreter workload every other speed is divided by"""
+    photos = make_photos(10)
+    
+    def op():
+        for photo in photos:
+            words = sorted(photo["title"].lower().split())
+            json.dumps({"cid": photo["cid"], "words": words})
+    return op
+
+
+def bench_progress_frames() -> Operation:
+    """One animation frame through ProgressAnimator and the edit scheduler"""
+    progress.edit_scheduler = FAST_SCHEDULER
+    animator = progress.ProgressAnimator()
+    animator.prepare_progress_text("🔍 Ищу исторические фотографии")
+    message = FakeMessage()
+    
+    async def op():
+        await animator.update_animation_frame(message)
+    return op
+
+
+def bench_percentage_frames() -> Operation:
+    """One percentage frame, prepared afresh each time"""
+    progress.edit_scheduler = FAST_SCHEDULER
+    animator = progress.PercentageProgressAnimator()
+    message = FakeMessage()
+    state = {"percentage": 0}
+    
+    async def op():
+        state["percentage"] = (state["percentage"] + 1) % 100
+        animator.prepare_percentage_text("⏳ Создаю видео", state["percentage"])
+        await animator.update_percentage(state["percentage"])
+        await animator.update_animation_frame_with_percentage(message)
+    return op
+
+
+def bench_rank_photos() -> Operation:
+    """Local ranking of 30 candidates with exclusions"""
+    photos = make_photos()
+    excluded = [photo["cid"] for photo in photos[::5]]
+    
+    async def op():
+        await OpenAIService.rank_photos(photos, excluded, 55.75, 37.61)
+    return op
+
+
+def bench_rerank_prompt() -> Operation:
+    """Re-rank prompt building and answer parsing against a fake client"""
+    openai_service._client = FakeOpenAIClient()
+    top = make_photos(5)
+    
+    async def op():
+        await OpenAIService.rerank_with_llm(top)
+    return op
+
+
+def bench_pastvu_parse() -> Operation:
+    """Decode a giveNearestPhotos response and intern its records"""
+    payload = json.dumps({"result": {"photos": make_photos(30)}}, ensure_ascii=False).encode("utf-8")
+    store = PhotoStore(max_records=1000)
+    
+    def op():
+        store.add_many(PastVuAPI.parse_nearest_response(payload))
+    return op
+
+
+def _fsm_cycle(storage) -> Operation:
+    key = StorageKey(bot_id=1, chat_id=42, user_id=42)
+    cids = [photo["cid"] for photo in make_photos()]
+    
+    async def op():
+        data = await storage.get_data(key)
+        cursor = data.get("photo_cursor", 0) + 1
+        await storage.set_data(key, {
+            "latitude": 55.75,
+            "longitude": 37.61,
+            "photo_queue": cids,
+            "photo_cursor": cursor % len(cids),
+            "current_cid": cids[cursor % len(cids)],
+        })
+        await storage.get_state(key)
+    return op
+
+
+def bench_fsm_memory() -> Operation:
+    """FSM read/update cycle on MemoryStorage"""
+    return _fsm_cycle(MemoryStorage())
+
+
+def bench_fsm_sqlite() -> Operation:
+    """FSM read/update cycle on the SQLite storage"""
+    return _fsm_cycle(SQLiteStorage(os.path.join(TMP_DIR, "bench_fsm.sqlite3"), session_ttl=3600))
+
+
+def bench_keyboards() -> Operation:
+    """Build every keyboard in bot/keyboards/inline.py"""
+    def op():
+        inline.get_location_keyboard()
+        inline.get_simple_location_keyboard()
+        inline.get_location_options_keyboard(55.7539, 37.6208)
+        inline.get_photo_actions_keyboard()
+    return op
+
+
+BENCHMARKS = {
+    "progress_frames": bench_progress_frames,
+    "percentage_frames": bench_percentage_frames,
+    "rank_photos": bench_rank_photos,
+    "rerank_prompt": bench_rerank_prompt,
+    "pastvu_parse": bench_pastvu_parse,
+    "fsm_memory": bench_fsm_memory,
+    "fsm_sqlite": bench_fsm_sqlite,
+    "keyboards": bench_keyboards,
+}
+
+
+# --- runner -----------------------------------------------------------------
+
+def run_ops(loop: asyncio.AbstractEventLoop, op: Operation, count: int) -> float:
+    """Run op count times, return elapsed seconds"""
+    if asyncio.iscoroutinefunction(op):
+        async def batch():
+            for _ in range(count):
+                await op()
+        started = time.perf_counter()
+        loop.run_until_complete(batch())
+    else:
+        started = time.perf_counter()
+        for _ in range(count):
+            op()
+    return time.perf_counter() - started
+
+
+def measure(loop: asyncio.AbstractEventLoop, factory: Callable[[], Operation]) -> Dict[str, float]:
+    """ops/s (best of 5 runs) and median peak bytes allocated by one op"""
+    op = factory()
+    
+    # Warm up and calibrate the batch size
+    count = 1
+    while run_ops(loop, op, count) < TARGET_SECONDS / 10:
+        count *= 2
+    count = max(1, int(count * TARGET_SECONDS / 3 / max(run_ops(loop, op, count), 1e-9)))
+    
+    ops_per_sec = max(count / run_ops(loop, op, count) for _ in range(5))
+    
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            run_ops(loop, op, 1)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    
+    return {"ops_per_sec": round(ops_per_sec, 1), "peak_bytes": int(statistics.median(peaks))}
+
+
+def compare(name: str, result: Dict[str, float], baseline: Optional[Dict[str, float]], tolerance: float) -> List[str]:
+    """Regression messages for one benchmark"""
+    if not baseline:
+        return []
+    problems = []
+    if result["relative"] < baseline["relative"] * (1 - tolerance):
+        problems.append(
+            f"{name}: {result['relative']:.4f}x reference, baseline {baseline['relative']:.4f}x"
+        )
+    # Small absolute slack so a few bytes of noise don't fail tiny benchmarks
+    if result["peak_bytes"] > baseline["peak_bytes"] * (1 + tolerance) + 512:
+        problems.append(
+            f"{name}: {result['peak_bytes']} B/op, baseline {baseline['peak_bytes']} B/op"
+        )
+    return problems
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative slowdown / memory growth")
+    args = parser.parse_args(argv)
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    problems = []
+    
+    print(f"{'benchmark':<20} {'ops/s':>12} {'x ref':>9} {'B/op':>9} {'vs baseline':>12}")
+    for name, factory in BENCHMARKS.items():
+        if args.pattern not in name:
+            continue
+        # Measured next to each benchmark so the ratio cancels out load changes during the run
+        reference = measure(loop, bench_reference)["ops_per_sec"]
+        result = measure(loop, factory)
+        relative = result.pop("ops_per_sec") / reference
+        result["relative"] = round(relative, 4)
+        results[name] = result
+        previous = baseline.get(name)
+        change = f"{relative / previous['relative'] - 1:+.0%}" if previous else "new"
+        print(f"{name:<20} {relative * reference:>12,.0f} {relative:>9.4f} {result['peak_bytes']:>9} {change:>12}")
+        problems.extend(compare(name, result, previous, args.tolerance))
+    
+    # Stop background loops the benchmarks started (edit schedulers)
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+    
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+    
+    if problems:
+        print("\nPERFORMANCE REGRESSION:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import importlib
+from typing import Optional
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from bot.utils.config import BOT_TOKEN, TELEGRAM_API_URL, LOOP_MONITOR
+from bot.handlers import location, photo, video
+from bot.services.http_client import HTTPClient
+from bot.services.image_preflight import ImagePreflight
+from bot.services.media_cache import media_cache
+from bot.services.openai_service import close_client as close_openai_client
+from bot.services.runway import RunwayAPI
+from bot.services.video_queue import video_queue
+from bot.utils.edit_scheduler import edit_scheduler
+from bot.utils.admission import AdmissionMiddleware
+from bot.utils.fsm_storage import create_storage
+from bot.utils.loop_monitor import HandlerBudgetMiddleware, loop_monitor
+from bot.utils.metrics import HandlerTimingMiddleware, TelegramMetricsMiddleware
+
+# Background import of the OpenAI SDK started by start_services
+_openai_import: Optional[asyncio.Future] = None
+
+
+def create_bot() -> Bot:
+    """Bot with default properties and Bot API call timing"""
+    bot = Bot(
+        token=BOT_TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher with configured FSM storage and all routers"""
+    dp = Dispatcher(storage=create_storage())
+    dp.include_router(location.router)
+    dp.include_router(photo.router)
+    dp.include_router(video.router)
+    
+    # Throttling and load shedding, then handler timing and time budget;
+    # inner middlewares apply to handlers of all included routers
+    dp.message.middleware(AdmissionMiddleware())
+    dp.callback_query.middleware(AdmissionMiddleware())
+    dp.message.middleware(HandlerTimingMiddleware())
+    dp.callback_query.middleware(HandlerTimingMiddleware())
+    dp.message.middleware(HandlerBudgetMiddleware(loop_monitor))
+    dp.callback_query.middleware(HandlerBudgetMiddleware(loop_monitor))
+    return dp
+
+
+async def start_services(bot: Bot, run_video_queue: bool = True):
+    """Open shared clients and start background workers"""
+    global _openai_import
+    # Open shared connection pool for outbound API calls
+    await HTTPClient.start()
+    ImagePreflight.start(warm=run_video_queue)
+    
+    # Index the media cache and read the location grid off the event loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, media_cache.load)
+    await loop.run_in_executor(None, location.location_sampler.load)
+    
+    # Watch for blocking calls on the event loop
+    if LOOP_MONITOR:
+        loop_monitor.start()
+    
+    # Start video workers, resuming jobs interrupted by the last shutdown
+    if run_video_queue:
+        video_queue.start(functools.partial(video.run_video_job, bot))
+    
+    # Import the OpenAI SDK off the event loop so the first request doesn't pay for it
+    _openai_import = loop.run_in_executor(None, importlib.import_module, "openai")
+
+
+async def stop_services(bot: Bot):
+    """Stop background workers and close shared clients"""
+    global _openai_import
+    # The import can't be interrupted; let it finish before the loop goes away
+    if _openai_import is not None:
+        try:
+            await _openai_import
+        except ImportError as e:
+            print(f"OpenAI SDK pre-import failed: {e}")
+        _openai_import = None
+    await video_queue.stop()
+    await loop_monitor.stop()
+    await RunwayAPI.poller.stop()
+    await edit_scheduler.stop()
+    await HTTPClient.close()
+    ImagePreflight.shutdown()
+    await close_openai_client()
+    await bot.session.close()
\ No newline at end of file
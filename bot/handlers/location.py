@@ -5,11 +5,13 @@ import json
 from bot.states.user_states import UserStates
 from bot.keyboards.inline import get_location_keyboard, get_location_options_keyboard, get_simple_location_keyboard
 from bot.handlers.photo import process_location
+from bot.services.location_sampler import LocationSampler
 from bot.services.openai_service import OpenAIService
 from bot.utils.progress import ProgressAnimator
-import random
+from bot.utils.config import LOCATION_GRID_PATH, LOCATION_EMPTY_TTL
 
 router = Router()
+location_sampler = LocationSampler(LOCATION_GRID_PATH, LOCATION_EMPTY_TTL)
 
 
 @router.message(F.text == "/start")
@@ -36,12 +38,11 @@ async def handle_address_input(message: Message, state: FSMContext):
     )
 
 
-@router.message(F.text == "🎲 Случайная локация")
+@router.message(F.text == "🎲 Случайная локация", flags={"admission": "search"})
 async def handle_random_location(message: Message, state: FSMContext):
-    """Generate random location coordinates"""
-    lat = random.uniform(-90, 90)
-    lon = random.uniform(-180, 180)
-    await state.update_data(latitude=lat, longitude=lon, shown_photos=[])
+    """Pick a random location, weighted towards places with photos"""
+    lat, lon = location_sampler.sample()
+    await state.update_data(latitude=lat, longitude=lon)
     await state.set_state(UserStates.selecting_photo)
     await message.answer_venue(
         latitude=lat,
@@ -54,12 +55,15 @@ async def handle_random_location(message: Message, state: FSMContext):
         message,
         "🔍 Ищу исторические фотографии"
     )
-    await animator.animate_until_complete(
+    found = await animator.animate_until_complete(
         progress_msg,
         process_location(message, state, lat, lon),
         update_interval=0.5
     )
     await progress_msg.delete()
+    # Only a real empty answer marks the cell; an upstream error says nothing about it
+    if found is False:
+        location_sampler.mark_empty(lat, lon)
 
 
 @router.message(F.location)
@@ -83,7 +87,7 @@ async def handle_location(message: Message, state: FSMContext):
     )
 
 
-@router.message(F.web_app_data)
+@router.message(F.web_app_data, flags={"admission": "search"})
 async def handle_web_app_data(message: Message, state: FSMContext):
     """Handle data from Web App (map location picker)"""
     try:
@@ -93,7 +97,7 @@ async def handle_web_app_data(message: Message, state: FSMContext):
         lon = data["longitude"]
         
         # Update state with location data
-        await state.update_data(latitude=lat, longitude=lon, shown_photos=[])
+        await state.update_data(latitude=lat, longitude=lon)
         await state.set_state(UserStates.selecting_photo)
         
         # Send the location as a venue to show on Telegram's map
@@ -139,7 +143,7 @@ async def handle_new_location_from_photo(callback: CallbackQuery, state: FSMCont
     await callback.answer()
 
 
-@router.message(UserStates.waiting_for_location, F.text)
+@router.message(UserStates.waiting_for_location, F.text, flags={"admission": "geocode"})
 async def handle_address_text(message: Message, state: FSMContext):
     """Handle text message as address input"""
     if message.text.startswith("/"):
@@ -169,7 +173,7 @@ async def handle_address_text(message: Message, state: FSMContext):
         lat = coordinates["latitude"]
         lon = coordinates["longitude"]
         
-        await state.update_data(latitude=lat, longitude=lon, shown_photos=[])
+        await state.update_data(latitude=lat, longitude=lon)
         await state.set_state(UserStates.selecting_photo)
         
         # Send the found location as a venue
@@ -213,7 +217,7 @@ async def handle_address_text(message: Message, state: FSMContext):
         )
 
 
-@router.callback_query(F.data.startswith("use_location:"))
+@router.callback_query(F.data.startswith("use_location:"), flags={"admission": "search"})
 async def handle_use_location(callback: CallbackQuery, state: FSMContext):
     """Handle when user chooses to use the shared location"""
     # Extract coordinates from callback data
@@ -222,7 +226,7 @@ async def handle_use_location(callback: CallbackQuery, state: FSMContext):
     lon = float(parts[2])
     
     # Update state with location data
-    await state.update_data(latitude=lat, longitude=lon, shown_photos=[])
+    await state.update_data(latitude=lat, longitude=lon)
     await state.set_state(UserStates.selecting_photo)
     
     # Send venue to show the location being used
@@ -1,17 +1,41 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+from typing import Any, Dict, Optional, Union
 from bot.states.user_states import UserStates
+from bot.services.file_id_cache import file_id_cache
+from bot.services.media_cache import DownloadError, media_cache
 from bot.services.pastvu import PastVuAPI
 from bot.services.openai_service import OpenAIService
-from bot.keyboards.inline import get_photo_actions_keyboard, get_location_keyboard
+from bot.services.photo_store import PhotoRecord, photo_store
+from bot.keyboards.inline import get_photo_actions_keyboard, get_location_keyboard, get_retry_photo_keyboard
 from bot.utils.progress import ProgressAnimator
+from bot.utils.edit_scheduler import edit_scheduler
+from bot.utils import metrics
+from bot.utils.config import MEDIA_UPLOAD, PHOTO_MAX_BYTES
 
 router = Router()
 
 
-async def process_location(message: Message, state: FSMContext, lat: float, lon: float):
-    """Process location and find photos"""
+class PhotoUnavailable(Exception):
+    """PastVu failed while refilling a photo the store no longer holds"""
+
+
+async def process_location(message: Message, state: FSMContext, lat: float, lon: float) -> Optional[bool]:
+    """Process location: find and rank photos once, then show the best one
+
+    Returns True if photos were shown, False if PastVu has none here and
+    None if PastVu couldn't be asked.
+    """
+    # A new search replaces the previous queue, even if it finds nothing, so
+    # "another photo" on an older message doesn't serve the old place
+    data = await state.get_data()
+    if "photo_queue" in data:
+        data.pop("photo_queue")
+        data.pop("photo_cursor", None)
+        await state.set_data(data)
+    
     # Get photos from PastVu
     photos = await PastVuAPI.get_nearest_photos(lat, lon)
     
@@ -22,16 +46,79 @@ async def process_location(message: Message, state: FSMContext, lat: float, lon:
             reply_markup=get_location_keyboard()
         )
         await state.set_state(UserStates.waiting_for_location)
-        return
+        return None if photos is None else False
     
-    # Get state data
-    data = await state.get_data()
-    shown_photos = data.get("shown_photos", [])
+    # Rank all candidates once (local ranking, optional o3 re-rank)
+    ranked_photos = await OpenAIService.rank_photos(photos, lat=lat, lon=lon)
     
-    # Select best photo using OpenAI
-    selected_photo = await OpenAIService.select_best_photo(photos, shown_photos)
+    # Session keeps only the ranked cids; records live in the shared store
+    await state.update_data(
+        photo_queue=photo_store.add_many(ranked_photos),
+        photo_cursor=0
+    )
     
-    if not selected_photo:
+    await show_next_photo(message, state)
+    return True
+
+
+async def load_photo(cid: Optional[int], data: Dict[str, Any]) -> Optional[PhotoRecord]:
+    """Get a photo record by cid, refilling the store if the session outlived it
+
+    Returns None if PastVu no longer has the photo, raises PhotoUnavailable
+    if PastVu couldn't be asked.
+    """
+    record = photo_store.get(cid)
+    if record is None and cid is not None and data.get("latitude") is not None:
+        photos = await PastVuAPI.get_nearest_photos(data["latitude"], data["longitude"])
+        if photos is None:
+            raise PhotoUnavailable(cid)
+        photo_store.add_many(photos)
+        record = photo_store.get(cid)
+    return record
+
+
+async def photo_input(photo_file: str) -> Union[FSInputFile, str]:
+    """Local copy of a PastVu photo to upload, or its URL if it can't be downloaded"""
+    photo_url = PastVuAPI.get_photo_url(photo_file)
+    if not MEDIA_UPLOAD:
+        return photo_url
+    try:
+        path = await media_cache.fetch(photo_url, f"pastvu:{photo_file}", ".jpg", PHOTO_MAX_BYTES)
+    except DownloadError as e:
+        print(f"Photo download failed, sending by URL: {e}")
+        return photo_url
+    return FSInputFile(path)
+
+
+async def send_photo(message: Message, record: PhotoRecord, caption: str):
+    """Send a photo by its Telegram file_id if it was sent before, else upload it and remember the file_id"""
+    key = file_id_cache.photo_key(record.cid)
+    file_id = await file_id_cache.get(key)
+    metrics.cache_lookup("photo_file_id", file_id is not None)
+    if file_id:
+        try:
+            await message.answer_photo(photo=file_id, caption=caption, reply_markup=get_photo_actions_keyboard())
+            return
+        except TelegramBadRequest:
+            # Telegram no longer knows this file, upload it again
+            await file_id_cache.forget(key)
+    
+    sent = await message.answer_photo(
+        photo=await photo_input(record.file),
+        caption=caption,
+        reply_markup=get_photo_actions_keyboard()
+    )
+    if sent.photo:
+        await file_id_cache.set(key, sent.photo[-1].file_id)
+
+
+async def show_next_photo(message: Message, state: FSMContext):
+    """Send the next photo from the ranked queue"""
+    data = await state.get_data()
+    photo_queue = data.get("photo_queue", [])
+    photo_cursor = data.get("photo_cursor", 0)
+    
+    if photo_cursor >= len(photo_queue):
         await message.answer(
             "❌ Больше нет фотографий для этого места.\n"
             "Пожалуйста, попробуйте другое место.",
@@ -40,27 +127,39 @@ async def process_location(message: Message, state: FSMContext, lat: float, lon:
         await state.set_state(UserStates.waiting_for_location)
         return
     
-    # Update shown photos
-    shown_photos.append(selected_photo.get("cid"))
+    cid = photo_queue[photo_cursor]
+    try:
+        selected_photo = await load_photo(cid, data)
+    except PhotoUnavailable:
+        # Keep the cursor: the same photo is tried again on retry
+        await message.answer(
+            "❌ Не удалось загрузить фотографию: PastVu сейчас не отвечает.\n"
+            "Попробуйте ещё раз через минуту.",
+            reply_markup=get_retry_photo_keyboard()
+        )
+        return
     await state.update_data(
-        shown_photos=shown_photos,
-        current_photo=selected_photo,
-        all_photos=photos
+        photo_cursor=photo_cursor + 1,
+        current_cid=cid
     )
     
+    if selected_photo is None:
+        # Photo vanished upstream since ranking, move on to the next one
+        await show_next_photo(message, state)
+        return
+    
     # Send photo
-    photo_url = PastVuAPI.get_photo_url(selected_photo.get("file"))
+    lat = data.get("latitude")
+    lon = data.get("longitude")
     caption = (
-        f"📷 {selected_photo.get('title', 'Историческая фотография')}\n"
-        f"📅 Год: {selected_photo.get('year', 'Неизвестно')}\n"
-        f"📍 Место: {selected_photo.get('geo', [lat, lon])}"
+        f"📷 {selected_photo.title or 'Историческая фотография'}\n"
+        f"📅 Год: {selected_photo.year or 'Неизвестно'}\n"
+        f"📍 Место: {selected_photo.geo or [lat, lon]}"
     )
     
-    await message.answer_photo(
-        photo=photo_url,
-        caption=caption,
-        reply_markup=get_photo_actions_keyboard()
-    )
+    # Results go ahead of progress animation frames
+    await edit_scheduler.reserve(message.chat.id)
+    await send_photo(message, selected_photo, caption)
 
 
 @router.callback_query(F.data == "new_location")
@@ -75,12 +174,18 @@ async def handle_new_location(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "another_photo")
+@router.callback_query(F.data == "another_photo", flags={"admission": "search"})
 async def handle_another_photo(callback: CallbackQuery, state: FSMContext):
     """Handle request for another photo"""
     await callback.answer()
     
     data = await state.get_data()
+    
+    # Serve straight from the ranked queue, no outbound calls
+    if "photo_queue" in data:
+        await show_next_photo(callback.message, state)
+        return
+    
     lat = data.get("latitude")
     lon = data.get("longitude")
     
@@ -1,62 +1,198 @@
-from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram import Router, F, Bot
+from aiogram.types import CallbackQuery, FSInputFile, InputFile
 from aiogram.fsm.context import FSMContext
-from bot.states.user_states import UserStates
-from bot.services.pastvu import PastVuAPI
+from aiogram.exceptions import TelegramBadRequest
+from bot.services.image_preflight import ImagePreflight, PreflightError
+from bot.services.media_cache import DownloadError, media_cache
 from bot.services.runway import RunwayAPI
+from bot.handlers.photo import PhotoUnavailable, load_photo
+from bot.services.video_queue import VideoJobQueue, video_queue, SUBMITTED, DONE, FAILED
 from bot.keyboards.inline import get_photo_actions_keyboard
 from bot.utils.progress import ProgressAnimator, PercentageProgressAnimator
+from bot.utils.edit_scheduler import edit_scheduler
+from bot.utils import metrics
+from bot.utils.admission import BUSY_TEXT, throttled_text, video_bucket
+from bot.utils.config import VIDEO_MAX_ACTIVE_PER_USER, VIDEO_MAX_QUEUED, MEDIA_UPLOAD, VIDEO_MAX_BYTES
 import asyncio
+from typing import Any, Dict, Iterator, Tuple, Union
 
 router = Router()
 
 
-@router.callback_query(F.data == "make_video")
+async def video_input(video_url: str, cache_key: str) -> Union[FSInputFile, str]:
+    """Local copy of a generated video to upload, or its URL if it can't be downloaded"""
+    if not MEDIA_UPLOAD:
+        return video_url
+    try:
+        path = await media_cache.fetch(video_url, f"video:{cache_key}", ".mp4", VIDEO_MAX_BYTES)
+    except DownloadError as e:
+        print(f"Video download failed, sending by URL: {e}")
+        return video_url
+    return FSInputFile(path)
+
+
+def cached_videos(cache_key: str) -> Iterator[Tuple[str, Union[InputFile, str]]]:
+    """Stored copies of a video, best first: Telegram file_id, local file, then Runway URL"""
+    cached = RunwayAPI.cache.get(cache_key)
+    if cached.get("file_id"):
+        yield "file_id", cached["file_id"]
+    path = media_cache.get(f"video:{cache_key}", ".mp4")
+    if path is not None:
+        yield "file", FSInputFile(path)
+    if cached.get("video_url"):
+        yield "url", cached["video_url"]
+
+
+async def send_video(bot: Bot, chat_id: int, photo: Dict[str, Any], video: Union[InputFile, str], cache_key: str):
+    """Send a generated video and remember its Telegram file_id"""
+    await edit_scheduler.reserve(chat_id)
+    sent = await bot.send_video(
+        chat_id=chat_id,
+        video=video,
+        caption=(
+            f"🎥 Видео создано из: {photo.get('title', 'Историческая фотография')}\n"
+            f"📅 Год: {photo.get('year', 'Неизвестно')}"
+        )
+    )
+    if sent.video:
+        RunwayAPI.cache.set_file_id(cache_key, sent.video.file_id)
+    
+    # Offer options to continue
+    await bot.send_message(
+        chat_id=chat_id,
+        text="Что вы хотите сделать дальше?",
+        reply_markup=get_photo_actions_keyboard()
+    )
+
+
+@router.callback_query(F.data == "make_video", flags={"admission": "video"})
 async def handle_make_video(callback: CallbackQuery, state: FSMContext):
-    """Handle video generation request"""
+    """Handle video generation request: serve from cache or enqueue a job"""
     await callback.answer()
-    await state.set_state(UserStates.generating_video)
     
     data = await state.get_data()
-    current_photo = data.get("current_photo")
+    try:
+        current_photo = await load_photo(data.get("current_cid"), data)
+    except PhotoUnavailable:
+        await callback.message.answer("❌ Не удалось загрузить фотографию: PastVu сейчас не отвечает. Попробуйте ещё раз через минуту.")
+        return
     
     if not current_photo:
         await callback.message.answer("❌ Ошибка: Фото не выбрано")
         return
     
-    # Get photo URL
-    photo_url = PastVuAPI.get_photo_url(current_photo.get("file"))
+    chat_id = callback.message.chat.id
     
-    # Start video generation with animated progress
-    animator = ProgressAnimator()
-    init_progress_msg = await animator.send_progress_message(
-        callback.message,
-        "🎬 Начинаю создание видео"
-    )
+    # Reuse a video already generated from this photo with the same settings
+    cache_key = RunwayAPI.video_cache_key(current_photo.file)
+    for source, video in cached_videos(cache_key):
+        try:
+            await send_video(callback.bot, chat_id, current_photo.to_dict(), video, cache_key)
+            metrics.cache_lookup("video", True)
+            return
+        except TelegramBadRequest:
+            if source == "file_id":
+                # Telegram no longer knows this file; don't offer it again
+                RunwayAPI.cache.forget_file_id(cache_key)
+    # Nothing stored, or every copy was rejected: generate a fresh video
+    metrics.cache_lookup("video", False)
     
-    # Create video task with animation
-    task_id = await animator.animate_until_complete(
-        init_progress_msg,
-        RunwayAPI.create_video_from_image(photo_url),
-        update_interval=0.5
-    )
+    if video_queue.find_active(chat_id, cache_key):
+        await callback.message.answer("⏳ Видео из этой фотографии уже создаётся.")
+        return
     
-    if not task_id:
-        await init_progress_msg.delete()
-        await callback.message.answer("❌ Не удалось начать создание видео. Пожалуйста, попробуйте ещё раз.")
-        await state.set_state(UserStates.selecting_photo)
+    # Bound the backlog: a few jobs per user, and a cap on jobs waiting overall
+    if video_queue.active_count(chat_id) >= VIDEO_MAX_ACTIVE_PER_USER:
+        metrics.ADMISSION_REJECTED.labels("video_per_user").inc()
+        await callback.message.answer("⏳ Ваши видео уже создаются. Дождитесь их, и можно будет создать новое.")
+        return
+    if video_queue.queued_count() >= VIDEO_MAX_QUEUED:
+        metrics.ADMISSION_REJECTED.labels("video_queue_full").inc()
+        await callback.message.answer(BUSY_TEXT)
         return
     
-    # Delete initial message
-    await init_progress_msg.delete()
+    # Only a job that will reach Runway counts against the user's video allowance
+    wait = video_bucket.take(callback.from_user.id)
+    if wait:
+        metrics.ADMISSION_REJECTED.labels("throttled_video").inc()
+        await callback.message.answer(throttled_text(wait))
+        return
+    
+    # Hand the job to the worker pool and return right away
+    job_id, position = video_queue.enqueue(chat_id, callback.from_user.id, current_photo.to_dict(), cache_key)
+    if position > 0:
+        queue_message = await callback.message.answer(
+            f"🕒 Видео поставлено в очередь. Перед вами: {position}"
+        )
+        video_queue.update(job_id, status_message_id=queue_message.message_id)
+
+
+async def run_video_job(bot: Bot, queue: VideoJobQueue, job: Dict[str, Any]):
+    """Worker: submit the job to Runway (unless resumed) and deliver the video"""
+    chat_id = job["chat_id"]
+    photo = job["photo"]
+    cache_key = job["cache_key"]
+    task_id = job["task_id"]
+    
+    # Remove the queue position message once the job starts
+    if job["status_message_id"]:
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=job["status_message_id"])
+        except TelegramBadRequest:
+            pass
+    
+    if not task_id:
+        # Start video generation with animated progress
+        animator = ProgressAnimator()
+        init_progress_msg = await bot.send_message(
+            chat_id=chat_id,
+            text=animator.prepare_progress_text("🎬 Начинаю создание видео")
+        )
+        
+        # Check and reframe the photo first, so unusable ones don't cost a generation
+        async def submit():
+            prompt_image = await ImagePreflight.prompt_image(photo.get("file"))
+            return await RunwayAPI.create_video_from_image(prompt_image)
+        
+        # Create video task with animation
+        try:
+            task_id = await animator.animate_until_complete(
+                init_progress_msg,
+                submit(),
+                update_interval=0.5
+            )
+        except PreflightError as e:
+            await init_progress_msg.delete()
+            queue.update(job["id"], status=FAILED)
+            await bot.send_message(
+                chat_id=chat_id,
+                text=f"❌ Из этой фотографии не получится видео: {e}.\nПопробуйте другую фотографию.",
+                reply_markup=get_photo_actions_keyboard()
+            )
+            return
+        
+        # Delete initial message
+        await init_progress_msg.delete()
+        
+        if not task_id:
+            queue.update(job["id"], status=FAILED)
+            await bot.send_message(
+                chat_id=chat_id,
+                text="❌ Не удалось начать создание видео. Пожалуйста, попробуйте ещё раз."
+            )
+            return
+        
+        queue.update(job["id"], status=SUBMITTED, task_id=task_id)
     
     # Start animated progress with percentage
     progress_animator = PercentageProgressAnimator()
-    progress_message = await progress_animator.send_progress_message_with_percentage(
-        callback.message,
-        "⏳ Обработка видео:",
-        initial_percentage=0,
-        emoji_pattern="clock"
+    progress_message = await bot.send_message(
+        chat_id=chat_id,
+        text=progress_animator.prepare_percentage_text(
+            "⏳ Обработка видео:",
+            initial_percentage=0,
+            emoji_pattern="clock"
+        )
     )
     
     # Animation task for percentage updates
@@ -76,7 +212,7 @@ async def handle_make_video(callback: CallbackQuery, state: FSMContext):
             pass
     
     # Start animation task
-    animation_task = asyncio.create_task(animate_progress())
+    animation_task = asyncio.create_task(animate_progress(), name="video-progress")
     
     try:
         # Wait for video with progress updates
@@ -91,30 +227,17 @@ async def handle_make_video(callback: CallbackQuery, state: FSMContext):
     
     if video_url:
         # Update to completion message
-        try:
-            await progress_message.edit_text("✅ Создание видео завершено!")
-        except:
-            pass
-        
-        # Send video
-        await callback.message.answer_video(
-            video=video_url,
-            caption=(
-                f"🎥 Видео создано из: {current_photo.get('title', 'Историческая фотография')}\n"
-                f"📅 Год: {current_photo.get('year', 'Неизвестно')}"
-            )
-        )
+        await edit_scheduler.edit(progress_message, "✅ Создание видео завершено!", priority=True)
         
-        # Offer options to continue
-        await callback.message.answer(
-            "Что вы хотите сделать дальше?",
-            reply_markup=get_photo_actions_keyboard()
-        )
+        RunwayAPI.cache.set_video_url(cache_key, video_url)
+        await send_video(bot, chat_id, photo, await video_input(video_url, cache_key), cache_key)
+        queue.update(job["id"], status=DONE)
     else:
+        queue.update(job["id"], status=FAILED)
+        
         # Update to error message
-        try:
-            await progress_message.edit_text("❌ Создание видео не удалось. Пожалуйста, попробуйте ещё раз.")
-        except:
-            pass
-    
-    await state.set_state(UserStates.selecting_photo)
\ No newline at end of file
+        await edit_scheduler.edit(
+            progress_message,
+            "❌ Создание видео не удалось. Пожалуйста, попробуйте ещё раз.",
+            priority=True
+        )
\ No newline at end of file
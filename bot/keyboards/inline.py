@@ -67,4 +67,16 @@ def get_photo_actions_keyboard() -> InlineKeyboardMarkup:
     builder.row(
         InlineKeyboardButton(text="🎬 Создать видео", callback_data="make_video")
     )
+    return builder.as_markup()
+
+
+def get_retry_photo_keyboard() -> InlineKeyboardMarkup:
+    """Get inline keyboard to retry loading a photo"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔄 Попробовать снова", callback_data="another_photo")
+    )
+    builder.row(
+        InlineKeyboardButton(text="📍 Отправить новое место", callback_data="new_location")
+    )
     return builder.as_markup()
\ No newline at end of file
@@ -0,0 +1,32 @@
+from typing import Optional
+from bot.utils.cache import TieredCache
+from bot.utils.config import FILE_ID_CACHE_PATH, FILE_ID_CACHE_TTL, FILE_ID_CACHE_MAX_BYTES
+
+
+class FileIdCache(TieredCache):
+    """Telegram file_ids of photos the bot has already sent, keyed by PastVu cid
+    
+    Sending a known file_id skips both the download and the upload, so a
+    photo someone has seen before reaches the next user almost at once.
+    Generated videos keep their file_id in the video cache instead.
+    """
+    
+    def __init__(self):
+        super().__init__(FILE_ID_CACHE_MAX_BYTES, FILE_ID_CACHE_TTL, FILE_ID_CACHE_PATH, table="file_ids")
+    
+    @staticmethod
+    def photo_key(cid: int) -> str:
+        return f"photo:{cid}"
+    
+    async def set(self, key: str, file_id: Optional[str], ttl: Optional[float] = None):
+        """Remember the file_id Telegram returned for a sent file"""
+        if not file_id:
+            return
+        await super().set(key, file_id, ttl)
+    
+    async def forget(self, key: str):
+        """Drop a file_id Telegram no longer accepts"""
+        await self.delete(key)
+
+
+file_id_cache = FileIdCache()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import re
+from typing import Any, Dict, Optional, Tuple
+from bot.utils.cache import TieredCache
+from bot.utils.config import (
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_TTL,
+    GEOCODE_NEGATIVE_TTL,
+    GEOCODE_CACHE_MAX_BYTES,
+)
+
+# Marker stored for addresses the model could not geocode
+NOT_FOUND = {"error": "Cannot geocode address"}
+
+_SEPARATOR_RE = re.compile(r"[,;\n]+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+class GeocodeCache:
+    """Normalized address -> coordinates cache with negative entries"""
+    
+    def __init__(self):
+        self.store = TieredCache(
+            GEOCODE_CACHE_MAX_BYTES,
+            GEOCODE_CACHE_TTL,
+            GEOCODE_CACHE_PATH,
+            table="geocode",
+            ttl_for=self._ttl_for
+        )
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(address: str) -> str:
+        """Make trivially different spellings of an address share one key"""
+        text = address.lower().replace("ё", "е")
+        # Words keep their order within a comma-separated part, the parts are sorted:
+        # "Москва, Красная площадь" == "Красная площадь, Москва", but
+        # "New York Street, London" != "London Street, New York"
+        segments = (" ".join(_PUNCTUATION_RE.sub(" ", part).split()) for part in _SEPARATOR_RE.split(text))
+        return ", ".join(sorted(segment for segment in segments if segment))
+    
+    async def get(self, address: str) -> Tuple[bool, Optional[Dict[str, float]]]:
+        """Return (found, coordinates); coordinates is None for negative entries"""
+        value = await self.store.get(self.normalize(address))
+        if value is None:
+            self.misses += 1
+            return False, None
+        
+        self.hits += 1
+        if value == NOT_FOUND:
+            return True, None
+        return True, value
+    
+    async def set(self, address: str, coordinates: Optional[Dict[str, float]]):
+        """Store coordinates, or a negative entry when coordinates is None"""
+        await self.store.set(self.normalize(address), coordinates if coordinates is not None else NOT_FOUND)
+    
+    @staticmethod
+    def _ttl_for(value: Any) -> float:
+        return GEOCODE_NEGATIVE_TTL if value == NOT_FOUND else GEOCODE_CACHE_TTL
+    
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
\ No newline at end of file
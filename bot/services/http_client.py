@@ -0,0 +1,72 @@
+import aiohttp
+from typing import TYPE_CHECKING, Optional
+from bot.utils.config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_TOTAL_TIMEOUT,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class HTTPClient:
+    """Shared connection-pooled aiohttp session for all outbound API calls"""
+
+    _session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    async def start(cls) -> aiohttp.ClientSession:
+        """Create the shared session (safe to call more than once)"""
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                use_dns_cache=True,
+                enable_cleanup_closed=True
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=HTTP_TOTAL_TIMEOUT,
+                connect=HTTP_CONNECT_TIMEOUT,
+                sock_read=HTTP_READ_TIMEOUT
+            )
+            cls._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return cls._session
+
+    @classmethod
+    async def session(cls) -> aiohttp.ClientSession:
+        """Get the shared session, creating it lazily if startup didn't"""
+        if cls._session is None or cls._session.closed:
+            return await cls.start()
+        return cls._session
+
+    @classmethod
+    async def close(cls):
+        """Close the shared session and release pooled connections"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+
+def create_openai_http_client() -> "httpx.AsyncClient":
+    """Build an httpx client for AsyncOpenAI with the same pool tuning"""
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_LIMIT,
+            max_keepalive_connections=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT
+        ),
+        timeout=httpx.Timeout(
+            HTTP_TOTAL_TIMEOUT,
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT
+        )
+    )
@@ -0,0 +1,133 @@
+import asyncio
+import base64
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from bot.services.media_cache import DownloadError, media_cache
+from bot.services.pastvu import PastVuAPI
+from bot.services.runway import RunwayAPI
+from bot.utils import metrics
+from bot.utils.imaging import prepare_image
+from bot.utils.singleflight import singleflight
+from bot.utils.config import (
+    IMAGE_PREFLIGHT,
+    IMAGE_MIN_SIDE,
+    IMAGE_MIN_CROP_KEEP,
+    IMAGE_WORKERS,
+    IMAGE_MAX_BYTES,
+)
+
+# Why a photo was rejected, as shown to the user
+REASONS = {
+    "download": "не удалось загрузить фотографию",
+    "too_large": "файл фотографии слишком большой",
+    "format": "формат фотографии не поддерживается",
+    "too_small": "у фотографии слишком низкое разрешение",
+    "unreadable": "файл фотографии повреждён",
+}
+
+
+class PreflightError(Exception):
+    """The photo can't be used for a video"""
+    
+    def __init__(self, reason: str):
+        super().__init__(REASONS.get(reason, reason))
+        self.reason = reason
+
+
+class ImagePreflight:
+    """Downloads, checks and reframes photos before they cost a Runway generation
+
+    The original and the reframed image are kept in the media cache, so
+    each photo is fetched from PastVu and processed once. Decoding and
+    resizing run in a process pool, off the event loop.
+    """
+    
+    _pool: Optional[ProcessPoolExecutor] = None
+    
+    @staticmethod
+    def start(warm: bool = True):
+        """Check Pillow is installed and, if warm, start the pool's workers in the background"""
+        if not IMAGE_PREFLIGHT:
+            return
+        if importlib.util.find_spec("PIL") is None:
+            raise RuntimeError("IMAGE_PREFLIGHT=1 requires the 'Pillow' package (pip install Pillow)")
+        # Spawned workers take seconds to import; don't make the first video wait for them
+        if warm:
+            ImagePreflight.pool().submit(os.getpid)
+    
+    @classmethod
+    def shutdown(cls):
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+    
+    @classmethod
+    def pool(cls) -> ProcessPoolExecutor:
+        # Spawned, not forked: the bot process runs threads (loop watchdog, executors)
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return cls._pool
+    
+    @staticmethod
+    async def prompt_image(photo_file: str) -> str:
+        """What to send Runway as promptImage: the prepared image, or the PastVu URL if pre-flight is off"""
+        if not IMAGE_PREFLIGHT:
+            return PastVuAPI.get_photo_url(photo_file)
+        path = await ImagePreflight.prepare(photo_file)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, ImagePreflight.read_file, path)
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+    
+    @staticmethod
+    @metrics.track("image_preflight")
+    @singleflight(lambda photo_file: photo_file)
+    async def prepare(photo_file: str) -> str:
+        """Path of the photo reframed to Runway's ratio; raises PreflightError if unusable"""
+        prepared_key = f"prepared:{RunwayAPI.RATIO}:{photo_file}"
+        prepared = media_cache.get(prepared_key, ".jpg")
+        metrics.cache_lookup("image", prepared is not None)
+        if prepared is not None:
+            return prepared
+        
+        try:
+            original = await media_cache.fetch(
+                PastVuAPI.get_photo_url(photo_file), f"pastvu:{photo_file}", ".jpg", IMAGE_MAX_BYTES
+            )
+        except DownloadError as e:
+            print(f"Photo download failed: {e}")
+            raise PreflightError(e.reason) from e
+        
+        prepared = media_cache.path(prepared_key, ".jpg")
+        width, height = (int(side) for side in RunwayAPI.RATIO.split(":"))
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                ImagePreflight.pool(),
+                prepare_image,
+                original,
+                prepared,
+                width,
+                height,
+                IMAGE_MIN_SIDE,
+                IMAGE_MIN_CROP_KEEP
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            ImagePreflight.shutdown()
+            raise
+        if not result["ok"]:
+            print(f"Photo {photo_file} rejected: {result['reason']}")
+            metrics.stage_error("image_preflight")
+            raise PreflightError(result["reason"])
+        return media_cache.add(prepared_key, ".jpg")
+    
+    @staticmethod
+    def read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
\ No newline at end of file
@@ -0,0 +1,148 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import random
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from bot.services.photo_index import PhotoIndex, read_photo_dump
+from bot.utils.cache import TTLCache
+
+# Cell size of the negative cache when there is no grid to borrow it from
+FALLBACK_CELL_SIZE = 1.0
+# Picks per request that may land in cells already known to be empty
+MAX_TRIES = 20
+
+
+def _cell_key(lat: float, lon: float, cell_size: float) -> int:
+    cols = int(math.ceil(360 / cell_size))
+    row = min(int((lat + 90) // cell_size), int(math.ceil(180 / cell_size)) - 1)
+    col = int((lon + 180) // cell_size) % cols
+    return row * cols + col
+
+
+class LocationSampler:
+    """Random locations weighted by how many PastVu photos are around them
+
+    The grid counts photos per cell and is built offline (see main). A pick
+    chooses a cell with probability proportional to its count, by bisecting
+    the cumulative counts, then a uniform point inside it. Cells a search
+    came back empty from are skipped for a while. Without a grid, picks
+    are uniform over the globe as before, minus the known empty cells.
+    """
+    
+    def __init__(self, path: str, empty_ttl: float):
+        self.path = path
+        self.cell_size = FALLBACK_CELL_SIZE
+        self.keys = array("q")
+        self.cumulative = array("d")
+        self.empty = TTLCache(max_bytes=4 * 1024 * 1024, ttl=empty_ttl)
+        self._loaded = False
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def load(self):
+        """Read the grid file if one is configured (blocking; run in an executor)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                grid = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read location grid {self.path}: {e}")
+            return
+        
+        self.cell_size = float(grid["cell_size"])
+        total = 0.0
+        for key, count in sorted(grid["cells"].items(), key=lambda item: int(item[0])):
+            total += count
+            self.keys.append(int(key))
+            self.cumulative.append(total)
+    
+    def sample(self, rng: random.Random = random) -> Tuple[float, float]:
+        """Random (lat, lon), avoiding cells known to be empty when possible"""
+        self.load()
+        for _ in range(MAX_TRIES):
+            lat, lon = self._pick(rng)
+            if self.empty.get(self._empty_key(lat, lon)) is None:
+                break
+        return lat, lon
+    
+    def mark_empty(self, lat: float, lon: float):
+        """Remember that a search around this point found no photos"""
+        self.empty.set(self._empty_key(lat, lon), True, size=64)
+    
+    def _pick(self, rng: random.Random) -> Tuple[float, float]:
+        if not self.keys:
+            return rng.uniform(-90, 90), rng.uniform(-180, 180)
+        
+        index = bisect.bisect_right(self.cumulative, rng.random() * self.cumulative[-1])
+        key = self.keys[min(index, len(self.keys) - 1)]
+        cols = int(math.ceil(360 / self.cell_size))
+        row, col = divmod(key, cols)
+        lat = min(90.0, -90 + (row + rng.random()) * self.cell_size)
+        lon = min(180.0, -180 + (col + rng.random()) * self.cell_size)
+        return lat, lon
+    
+    def _empty_key(self, lat: float, lon: float) -> str:
+        return str(_cell_key(lat, lon, self.cell_size))
+
+
+def build_grid(points: Iterable[Tuple[float, float]], path: str, cell_size: float = 0.1) -> int:
+    """Count points per cell and write the grid file, return the number of cells"""
+    cells: Dict[int, int] = {}
+    for lat, lon in points:
+        key = _cell_key(lat, lon, cell_size)
+        cells[key] = cells.get(key, 0) + 1
+    
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump({"cell_size": cell_size, "cells": cells}, f, separators=(",", ":"))
+    os.replace(temporary, path)
+    return len(cells)
+
+
+def dump_points(paths: List[str], year: int) -> Iterator[Tuple[float, float]]:
+    """Coordinates of photos in JSON/JSONL dumps that a search for `year` would return"""
+    for photo in read_photo_dump(paths):
+        geo = photo.get("geo")
+        if not geo or len(geo) != 2 or int(photo.get("year") or 0) > year:
+            continue
+        yield float(geo[0]), float(geo[1])
+
+
+def index_points(index: PhotoIndex, year: int) -> Iterator[Tuple[float, float]]:
+    """Coordinates of photos in an offline index that a search for `year` would return"""
+    for row in range(index.count):
+        if index.years[row] <= year:
+            yield index.lats[row], index.lons[row]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for building a location grid"""
+    parser = argparse.ArgumentParser(description="Photo density grid for random locations")
+    parser.add_argument("output")
+    parser.add_argument("inputs", nargs="*", help="JSON/JSONL photo dumps")
+    parser.add_argument("--index", help="Build from an offline photo index instead of dumps")
+    parser.add_argument("--cell-size", type=float, default=0.1)
+    parser.add_argument("--year", type=int, default=1928)
+    args = parser.parse_args(argv)
+    
+    if args.index:
+        index = PhotoIndex(args.index)
+        count = build_grid(index_points(index, args.year), args.output, args.cell_size)
+        index.close()
+    elif args.inputs:
+        count = build_grid(dump_points(args.inputs, args.year), args.output, args.cell_size)
+    else:
+        parser.error("give photo dumps or --index")
+    print(f"Wrote {count} cells into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import aiohttp
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from bot.services.http_client import HTTPClient
+from bot.utils import metrics
+from bot.utils.singleflight import singleflight
+from bot.utils.config import MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES
+
+# Downloads are written as they arrive, never held whole in memory
+CHUNK_SIZE = 64 * 1024
+# Received chunks are batched into writes of this size, made off the event loop
+WRITE_SIZE = 1024 * 1024
+# Files used this recently may still be waiting to be uploaded and aren't evicted
+EVICT_GRACE = 120.0
+
+
+class DownloadError(Exception):
+    """A file couldn't be fetched into the cache"""
+    
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+class MediaCache:
+    """On-disk cache of downloaded photos and videos with a total byte budget
+
+    Files are named by a hash of their key and evicted least recently used
+    first once the directory grows past max_bytes. Hits refresh the file's
+    mtime, so the order survives restarts. A file whose mtime is under
+    EVICT_GRACE old was just handed out by some process and is kept, even
+    if that leaves the cache over budget for a while. Processes sharing
+    the directory keep their own order; a file that vanished is a miss.
+    """
+    
+    def __init__(self, directory: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._loaded = False
+    
+    def __len__(self) -> int:
+        return len(self._files)
+    
+    def load(self):
+        """Index files left by earlier runs, oldest first (blocking; run in an executor)"""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.current_bytes += size
+        self._loaded = True
+        self._evict()
+    
+    def path(self, key: str, suffix: str) -> str:
+        """Where the file for a key lives, cached or not"""
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+    
+    def get(self, key: str, suffix: str) -> Optional[str]:
+        """Path of a cached file, marking it recently used; None if absent"""
+        self.load()
+        path = self.path(key, suffix)
+        name = os.path.basename(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(name)
+            return None
+        if name in self._files:
+            self._files.move_to_end(name)
+        else:
+            # Written by another process
+            self.add(key, suffix)
+        return path
+    
+    def add(self, key: str, suffix: str) -> str:
+        """Account for a file written straight to path(key, suffix)"""
+        self.load()
+        path = self.path(key, suffix)
+        name = os.path.basename(path)
+        self._forget(name)
+        size = os.path.getsize(path)
+        self._files[name] = size
+        self.current_bytes += size
+        self._evict()
+        return path
+    
+    async def fetch(self, url: str, key: str, suffix: str, max_bytes: int) -> str:
+        """Path of the cached file for key, downloading url on a miss; raises DownloadError"""
+        path = self.get(key, suffix)
+        metrics.cache_lookup(f"media{suffix}", path is not None)
+        if path is not None:
+            # Cached for a caller with a larger limit
+            if self._files.get(os.path.basename(path), 0) > max_bytes:
+                raise DownloadError("too_large", url)
+            return path
+        return await self.download(url, key, suffix, max_bytes)
+    
+    @singleflight(lambda self, url, key, suffix, max_bytes: (key, suffix))
+    async def download(self, url: str, key: str, suffix: str, max_bytes: int) -> str:
+        """Stream url to disk in chunks and add it to the cache"""
+        path = self.path(key, suffix)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        session = await HTTPClient.session()
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timed("media_download"):
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        raise DownloadError("download", f"HTTP {response.status} for {url}")
+                    if (response.content_length or 0) > max_bytes:
+                        raise DownloadError("too_large", url)
+                    size = 0
+                    buffer = bytearray()
+                    f = await loop.run_in_executor(None, open, temporary, "wb")
+                    try:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                raise DownloadError("too_large", url)
+                            buffer += chunk
+                            if len(buffer) >= WRITE_SIZE:
+                                await loop.run_in_executor(None, f.write, bytes(buffer))
+                                buffer.clear()
+                        if buffer:
+                            await loop.run_in_executor(None, f.write, bytes(buffer))
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+            os.replace(temporary, path)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise DownloadError("download", f"{url}: {e!r}") from e
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return self.add(key, suffix)
+    
+    def _forget(self, name: str):
+        size = self._files.pop(name, None)
+        if size is not None:
+            self.current_bytes -= size
+    
+    def _evict(self):
+        """Delete least recently used files until the cache fits its budget"""
+        now = time.time()
+        for name in list(self._files):
+            if self.current_bytes <= self.max_bytes:
+                break
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.stat(path).st_mtime < EVICT_GRACE:
+                    # Handed out moments ago, maybe by another process, and not uploaded yet
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._forget(name)
+
+
+media_cache = MediaCache()
\ No newline at end of file
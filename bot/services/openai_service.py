@@ -1,27 +1,110 @@
-from openai import AsyncOpenAI
+import asyncio
 import json
-from typing import List, Dict, Any, Optional
-from bot.utils.config import OPENAI_API_KEY
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from bot.services.geocode_cache import GeocodeCache
+from bot.services.http_client import create_openai_http_client
+from bot.services.ranking import PhotoRanker
+from bot.utils import metrics
+from bot.utils.admission import Overloaded, openai_limiter
+from bot.utils.singleflight import singleflight
+from bot.utils.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    HTTP_TOTAL_TIMEOUT,
+    OPENAI_RERANK,
+    OPENAI_RERANK_TOP_K,
+    OPENAI_RERANK_BUDGET,
+)
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_client: Optional["AsyncOpenAI"] = None
+
+
+def get_client() -> "AsyncOpenAI":
+    """Shared AsyncOpenAI client, created on first use"""
+    global _client
+    if _client is None:
+        # The SDK takes a noticeable share of startup to import, so it's deferred
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL or None,
+            timeout=HTTP_TOTAL_TIMEOUT,
+            http_client=create_openai_http_client()
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared client if it was ever created"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
 
 
 class OpenAIService:
+    geocode_cache = GeocodeCache()
+    
     @staticmethod
-    async def select_best_photo(photos: List[Dict[str, Any]], excluded_ids: List[int] = None) -> Optional[Dict[str, Any]]:
-        """Use OpenAI o3 model to select the best historical building/street photo"""
-        if excluded_ids is None:
-            excluded_ids = []
+    async def select_best_photo(
+        photos: List[Dict[str, Any]],
+        excluded_ids: List[int] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Select the best historical building/street photo"""
+        ranked = await OpenAIService.rank_photos(photos, excluded_ids, lat, lon)
+        return ranked[0] if ranked else None
+    
+    @staticmethod
+    @metrics.track("photo_selection")
+    @singleflight(lambda photos, excluded_ids=None, lat=None, lon=None: (
+        tuple(p.get("cid") for p in photos),
+        tuple(excluded_ids or ()),
+        lat,
+        lon
+    ))
+    async def rank_photos(
+        photos: List[Dict[str, Any]],
+        excluded_ids: List[int] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Rank photos locally, optionally letting o3 re-rank the top candidates"""
+        excluded = set(excluded_ids or [])
         
         # Filter out already shown photos
-        available_photos = [p for p in photos if p.get("cid") not in excluded_ids]
+        available_photos = [p for p in photos if p.get("cid") not in excluded]
         
         if not available_photos:
-            return None
+            return []
+        
+        ranked = PhotoRanker.rank(available_photos, lat, lon)
         
+        if OPENAI_RERANK and len(ranked) > 1:
+            top = ranked[:OPENAI_RERANK_TOP_K]
+            try:
+                index = await asyncio.wait_for(
+                    OpenAIService.rerank_with_llm(top),
+                    timeout=OPENAI_RERANK_BUDGET
+                )
+                if index is not None and 0 < index < len(top):
+                    ranked.insert(0, ranked.pop(index))
+            except asyncio.TimeoutError:
+                print("OpenAI re-rank exceeded time budget, using local ranking")
+                metrics.stage_error("photo_rerank")
+        
+        return ranked
+    
+    @staticmethod
+    async def rerank_with_llm(photos: List[Dict[str, Any]]) -> Optional[int]:
+        """Ask o3 to pick the best of a few pre-ranked photos, return its index"""
         # Prepare photo descriptions for the model
         photo_descriptions = []
-        for i, photo in enumerate(available_photos):
+        for i, photo in enumerate(photos):
             desc = f"Photo {i}: Title: {photo.get('title', 'N/A')}, Year: {photo.get('year', 'N/A')}, ID: {photo.get('cid')}"
             photo_descriptions.append(desc)
         
@@ -32,32 +115,47 @@ Photos:
 Return only the photo index number (0-based) of the best choice."""
         
         try:
-            # Using the new o3 model with Responses API
-            response = await client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            async with openai_limiter.slot():
+                response = await get_client().chat.completions.create(
+                    model="o3",
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
             
             # Parse the response
             content = response.choices[0].message.content.strip()
-            index = int(content)
-            
-            if 0 <= index < len(available_photos):
-                return available_photos[index]
-            
+            return int(content)
+        
         except Exception as e:
             print(f"OpenAI API error: {e}")
-            # Fallback: return the oldest available photo
-            if available_photos:
-                return min(available_photos, key=lambda x: x.get("year", 9999))
+            metrics.stage_error("photo_rerank")
         
         return None
     
     @staticmethod
     async def geocode_address(address: str) -> Optional[Dict[str, float]]:
-        """Use OpenAI o3 model to convert address to coordinates"""
+        """Convert address to coordinates, using the cache before o3"""
+        found, coordinates = await OpenAIService.geocode_cache.get(address)
+        metrics.cache_lookup("geocode", found)
+        if found:
+            return coordinates
+        
+        definitive, coordinates = await OpenAIService.geocode_with_llm(address)
+        # Transient API or parsing errors are not cached
+        if definitive:
+            await OpenAIService.geocode_cache.set(address, coordinates)
+        return coordinates
+    
+    @staticmethod
+    @metrics.track("geocode")
+    @singleflight(lambda address: GeocodeCache.normalize(address))
+    async def geocode_with_llm(address: str) -> Tuple[bool, Optional[Dict[str, float]]]:
+        """Use OpenAI o3 model to convert address to coordinates
+        
+        Returns (definitive, coordinates): definitive is False when the
+        answer came from an error rather than from the model.
+        """
         prompt = f"""Convert the following address to geographic coordinates (latitude and longitude).
 Address: {address}
 
@@ -68,28 +166,34 @@ If the address is ambiguous or cannot be geocoded, return:
 {{"error": "Cannot geocode address"}}"""
         
         try:
-            response = await client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            async with openai_limiter.slot():
+                response = await get_client().chat.completions.create(
+                    model="o3",
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
             
             content = response.choices[0].message.content.strip()
             result = json.loads(content)
             
             if "error" in result:
-                return None
-                
+                return True, None
+            
             if "latitude" in result and "longitude" in result:
-                return {
+                return True, {
                     "latitude": float(result["latitude"]),
                     "longitude": float(result["longitude"])
                 }
-            
+        
+        except Overloaded:
+            # Shed, not failed: the caller tells the user to retry later
+            raise
         except (json.JSONDecodeError, ValueError, KeyError) as e:
             print(f"Error parsing geocoding response: {e}")
+            metrics.stage_error("geocode")
         except Exception as e:
             print(f"OpenAI API error during geocoding: {e}")
+            metrics.stage_error("geocode")
         
-        return None
\ No newline at end of file
+        return False, None
\ No newline at end of file
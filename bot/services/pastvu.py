@@ -1,15 +1,83 @@
-import aiohttp
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from bot.services.http_client import HTTPClient
+from bot.services.photo_index import PhotoIndex
+from bot.utils import geohash, metrics
+from bot.utils.admission import pastvu_limiter
+from bot.utils.cache import TieredCache
+from bot.utils.singleflight import singleflight
+from bot.utils.config import (
+    PASTVU_CACHE_PRECISION,
+    PASTVU_CACHE_TTL,
+    PASTVU_CACHE_MAX_BYTES,
+    PASTVU_CACHE_PATH,
+    PASTVU_INDEX_PATH,
+    PASTVU_INDEX_MODE,
+    PASTVU_API_URL,
+    PASTVU_PHOTO_URL,
+)
+
+
+class PastVuCache(TieredCache):
+    """Nearest-photo results keyed by geohash cell and year"""
+    
+    def __init__(self):
+        super().__init__(PASTVU_CACHE_MAX_BYTES, PASTVU_CACHE_TTL, PASTVU_CACHE_PATH, table="pastvu_nearest")
+    
+    @staticmethod
+    def make_key(cell: str, year: int) -> str:
+        return f"{cell}:{year}"
 
 
 class PastVuAPI:
-    BASE_URL = "https://pastvu.com/api2"
-    PHOTO_BASE_URL = "https://pastvu.com/_p/a/"
+    BASE_URL = PASTVU_API_URL
+    PHOTO_BASE_URL = PASTVU_PHOTO_URL
+    cache = PastVuCache()
+    index: Optional[PhotoIndex] = None
+    
+    @staticmethod
+    def get_index() -> Optional[PhotoIndex]:
+        """Open the offline photo index on first use if one is configured"""
+        if PastVuAPI.index is None and PASTVU_INDEX_MODE != "off" and PASTVU_INDEX_PATH:
+            try:
+                PastVuAPI.index = PhotoIndex(PASTVU_INDEX_PATH)
+            except (OSError, ValueError) as e:
+                print(f"Cannot open PastVu index {PASTVU_INDEX_PATH}: {e}")
+        return PastVuAPI.index
     
     @staticmethod
-    async def get_nearest_photos(lat: float, lon: float, year: int = 1928) -> List[Dict[str, Any]]:
-        """Get nearest historical photos from PastVu API"""
+    async def get_nearest_photos(lat: float, lon: float, year: int = 1928) -> Optional[List[Dict[str, Any]]]:
+        """Get nearest historical photos (local index, then cache, then PastVu API), None if PastVu failed"""
+        index = PastVuAPI.get_index()
+        if index is not None:
+            photos = index.nearest(lat, lon, year)
+            metrics.cache_lookup("pastvu_index", bool(photos))
+            if photos or PASTVU_INDEX_MODE == "only":
+                return photos
+        elif PASTVU_INDEX_MODE == "only":
+            return []
+        
+        # Quantize to a geohash cell so nearby picks share one result
+        cell = geohash.encode(lat, lon, PASTVU_CACHE_PRECISION)
+        key = PastVuCache.make_key(cell, year)
+        
+        photos = await PastVuAPI.cache.get(key)
+        metrics.cache_lookup("pastvu", photos is not None)
+        if photos is not None:
+            return photos
+        
+        cell_lat, cell_lon = geohash.decode(cell)
+        photos = await PastVuAPI.fetch_nearest_photos(cell_lat, cell_lon, year)
+        if photos is None:
+            return None
+        
+        await PastVuAPI.cache.set(key, photos)
+        return photos
+    
+    @staticmethod
+    @singleflight(lambda lat, lon, year=1928: (lat, lon, year))
+    async def fetch_nearest_photos(lat: float, lon: float, year: int = 1928) -> Optional[List[Dict[str, Any]]]:
+        """Request nearest photos from PastVu, None on upstream error"""
         params = {
             "method": "photo.giveNearestPhotos",
             "params": json.dumps({
@@ -19,13 +87,22 @@ class PastVuAPI:
             })
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(PastVuAPI.BASE_URL, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if "result" in data and "photos" in data["result"]:
-                        return data["result"]["photos"]
-                return []
+        session = await HTTPClient.session()
+        async with pastvu_limiter.slot():
+            with metrics.timed("pastvu_fetch"):
+                async with session.get(PastVuAPI.BASE_URL, params=params) as response:
+                    if response.status == 200:
+                        return PastVuAPI.parse_nearest_response(await response.read())
+                    metrics.stage_error("pastvu_fetch")
+                    return None
+    
+    @staticmethod
+    def parse_nearest_response(body: bytes) -> List[Dict[str, Any]]:
+        """Photos from a giveNearestPhotos response body"""
+        data = json.loads(body)
+        if "result" in data and "photos" in data["result"]:
+            return data["result"]["photos"]
+        return []
     
     @staticmethod
     def get_photo_url(file_path: str) -> str:
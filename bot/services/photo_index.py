@@ -0,0 +1,278 @@
+import argparse
+import heapq
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"PVIDX001"
+# magic, cell size (degrees), photo count, cell count, string blob length
+HEADER = struct.Struct("<8sdIIQ")
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def _align(offset: int, size: int = 8) -> int:
+    return (offset + size - 1) // size * size
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class PhotoIndex:
+    """Memory-mapped grid index of PastVu photo metadata
+
+    Photos are sorted by grid cell and stored as fixed-width columns
+    (cid, lat, lon, year, year2) plus a shared UTF-8 blob for titles and
+    file paths, so a lookup only touches the cells around the query point.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        
+        magic, self.cell_size, self.count, cell_count, strings_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a photo index file: {path}")
+        
+        self.rows = int(math.ceil(180 / self.cell_size))
+        self.cols = int(math.ceil(360 / self.cell_size))
+        
+        offset = _align(HEADER.size)
+        
+        def column(fmt: str, length: int) -> memoryview:
+            nonlocal offset
+            itemsize = struct.calcsize(fmt)
+            view = buffer[offset:offset + itemsize * length].cast(fmt)
+            offset = _align(offset + itemsize * length)
+            return view
+        
+        self.cids = column("q", self.count)
+        self.lats = column("f", self.count)
+        self.lons = column("f", self.count)
+        self.years = column("h", self.count)
+        self.years2 = column("h", self.count)
+        self.string_offsets = column("Q", 2 * self.count + 1)
+        cell_keys = column("q", cell_count)
+        cell_starts = column("I", cell_count + 1)
+        self.strings = buffer[offset:offset + strings_len]
+        
+        # Cell key -> (start, end) row range in the sorted columns
+        self.cells = {
+            cell_keys[i]: (cell_starts[i], cell_starts[i + 1])
+            for i in range(cell_count)
+        }
+    
+    def close(self):
+        """Release the memory map"""
+        for view in (self.cids, self.lats, self.lons, self.years, self.years2, self.string_offsets, self.strings):
+            view.release()
+        self._mmap.close()
+        self._file.close()
+    
+    def _string(self, index: int) -> str:
+        start = self.string_offsets[index]
+        end = self.string_offsets[index + 1]
+        return bytes(self.strings[start:end]).decode("utf-8")
+    
+    def photo(self, row: int) -> Dict[str, Any]:
+        """Build a PastVu-shaped photo dict for a stored row"""
+        return {
+            "cid": self.cids[row],
+            "geo": [round(self.lats[row], 6), round(self.lons[row], 6)],
+            "year": self.years[row],
+            "year2": self.years2[row],
+            "title": self._string(2 * row),
+            "file": self._string(2 * row + 1)
+        }
+    
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        year: int = 1928,
+        limit: int = 30,
+        max_distance_km: float = 50.0
+    ) -> List[Dict[str, Any]]:
+        """Answer a giveNearestPhotos query from the local index"""
+        center_row = int((lat + 90) // self.cell_size)
+        center_col = int((lon + 180) // self.cell_size)
+        # A degree of longitude shrinks with cos(lat): reach further across columns
+        # than rows, measured at the search's poleward edge and capped near the poles
+        row_reach = int(math.ceil(max_distance_km / (KM_PER_DEGREE * self.cell_size))) + 1
+        edge_lat = min(89.9, abs(lat) + max_distance_km / KM_PER_DEGREE)
+        col_km = KM_PER_DEGREE * math.cos(math.radians(edge_lat)) * self.cell_size
+        col_reach = min(int(math.ceil(max_distance_km / col_km)) + 1, self.cols // 2 + 1)
+        max_ring = max(row_reach, col_reach)
+        
+        best = []  # max-heap of (-distance, row) limited to `limit` items
+        
+        for ring in range(max_ring + 1):
+            # Nothing in this ring or beyond can beat a full result set
+            if len(best) >= limit:
+                ring_lat = min(89.9, abs(lat) + ring * self.cell_size)
+                ring_min_km = (ring - 1) * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(ring_lat))
+                if ring_min_km > -best[0][0]:
+                    break
+            
+            for row_index, col_index in self._ring_cells(center_row, center_col, ring, row_reach):
+                cell = self.cells.get(row_index * self.cols + col_index)
+                if cell is None:
+                    continue
+                
+                for row in range(cell[0], cell[1]):
+                    if self.years[row] > year:
+                        continue
+                    distance = _haversine_km(lat, lon, self.lats[row], self.lons[row])
+                    if distance > max_distance_km:
+                        continue
+                    if len(best) < limit:
+                        heapq.heappush(best, (-distance, row))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, row))
+        
+        return [self.photo(row) for _, row in sorted(best, reverse=True)]
+    
+    def _ring_cells(self, center_row: int, center_col: int, ring: int, row_reach: int) -> Iterator[tuple]:
+        """Yield (row, col) of grid cells at Chebyshev distance `ring`, at most `row_reach` rows away"""
+        seen = set()
+        for d_row in range(-min(ring, row_reach), min(ring, row_reach) + 1):
+            row = center_row + d_row
+            if row < 0 or row >= self.rows:
+                continue
+            if abs(d_row) == ring:
+                d_cols = range(-ring, ring + 1)
+            else:
+                d_cols = (-ring, ring)
+            for d_col in d_cols:
+                col = (center_col + d_col) % self.cols
+                if (row, col) not in seen:
+                    seen.add((row, col))
+                    yield row, col
+
+
+def _cell_key(lat: float, lon: float, cell_size: float, cols: int) -> int:
+    row = int((lat + 90) // cell_size)
+    col = int((lon + 180) // cell_size) % cols
+    return row * cols + col
+
+
+def build_index(photos: Iterable[Dict[str, Any]], path: str, cell_size: float = 0.05) -> int:
+    """Write photos into an index file, return the number of photos stored"""
+    cols = int(math.ceil(360 / cell_size))
+    unique = {}
+    for photo in photos:
+        geo = photo.get("geo")
+        cid = photo.get("cid")
+        if cid is None or not geo or len(geo) != 2:
+            continue
+        unique[int(cid)] = photo
+    
+    records = []
+    for cid, photo in unique.items():
+        lat, lon = float(photo["geo"][0]), float(photo["geo"][1])
+        year = int(photo.get("year") or 0)
+        year2 = int(photo.get("year2") or year)
+        records.append((_cell_key(lat, lon, cell_size, cols), cid, lat, lon, year, year2,
+                        photo.get("title") or "", photo.get("file") or ""))
+    records.sort()
+    
+    cids = array("q")
+    lats = array("f")
+    lons = array("f")
+    years = array("h")
+    years2 = array("h")
+    string_offsets = array("Q", [0])
+    cell_keys = array("q")
+    cell_starts = array("I")
+    strings = bytearray()
+    
+    for row, (key, cid, lat, lon, year, year2, title, file_path) in enumerate(records):
+        if not cell_keys or cell_keys[-1] != key:
+            cell_keys.append(key)
+            cell_starts.append(row)
+        cids.append(cid)
+        lats.append(lat)
+        lons.append(lon)
+        years.append(year)
+        years2.append(year2)
+        for text in (title, file_path):
+            strings.extend(text.encode("utf-8"))
+            string_offsets.append(len(strings))
+    cell_starts.append(len(records))
+    
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, cell_size, len(records), len(cell_keys), len(strings)))
+        for column in (cids, lats, lons, years, years2, string_offsets, cell_keys, cell_starts):
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(column.tobytes())
+        f.write(b"\0" * (_align(f.tell()) - f.tell()))
+        f.write(bytes(strings))
+    
+    return len(records)
+
+
+def read_photo_dump(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Stream photo dicts from JSON Lines or JSON array files"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            first = f.read(1)
+            while first and first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            if first == "[":
+                yield from json.load(f)
+                continue
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                # Accept raw giveNearestPhotos responses as well as photo dicts
+                if isinstance(item, dict) and "result" in item:
+                    yield from item["result"].get("photos", [])
+                else:
+                    yield item
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for building and querying an index"""
+    parser = argparse.ArgumentParser(description="Offline PastVu photo index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    build = subparsers.add_parser("build", help="Build an index from JSON/JSONL photo dumps")
+    build.add_argument("output")
+    build.add_argument("inputs", nargs="+")
+    build.add_argument("--cell-size", type=float, default=0.05)
+    
+    query = subparsers.add_parser("query", help="Query an index")
+    query.add_argument("index")
+    query.add_argument("lat", type=float)
+    query.add_argument("lon", type=float)
+    query.add_argument("--year", type=int, default=1928)
+    query.add_argument("--limit", type=int, default=30)
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "build":
+        count = build_index(read_photo_dump(args.inputs), args.output, args.cell_size)
+        print(f"Indexed {count} photos into {args.output}")
+    elif args.command == "query":
+        index = PhotoIndex(args.index)
+        json.dump(index.nearest(args.lat, args.lon, args.year, args.limit), sys.stdout, ensure_ascii=False, indent=2)
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from bot.utils.config import PHOTO_STORE_MAX_RECORDS
+
+
+class PhotoRecord:
+    """Compact immutable-by-convention view of one PastVu photo"""
+    
+    __slots__ = ("cid", "lat", "lon", "year", "year2", "title", "file")
+    
+    def __init__(self, cid: int, lat: Optional[float], lon: Optional[float], year: Optional[int],
+                 year2: Optional[int], title: str, file: str):
+        self.cid = cid
+        self.lat = lat
+        self.lon = lon
+        self.year = year
+        self.year2 = year2
+        self.title = title
+        self.file = file
+    
+    @classmethod
+    def from_dict(cls, photo: Dict[str, Any]) -> "PhotoRecord":
+        """Build a record from a raw PastVu photo dict"""
+        geo = photo.get("geo") or [None, None]
+        # Titles repeat across nearby photos and series, keep one copy of each
+        return cls(
+            cid=int(photo["cid"]),
+            lat=geo[0],
+            lon=geo[1],
+            year=photo.get("year"),
+            year2=photo.get("year2"),
+            title=sys.intern(photo.get("title") or ""),
+            file=photo.get("file") or ""
+        )
+    
+    @property
+    def geo(self) -> Optional[List[float]]:
+        return [self.lat, self.lon] if self.lat is not None else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """PastVu-shaped dict for serialization"""
+        return {
+            "cid": self.cid,
+            "geo": self.geo,
+            "year": self.year,
+            "year2": self.year2,
+            "title": self.title,
+            "file": self.file
+        }
+
+
+class PhotoStore:
+    """Process-wide interned photo records keyed by cid
+    
+    Sessions keep only cids; every session looking at the same place
+    shares the same records.
+    """
+    
+    def __init__(self, max_records: int = PHOTO_STORE_MAX_RECORDS):
+        self.max_records = max_records
+        self._records: "OrderedDict[int, PhotoRecord]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def add_many(self, photos: Iterable[Dict[str, Any]]) -> List[int]:
+        """Intern photos, return their cids in the same order"""
+        cids = []
+        for photo in photos:
+            cid = int(photo["cid"])
+            if cid in self._records:
+                self._records.move_to_end(cid)
+            else:
+                self._records[cid] = PhotoRecord.from_dict(photo)
+            cids.append(cid)
+        
+        while len(self._records) > self.max_records:
+            self._records.popitem(last=False)
+        return cids
+    
+    def get(self, cid: Optional[int]) -> Optional[PhotoRecord]:
+        """Record for cid, None if unknown (e.g. evicted or after restart)"""
+        if cid is None:
+            return None
+        record = self._records.get(cid)
+        if record is not None:
+            self._records.move_to_end(cid)
+        return record
+
+
+photo_store = PhotoStore()
\ No newline at end of file
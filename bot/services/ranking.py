@@ -0,0 +1,133 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# Oldest PastVu photos date from the late 1820s, the default query stops at 1928
+YEAR_FLOOR = 1826
+YEAR_CEIL = 1928
+
+# Keywords match whole words of the title. A trailing "*" matches any ending,
+# so one stem covers every Russian case; keywords with a space are phrases.
+
+# Titles that usually mean an outdoor street or building view
+BUILDING_KEYWORDS = (
+    "улиц*", "ул", "площад*", "проспект*", "переул*", "бульвар*", "набережн*", "шоссе",
+    "мост", "моста", "мосту", "мостом", "дом", "дома", "доме", "домов", "здани*", "церк*",
+    "собор*", "храм*", "монастыр*", "вокзал*", "кремл*", "башн*", "ворот*", "усадьб*",
+    "театр*", "гостиниц*", "вид на", "панорам*", "квартал*",
+    "street*", "square*", "avenue*", "boulevard*", "bridge*", "church*", "cathedral*",
+    "building*", "house", "houses", "station*", "tower*", "view", "views",
+)
+# Scenes that animate well: traffic, crowds, water, weather
+MOTION_KEYWORDS = (
+    "трамва*", "извозчик*", "конка", "конки", "конке", "конку", "конкой", "рынок", "рынк*",
+    "базар*", "ярмарк*", "толп*", "парад*", "набережн*", "пристан*", "гаван*",
+    "река", "реки", "реке", "реку", "рекой", "площад*", "улиц*", "проспект*",
+    "tram*", "market*", "crowd*", "parade*", "harbo*", "river*", "street*", "square*",
+)
+# People, interiors and documents rarely make a good street video
+NEGATIVE_KEYWORDS = (
+    "портрет*", "групп*", "семья", "семьи", "семье", "семью", "семьей", "семьёй",
+    "интерьер*", "в комнате", "кабинет*", "выпускник*", "документ*", "открытк*",
+    "карта", "карты", "карте", "план", "плана", "плане", "схем*", "чертеж*", "чертёж*",
+    "рисунок", "рисунк*", "картин*",
+    "portrait*", "group*", "family", "interior*", "room", "rooms", "document*", "map", "maps",
+    "drawing*",
+)
+
+WEIGHT_YEAR = 0.45
+WEIGHT_DISTANCE = 0.2
+WEIGHT_BUILDING = 0.2
+WEIGHT_VIDEO = 0.15
+DISTANCE_SCALE_KM = 1.0
+
+_WORD_RE = re.compile(r"\s+")
+
+
+def _alternation(patterns: List[str]) -> str:
+    # Longest first, so a word is credited to its most specific keyword
+    return "|".join(sorted(patterns, key=len, reverse=True)) or "(?!)"
+
+
+class _KeywordSet:
+    """Keywords compiled into one regex that only matches at word boundaries"""
+    
+    __slots__ = ("pattern",)
+    
+    def __init__(self, keywords: tuple):
+        stems = [re.escape(k[:-1]) for k in keywords if k.endswith("*")]
+        words = [re.escape(k) for k in keywords if not k.endswith("*") and " " not in k]
+        phrases = [r"\s+".join(re.escape(part) for part in k.split()) for k in keywords if " " in k]
+        self.pattern = re.compile(
+            rf"\b(?:({_alternation(stems)})\w*|({_alternation(words)})\b|({_alternation(phrases)})\b)"
+        )
+    
+    def hits(self, title: str) -> int:
+        """Number of distinct keywords found in a title"""
+        return len({"".join(match) for match in self.pattern.findall(title)})
+
+
+_BUILDING = _KeywordSet(BUILDING_KEYWORDS)
+_MOTION = _KeywordSet(MOTION_KEYWORDS)
+_NEGATIVE = _KeywordSet(NEGATIVE_KEYWORDS)
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance, accurate enough at city scale"""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371.0 * math.hypot(x, y)
+
+
+class PhotoRanker:
+    """Deterministic local scoring of PastVu photos for video generation"""
+    
+    @staticmethod
+    def score(photos: List[Dict[str, Any]], lat: Optional[float] = None, lon: Optional[float] = None) -> List[float]:
+        """Score all photos in one pass over feature columns"""
+        # Extract feature columns once
+        titles = [_WORD_RE.sub(" ", str(p.get("title") or "")).lower() for p in photos]
+        years = [p.get("year") for p in photos]
+        geos = [p.get("geo") for p in photos]
+        has_direction = [bool(p.get("dir")) for p in photos]
+        
+        span = YEAR_CEIL - YEAR_FLOOR
+        year_scores = [
+            min(1.0, max(0.0, (YEAR_CEIL - year) / span)) if isinstance(year, (int, float)) and year > 0 else 0.0
+            for year in years
+        ]
+        
+        if lat is not None and lon is not None:
+            distance_scores = [
+                math.exp(-_distance_km(lat, lon, geo[0], geo[1]) / DISTANCE_SCALE_KM) if geo and len(geo) == 2 else 0.0
+                for geo in geos
+            ]
+        else:
+            distance_scores = [0.0] * len(photos)
+        
+        building = [_BUILDING.hits(title) for title in titles]
+        motion = [_MOTION.hits(title) for title in titles]
+        negative = [_NEGATIVE.hits(title) for title in titles]
+        
+        building_scores = [min(1.0, hits / 2) - min(1.0, neg) for hits, neg in zip(building, negative)]
+        # Photos with a known shooting direction are almost always outdoor views
+        video_scores = [
+            min(1.0, hits / 2) * 0.7 + (0.3 if direction else 0.0) - 0.5 * min(1.0, neg)
+            for hits, direction, neg in zip(motion, has_direction, negative)
+        ]
+        
+        return [
+            WEIGHT_YEAR * y + WEIGHT_DISTANCE * d + WEIGHT_BUILDING * b + WEIGHT_VIDEO * v
+            for y, d, b, v in zip(year_scores, distance_scores, building_scores, video_scores)
+        ]
+    
+    @staticmethod
+    def rank(photos: List[Dict[str, Any]], lat: Optional[float] = None, lon: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return photos ordered from best to worst candidate"""
+        scores = PhotoRanker.score(photos, lat, lon)
+        # Ties go to the older photo, then to the lower cid for determinism
+        order = sorted(
+            range(len(photos)),
+            key=lambda i: (-scores[i], photos[i].get("year") or 9999, photos[i].get("cid") or 0)
+        )
+        return [photos[i] for i in order]
\ No newline at end of file
@@ -1,7 +1,9 @@
-import aiohttp
-import asyncio
 from typing import Optional, Dict, Any
-from bot.utils.config import RUNWAY_API_KEY
+from bot.services.http_client import HTTPClient
+from bot.services.runway_poller import RunwayPoller
+from bot.services.video_cache import VideoCache
+from bot.utils import metrics
+from bot.utils.config import RUNWAY_API_KEY, RUNWAY_API_URL
 
 video_prompt = """
 Hand-tint this early-1900s street photo and add subtle parallax:
@@ -16,12 +18,15 @@ Hand-tint this early-1900s street photo and add subtle parallax:
 
 
 class RunwayAPI:
-    BASE_URL = "https://api.dev.runwayml.com/v1"
+    BASE_URL = RUNWAY_API_URL
     HEADERS = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {RUNWAY_API_KEY}",
         "X-Runway-Version": "2024-11-06"
     }
+    MODEL = "gen4_turbo"
+    RATIO = "1280:720"
+    DURATION = 5
     
     @staticmethod
     async def create_video_from_image(image_url: str, prompt: str = video_prompt) -> Optional[str]:
@@ -29,13 +34,14 @@ class RunwayAPI:
         payload = {
             "promptImage": image_url,
             "promptText": prompt,
-            "model": "gen4_turbo",
-            "ratio": "1280:720",
-            "duration": 5
+            "model": RunwayAPI.MODEL,
+            "ratio": RunwayAPI.RATIO,
+            "duration": RunwayAPI.DURATION
         }
         
-        async with aiohttp.ClientSession() as session:
-            # Create task
+        session = await HTTPClient.session()
+        # Create task
+        with metrics.timed("runway_create"):
             async with session.post(
                 f"{RunwayAPI.BASE_URL}/image_to_video",
                 json=payload,
@@ -43,12 +49,14 @@ class RunwayAPI:
             ) as response:
                 if response.status != 200:
                     print(f"Error creating video task: {await response.text()}")
+                    metrics.stage_error("runway_create")
                     return None
                 
                 data = await response.json()
                 task_id = data.get("id")
                 
                 if not task_id:
+                    metrics.stage_error("runway_create")
                     return None
                 
                 return task_id
@@ -56,47 +64,28 @@ class RunwayAPI:
     @staticmethod
     async def get_task_status(task_id: str) -> Dict[str, Any]:
         """Get status of video generation task"""
-        async with aiohttp.ClientSession() as session:
+        session = await HTTPClient.session()
+        with metrics.timed("runway_status"):
             async with session.get(
                 f"{RunwayAPI.BASE_URL}/tasks/{task_id}",
                 headers=RunwayAPI.HEADERS
             ) as response:
                 if response.status == 200:
                     return await response.json()
+                metrics.stage_error("runway_status")
                 return {"status": "ERROR", "error": await response.text()}
     
+    @staticmethod
+    def video_cache_key(photo_file: str, prompt: str = video_prompt) -> str:
+        """Cache key for a video generated from this photo with current settings"""
+        return VideoCache.make_key(photo_file, prompt, RunwayAPI.MODEL, RunwayAPI.RATIO, RunwayAPI.DURATION)
+    
     @staticmethod
     async def wait_for_video(task_id: str, progress_callback=None) -> Optional[str]:
         """Wait for video generation to complete with progress updates"""
-        max_attempts = 120  # 6 minutes max
-        attempt = 0
-        last_progress = -1
-        
-        while attempt < max_attempts:
-            status_data = await RunwayAPI.get_task_status(task_id)
-            status = status_data.get("status")
-            
-            if status == "SUCCEEDED":
-                output = status_data.get("output", [])
-                return output[0] if output else None
-            
-            elif status == "FAILED" or status == "ERROR":
-                print(f"Video generation failed: {status_data}")
-                return None
-            
-            # Call progress callback if provided
-            if progress_callback:
-                if status == "RUNNING":
-                    progress = float(status_data.get("progress", 0))
-                    # Update only if progress changed significantly
-                    if abs(progress - last_progress) > 0.01:
-                        await progress_callback(progress)
-                        last_progress = progress
-                elif status == "PENDING":
-                    # Show initial progress for pending status
-                    await progress_callback(0.0)
-            
-            await asyncio.sleep(1.5)  # Check more frequently - every 1.5 seconds
-            attempt += 1
-        
-        return None
\ No newline at end of file
+        # Polling is shared across all users by a single scheduler
+        return await RunwayAPI.poller.wait(task_id, progress_callback)
+
+
+RunwayAPI.poller = RunwayPoller(RunwayAPI.get_task_status)
+RunwayAPI.cache = VideoCache()
\ No newline at end of file
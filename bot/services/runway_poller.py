@@ -0,0 +1,188 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from bot.utils import metrics
+from bot.utils.config import (
+    RUNWAY_POLL_MIN_INTERVAL,
+    RUNWAY_POLL_MAX_INTERVAL,
+    RUNWAY_POLL_CONCURRENCY,
+    RUNWAY_TASK_TIMEOUT,
+    RUNWAY_EXPECTED_DURATION,
+)
+
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+
+class PolledTask:
+    """Bookkeeping for one Runway task owned by the poller"""
+    
+    __slots__ = ("task_id", "future", "callbacks", "started_at", "next_poll_at", "last_progress", "status")
+    
+    def __init__(self, task_id: str, future: asyncio.Future):
+        self.task_id = task_id
+        self.future = future
+        self.callbacks = []
+        self.started_at = time.monotonic()
+        self.next_poll_at = self.started_at + RUNWAY_POLL_MIN_INTERVAL
+        self.last_progress = -1.0
+        self.status = "PENDING"
+
+
+class RunwayPoller:
+    """Single scheduler that polls every in-flight Runway task
+
+    Each task gets its own next-poll time: it is polled often near the
+    expected finish and rarely while far from it, and all waiters share
+    the same future, so adding users doesn't add poll loops.
+    """
+    
+    def __init__(self, get_status: Callable[[str], Awaitable[Dict[str, Any]]]):
+        self.get_status = get_status
+        self.tasks: Dict[str, PolledTask] = {}
+        self.polls = 0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._semaphore = asyncio.Semaphore(RUNWAY_POLL_CONCURRENCY)
+        # Progress callbacks in flight; they run beside the loop, never inside it
+        self._callbacks = set()
+    
+    def start(self):
+        """Start the scheduler loop if it isn't running"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run(), name="runway-poller")
+    
+    async def stop(self):
+        """Stop the scheduler loop; pending waiters keep their futures"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+    
+    def watch(self, task_id: str, progress_callback: Optional[ProgressCallback] = None) -> asyncio.Future:
+        """Register interest in a task, return a future with the output URL"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            task = PolledTask(task_id, asyncio.get_running_loop().create_future())
+            self.tasks[task_id] = task
+            self._wakeup.set()
+        if progress_callback is not None:
+            task.callbacks.append(progress_callback)
+        self.start()
+        return task.future
+    
+    async def wait(self, task_id: str, progress_callback: Optional[ProgressCallback] = None) -> Optional[str]:
+        """Wait until the task finishes, return the output URL or None"""
+        return await asyncio.shield(self.watch(task_id, progress_callback))
+    
+    def next_interval(self, task: PolledTask) -> float:
+        """Adaptive delay before the next poll of a task"""
+        elapsed = time.monotonic() - task.started_at
+        
+        if task.status == "RUNNING" and task.last_progress > 0.05:
+            # Extrapolate finish time from reported progress
+            remaining = elapsed * (1 - task.last_progress) / task.last_progress
+        else:
+            remaining = RUNWAY_EXPECTED_DURATION - elapsed
+        
+        if remaining <= 0:
+            # Overdue: poll at the fastest rate so completion isn't delayed
+            return RUNWAY_POLL_MIN_INTERVAL
+        # Halve the gap to the expected finish on every poll
+        return min(RUNWAY_POLL_MAX_INTERVAL, max(RUNWAY_POLL_MIN_INTERVAL, remaining / 2))
+    
+    @staticmethod
+    def parse_progress(value: Any) -> float:
+        """Runway's progress as a 0..1 float; anything unparseable counts as 0"""
+        try:
+            progress = float(value or 0)
+        except (TypeError, ValueError):
+            return 0.0
+        if math.isnan(progress):
+            return 0.0
+        return min(1.0, max(0.0, progress))
+    
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            due = [task for task in self.tasks.values() if task.next_poll_at <= now]
+            
+            if due:
+                await asyncio.gather(*(self._poll(task) for task in due), return_exceptions=True)
+                continue
+            
+            if self.tasks:
+                delay = min(task.next_poll_at for task in self.tasks.values()) - now
+            else:
+                delay = None
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _poll(self, task: PolledTask):
+        async with self._semaphore:
+            try:
+                status_data = await self.get_status(task.task_id)
+            except Exception as e:
+                status_data = {"status": "RETRY", "error": str(e)}
+        self.polls += 1
+        
+        try:
+            self._update(task, status_data)
+        except Exception as e:
+            # One malformed answer must not stop polling for every other task
+            print(f"Cannot handle Runway status for {task.task_id}: {e!r}")
+            task.next_poll_at = time.monotonic() + self.next_interval(task)
+    
+    def _update(self, task: PolledTask, status_data: Dict[str, Any]):
+        status = status_data.get("status")
+        
+        if status == "SUCCEEDED":
+            output = status_data.get("output", [])
+            self._finish(task, output[0] if output else None)
+            return
+        
+        if status in ("FAILED", "ERROR", "CANCELLED"):
+            print(f"Video generation failed: {status_data}")
+            self._finish(task, None)
+            return
+        
+        if time.monotonic() - task.started_at > RUNWAY_TASK_TIMEOUT:
+            print(f"Video generation timed out: {task.task_id}")
+            self._finish(task, None)
+            return
+        
+        if status in ("RUNNING", "PENDING", "THROTTLED"):
+            task.status = status
+            progress = self.parse_progress(status_data.get("progress")) if status == "RUNNING" else 0.0
+            if abs(progress - task.last_progress) > 0.01:
+                task.last_progress = progress
+                for callback in task.callbacks:
+                    # A slow Telegram edit mustn't hold up polling of other tasks
+                    runner = asyncio.create_task(self._notify(callback, progress), name="runway-progress")
+                    self._callbacks.add(runner)
+                    runner.add_done_callback(self._callbacks.discard)
+        
+        task.next_poll_at = time.monotonic() + self.next_interval(task)
+    
+    @staticmethod
+    async def _notify(callback: ProgressCallback, progress: float):
+        try:
+            await callback(progress)
+        except Exception:
+            pass
+    
+    def _finish(self, task: PolledTask, result: Optional[str]):
+        self.tasks.pop(task.task_id, None)
+        # Time to complete is counted from when this process started watching the task
+        metrics.observe("runway_complete", time.monotonic() - task.started_at)
+        if result is None:
+            metrics.stage_error("runway_complete")
+        if not task.future.done():
+            task.future.set_result(result)
\ No newline at end of file
@@ -0,0 +1,52 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+from bot.utils.cache import SQLiteCache
+from bot.utils.config import VIDEO_CACHE_PATH, VIDEO_CACHE_TTL, VIDEO_URL_TTL
+
+
+class VideoCache:
+    """Generated videos keyed by source photo and generation parameters
+    
+    Entries hold the Runway output URL (which expires upstream) and the
+    Telegram file_id of the sent video (which doesn't).
+    """
+    
+    def __init__(self):
+        self.store = SQLiteCache(VIDEO_CACHE_PATH, table="videos", ttl=VIDEO_CACHE_TTL)
+    
+    @staticmethod
+    def make_key(photo_file: str, prompt: str, model: str, ratio: str, duration: int) -> str:
+        """Content address for one photo + prompt + generation settings"""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = json.dumps([photo_file, prompt_hash, model, ratio, duration])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Dict[str, Any]:
+        """Return usable cached video data: file_id and/or unexpired video_url"""
+        entry = self.store.get(key) or {}
+        if entry.get("video_url") and entry.get("url_expires_at", 0) < time.time():
+            entry.pop("video_url")
+        return entry
+    
+    def set_video_url(self, key: str, video_url: str):
+        """Remember the Runway output URL until it expires upstream"""
+        entry = self.store.get(key) or {}
+        entry["video_url"] = video_url
+        entry["url_expires_at"] = time.time() + VIDEO_URL_TTL
+        self.store.set(key, entry)
+    
+    def set_file_id(self, key: str, file_id: Optional[str]):
+        """Remember the Telegram file_id of a sent video"""
+        if not file_id:
+            return
+        entry = self.store.get(key) or {}
+        entry["file_id"] = file_id
+        self.store.set(key, entry)
+    
+    def forget_file_id(self, key: str):
+        """Drop a file_id Telegram no longer accepts, keeping the rest of the entry"""
+        entry = self.store.get(key)
+        if entry and entry.pop("file_id", None):
+            self.store.set(key, entry)
\ No newline at end of file
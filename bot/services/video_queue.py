@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from bot.utils import metrics
+from bot.utils.config import VIDEO_QUEUE_PATH, VIDEO_WORKERS
+
+# Job lifecycle: queued -> submitting -> submitted (has task_id) -> done | failed
+QUEUED = "queued"
+SUBMITTING = "submitting"
+SUBMITTED = "submitted"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, SUBMITTING, SUBMITTED)
+
+JobHandler = Callable[["VideoJobQueue", Dict[str, Any]], Awaitable[None]]
+# Idle workers re-check the database this often for jobs enqueued by other processes
+POLL_INTERVAL = 2.0
+# A claimed job belongs to one process for this long; the owner renews it while the
+# job runs, so a crashed process's jobs are taken over once their lease runs out
+LEASE_TTL = 60.0
+# Queued job ids in fair order: a chat's n-th active job waits until every
+# other chat's earlier jobs have started, so one heavy user can't fill the pool
+FAIR_ORDER_SQL = (
+    "WITH running AS ("
+    "SELECT chat_id, COUNT(*) AS n FROM video_jobs WHERE status IN (?, ?) GROUP BY chat_id"
+    ") "
+    "SELECT q.id FROM ("
+    "SELECT id, chat_id, ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY id) AS n "
+    "FROM video_jobs WHERE status = ?"
+    ") q LEFT JOIN running r ON r.chat_id = q.chat_id "
+    "ORDER BY q.n + COALESCE(r.n, 0), q.id"
+)
+
+
+class VideoJobQueue:
+    """Durable SQLite-backed queue of video jobs served by a bounded worker pool"""
+    
+    def __init__(self, path: str = VIDEO_QUEUE_PATH, workers: int = VIDEO_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._handler: Optional[JobHandler] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        # Lease holder name of this process
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.busy = 0
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the bot creates no files
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+    
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS video_jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "chat_id INTEGER NOT NULL, "
+            "user_id INTEGER, "
+            "photo TEXT NOT NULL, "
+            "cache_key TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "task_id TEXT, "
+            "status_message_id INTEGER, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, "
+            "owner TEXT, "
+            "lease_until REAL)"
+        )
+        # Queue files from before leases existed
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(video_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE video_jobs ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS video_jobs_status ON video_jobs (status, id)")
+        # Per-chat ranking of queued jobs in FAIR_ORDER_SQL
+        conn.execute("CREATE INDEX IF NOT EXISTS video_jobs_fair ON video_jobs (status, chat_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS video_jobs_chat ON video_jobs (chat_id, status)")
+        return conn
+    
+    def start(self, handler: JobHandler):
+        """Start the worker pool; interrupted jobs are recovered as their leases expire"""
+        self._handler = handler
+        self._tasks = [asyncio.create_task(self._worker(), name=f"video-worker-{i}") for i in range(self.workers)]
+    
+    async def stop(self):
+        """Stop workers; unfinished jobs stay in the database for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def enqueue(self, chat_id: int, user_id: Optional[int], photo: Dict[str, Any], cache_key: str) -> Tuple[int, int]:
+        """Add a job, return (job_id, number of jobs ahead of it)"""
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT INTO video_jobs (chat_id, user_id, photo, cache_key, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, user_id, json.dumps(photo, ensure_ascii=False), cache_key, QUEUED, now, now)
+        )
+        self._wakeup.set()
+        return cursor.lastrowid, self.position(cursor.lastrowid)
+    
+    def position(self, job_id: int) -> int:
+        """How many jobs must start before this one gets a free worker"""
+        order = [row[0] for row in self._conn.execute(FAIR_ORDER_SQL, self._fair_order_params())]
+        ahead = order.index(job_id) if job_id in order else 0
+        # Counted from the database: jobs may be enqueued and run by different processes
+        running = self._conn.execute(
+            "SELECT COUNT(*) FROM video_jobs WHERE status IN (?, ?)", (SUBMITTING, SUBMITTED)
+        ).fetchone()[0]
+        free_workers = self.workers - running
+        return max(0, ahead + 1 - free_workers)
+    
+    def queued_count(self) -> int:
+        """Jobs waiting for a worker, across all processes"""
+        return self._conn.execute("SELECT COUNT(*) FROM video_jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+    
+    def active_count(self, chat_id: int) -> int:
+        """Jobs of a chat that are queued or running"""
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM video_jobs WHERE chat_id = ? AND status IN ({placeholders})",
+            (chat_id, *ACTIVE_STATUSES)
+        ).fetchone()[0]
+    
+    def find_active(self, chat_id: int, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Active job for the same chat and video, if any"""
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        row = self._conn.execute(
+            f"SELECT * FROM video_jobs WHERE chat_id = ? AND cache_key = ? AND status IN ({placeholders})",
+            (chat_id, cache_key, *ACTIVE_STATUSES)
+        ).fetchone()
+        return self._to_job(row)
+    
+    def update(self, job_id: int, **fields):
+        """Persist job field changes (status, task_id, status_message_id)"""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._conn.execute(
+            f"UPDATE video_jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+    
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the next job: already submitted tasks first, then queued ones in fair order"""
+        now = time.time()
+        # A crash during submit leaves no task id, so the job is retried from scratch
+        self._conn.execute(
+            "UPDATE video_jobs SET status = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+            (QUEUED, now, SUBMITTING, now)
+        )
+        
+        # Submitted jobs already hold a Runway slot and only need polling, by whoever
+        # holds their lease; a dead owner's jobs are taken over when it runs out
+        candidates = [
+            (row[0], SUBMITTED, SUBMITTED) for row in self._conn.execute(
+                "SELECT id FROM video_jobs WHERE status = ? AND (lease_until IS NULL OR lease_until < ?) ORDER BY id",
+                (SUBMITTED, now)
+            )
+        ]
+        if not candidates:
+            candidates = [
+                (row[0], QUEUED, SUBMITTING)
+                for row in self._conn.execute(FAIR_ORDER_SQL + " LIMIT 8", self._fair_order_params())
+            ]
+        
+        for job_id, status, new_status in candidates:
+            # Conditional update so only one claimant, in any process, wins the job
+            cursor = self._conn.execute(
+                "UPDATE video_jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (new_status, self.owner, now + LEASE_TTL, now, job_id, status, now)
+            )
+            if cursor.rowcount == 1:
+                row = self._conn.execute("SELECT * FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+                return self._to_job(row)
+        return None
+    
+    def _renew(self, job_id: int) -> bool:
+        """Extend this process's lease on a job, False if it was lost"""
+        cursor = self._conn.execute(
+            "UPDATE video_jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+            (time.time() + LEASE_TTL, job_id, self.owner)
+        )
+        return cursor.rowcount == 1
+    
+    def _release(self, job_id: int):
+        """Give up the lease so another process can resume an unfinished job at once"""
+        self._conn.execute(
+            "UPDATE video_jobs SET owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+            (job_id, self.owner)
+        )
+    
+    async def _keep_lease(self, job_id: int):
+        while True:
+            await asyncio.sleep(LEASE_TTL / 3)
+            if not self._renew(job_id):
+                print(f"Video job {job_id}: lease lost to another process")
+                return
+    
+    async def _worker(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self.busy += 1
+            metrics.IN_FLIGHT.labels("video_jobs").inc()
+            lease = asyncio.create_task(self._keep_lease(job["id"]), name=f"video-lease-{job['id']}")
+            try:
+                await self._handler(self, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Video job {job['id']} failed: {e}")
+                self.update(job["id"], status=FAILED)
+            finally:
+                lease.cancel()
+                self._release(job["id"])
+                self.busy -= 1
+                metrics.IN_FLIGHT.labels("video_jobs").dec()
+    
+    @staticmethod
+    def _fair_order_params() -> Tuple[str, ...]:
+        return (SUBMITTING, SUBMITTED, QUEUED)
+    
+    @staticmethod
+    def _to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["photo"] = json.loads(job["photo"])
+        return job
+
+
+video_queue = VideoJobQueue()
\ No newline at end of file
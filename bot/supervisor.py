@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import aiohttp
+from aiohttp import web
+from bot.utils.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    TELEGRAM_API_URL,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS,
+    TELEGRAM_GLOBAL_RATE,
+    UPDATE_CONCURRENCY,
+    UPDATE_MAX_PENDING,
+    SHUTDOWN_DRAIN_TIMEOUT,
+)
+from bot.app import create_bot, create_dispatcher, start_services, stop_services
+from bot.services.http_client import HTTPClient
+from bot.utils import metrics
+from bot.webhook import UpdateSpool, webhook_secret
+
+# Long-poll timeout for getUpdates, seconds
+POLL_TIMEOUT = 30
+# How often dead workers are noticed and restarted, seconds
+MONITOR_INTERVAL = 5.0
+
+# Spawn, not fork: module singletons hold SQLite connections and event-loop state
+mp = multiprocessing.get_context("spawn")
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Chat a raw update belongs to, used as its shard key"""
+    for name, payload in update.items():
+        if name == "update_id" or not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+def worker_main(index: int, inbox):
+    """Entry point of a worker process"""
+    # Ctrl+C reaches the whole process group; workers stop on the supervisor's signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format=f"[worker {index}] %(levelname)s:%(name)s:%(message)s",
+        force=True
+    )
+    asyncio.run(run_worker(index, inbox))
+
+
+async def run_worker(index: int, inbox):
+    """Feed updates routed to this worker into its own dispatcher"""
+    bot = create_bot()
+    dp = create_dispatcher()
+    # Jobs are claimed through the shared queue database, one process runs them
+    await start_services(bot, run_video_queue=index == 0)
+    
+    spool = UpdateSpool()
+    semaphore = asyncio.Semaphore(UPDATE_CONCURRENCY)
+    tasks = set()
+    # Updates of a chat run one after another, different chats run concurrently
+    pending: Dict[int, Deque[Dict[str, Any]]] = {}
+    loop = asyncio.get_running_loop()
+    
+    async def process(chat_id: int):
+        updates = pending[chat_id]
+        try:
+            while updates:
+                update = updates[0]
+                try:
+                    await dp.feed_raw_update(bot, update)
+                except asyncio.CancelledError:
+                    # Cut off by shutdown: left in the spool for the next start
+                    raise
+                except Exception:
+                    logging.exception("Update %s failed", update.get("update_id"))
+                finally:
+                    updates.popleft()
+                    semaphore.release()
+                spool.remove(update["update_id"])
+        finally:
+            del pending[chat_id]
+    
+    logging.info("Worker %d started (pid %d)", index, os.getpid())
+    try:
+        while True:
+            update = await loop.run_in_executor(None, inbox.get)
+            if update is None:
+                break
+            await semaphore.acquire()
+            chat_id = update_chat_id(update)
+            if chat_id in pending:
+                pending[chat_id].append(update)
+                continue
+            pending[chat_id] = deque([update])
+            task = asyncio.create_task(process(chat_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        
+        if tasks:
+            await asyncio.wait(tasks, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+    finally:
+        await dp.storage.close()
+        await stop_services(bot)
+        spool.close()
+
+
+class Supervisor:
+    """Receives updates and routes them to worker processes by chat id
+
+    All updates of a chat go to the same worker, so its FSM session and
+    in-process caches see them in order. Workers share sessions, caches
+    and the video queue through the SQLite files under data/ (or Redis
+    for FSM_STORAGE=redis).
+    
+    An update is written to the spool before it is acknowledged to
+    Telegram, and the worker removes it once handled. Updates a dead
+    worker had taken are queued again, and those left over by a timed-out
+    drain are replayed on the next start.
+    """
+    
+    def __init__(self, count: int):
+        self.count = count
+        self.inboxes = [mp.Queue(maxsize=UPDATE_MAX_PENDING) for _ in range(count)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * count
+        self.spool = UpdateSpool()
+        self.accepting = True
+    
+    def start(self):
+        metrics.reset_multiprocess_dir()
+        for index in range(self.count):
+            self._spawn(index)
+    
+    def rate_share(self, index: int) -> float:
+        """Worker's part of the global Telegram rate"""
+        # Worker 0 also runs the video queue and its progress edits, so it gets two shares
+        shares = 2 if index == 0 else 1
+        return TELEGRAM_GLOBAL_RATE * shares / (self.count + 1)
+    
+    def _spawn(self, index: int):
+        # Read by the spawned process's config on import
+        os.environ["TELEGRAM_GLOBAL_RATE"] = str(self.rate_share(index))
+        process = mp.Process(target=worker_main, args=(index, self.inboxes[index]), name=f"bot-worker-{index}")
+        process.start()
+        self.processes[index] = process
+    
+    async def monitor(self):
+        """Restart workers that died, queueing the updates they had taken again"""
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if self.accepting and process is not None and not process.is_alive():
+                    logging.warning("Worker %d exited with %s, restarting", index, process.exitcode)
+                    metrics.mark_process_dead(process.pid)
+                    updates = self._unfinished(index)
+                    self._spawn(index)
+                    await self._put_all(updates)
+    
+    def _unfinished(self, index: int) -> List[Dict[str, Any]]:
+        """Empty a worker's inbox and return every spooled update of its chats, oldest first"""
+        inbox = self.inboxes[index]
+        # Whatever the dead worker had taken out of the inbox is only in the spool
+        while True:
+            try:
+                inbox.get_nowait()
+            except queue.Empty:
+                break
+        return [update for update in self.spool.pending() if self._inbox(update) is inbox]
+    
+    async def replay(self):
+        """Route updates left in the spool by the previous run"""
+        updates = self.spool.pending()
+        if updates:
+            logging.info("Replaying %d updates left unfinished by the previous run", len(updates))
+            await self._put_all(updates)
+    
+    async def _put_all(self, updates: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        for update in updates:
+            await loop.run_in_executor(None, self._inbox(update).put, update)
+    
+    def _inbox(self, update: Dict[str, Any]):
+        return self.inboxes[update_chat_id(update) % self.count]
+    
+    def route(self, update: Dict[str, Any]) -> bool:
+        """Spool an update and hand it to its worker, False if that worker is backed up"""
+        # Spooled first: the worker removes it as soon as it is handled
+        self.spool.add(update)
+        try:
+            self._inbox(update).put_nowait(update)
+        except queue.Full:
+            self.spool.remove(update["update_id"])
+            return False
+        return True
+    
+    async def stop(self):
+        """Let workers drain their inboxes and exit"""
+        self.accepting = False
+        loop = asyncio.get_running_loop()
+        for inbox in self.inboxes:
+            await loop.run_in_executor(None, inbox.put, None)
+        
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, SHUTDOWN_DRAIN_TIMEOUT + 5)
+            if process.is_alive():
+                logging.warning("Worker %d didn't stop in time, terminating", index)
+                process.terminate()
+            metrics.mark_process_dead(process.pid)
+    
+    async def poll(self, allowed_updates: List[str]):
+        """Receive updates with getUpdates and route them"""
+        url = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}"
+        session = await HTTPClient.session()
+        timeout = aiohttp.ClientTimeout(total=POLL_TIMEOUT + 10)
+        
+        async with session.post(f"{url}/deleteWebhook", json={"drop_pending_updates": True}) as response:
+            await response.read()
+        
+        offset = None
+        while True:
+            try:
+                async with session.post(
+                    f"{url}/getUpdates",
+                    json={"offset": offset, "timeout": POLL_TIMEOUT, "allowed_updates": allowed_updates},
+                    timeout=timeout
+                ) as response:
+                    payload = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning("getUpdates failed: %s", e)
+                await asyncio.sleep(1)
+                continue
+            
+            if not payload.get("ok"):
+                retry_after = (payload.get("parameters") or {}).get("retry_after", 1)
+                logging.warning("getUpdates error: %s", payload.get("description"))
+                await asyncio.sleep(retry_after)
+                continue
+            
+            for update in payload["result"]:
+                # Backed-up worker: hold further updates instead of dropping them
+                while not self.route(update):
+                    await asyncio.sleep(0.05)
+                # Safe to skip past it: it's in the spool until a worker has handled it
+                offset = update["update_id"] + 1
+    
+    async def serve_webhook(self, allowed_updates: List[str]):
+        """Receive updates over the webhook and route them"""
+        secret = webhook_secret()
+        
+        async def handle(request: web.Request) -> web.Response:
+            if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+                return web.Response(status=401, text="Unauthorized")
+            if not self.accepting:
+                return web.Response(status=503, text="Busy")
+            if not self.route(await request.json()):
+                # Not spooled; Telegram redelivers it later
+                return web.Response(status=503, text="Busy")
+            return web.json_response({})
+        
+        async def health(request: web.Request) -> web.Response:
+            return web.Response(text="ok")
+        
+        async def ready(request: web.Request) -> web.Response:
+            alive = sum(1 for process in self.processes if process is not None and process.is_alive())
+            if not self.accepting or alive < self.count:
+                return web.Response(status=503, text="not ready")
+            return web.json_response({"status": "ready", "workers": alive})
+        
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, handle)
+        app.router.add_get("/healthz", health)
+        app.router.add_get("/readyz", ready)
+        if metrics.on_webhook_server():
+            app.router.add_get("/metrics", metrics.metrics_handler)
+        
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+        await site.start()
+        
+        session = await HTTPClient.session()
+        async with session.post(
+            f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/setWebhook",
+            json={
+                "url": f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+                "secret_token": secret,
+                "allowed_updates": allowed_updates,
+                "max_connections": WEBHOOK_MAX_CONNECTIONS,
+                "drop_pending_updates": False
+            }
+        ) as response:
+            await response.read()
+        logging.info("Webhook server listening on %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+        
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+async def run_supervisor(count: int):
+    """Run `count` worker processes fed by this process until SIGTERM/SIGINT"""
+    dp = create_dispatcher()
+    allowed_updates = dp.resolve_used_update_types()
+    await dp.storage.close()
+    
+    supervisor = Supervisor(count)
+    supervisor.start()
+    await supervisor.replay()
+    await HTTPClient.start()
+    metrics_server = await metrics.start_metrics_server()
+    logging.info("Бот запущен: %d worker processes", count)
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    
+    if BOT_MODE == "webhook":
+        intake = asyncio.create_task(supervisor.serve_webhook(allowed_updates))
+    else:
+        intake = asyncio.create_task(supervisor.poll(allowed_updates))
+    monitor = asyncio.create_task(supervisor.monitor())
+    
+    stopped = asyncio.create_task(stop_event.wait())
+    
+    try:
+        await asyncio.wait([intake, stopped], return_when=asyncio.FIRST_COMPLETED)
+        if intake.done() and intake.exception() is not None:
+            logging.error("Update intake failed: %r", intake.exception())
+    finally:
+        for task in (intake, monitor, stopped):
+            task.cancel()
+        await asyncio.gather(intake, monitor, stopped, return_exceptions=True)
+        await supervisor.stop()
+        supervisor.spool.close()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await HTTPClient.close()
\ No newline at end of file
@@ -0,0 +1,216 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Sequence, Tuple
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+from bot.utils import metrics
+from bot.utils.config import (
+    THROTTLE_SEARCH_BURST,
+    THROTTLE_SEARCH_PER_MINUTE,
+    THROTTLE_VIDEO_BURST,
+    THROTTLE_VIDEO_PER_MINUTE,
+    OPENAI_CONCURRENCY,
+    OPENAI_MAX_QUEUE,
+    PASTVU_CONCURRENCY,
+    PASTVU_MAX_QUEUE,
+)
+
+THROTTLED_TEXT = "⏳ Слишком много запросов. Попробуйте снова через {seconds} сек."
+BUSY_TEXT = "😔 Сейчас слишком много желающих. Пожалуйста, попробуйте через минуту."
+
+# User whose update is being handled; upstream limiters queue work per user
+current_user: ContextVar[Optional[int]] = ContextVar("current_user", default=None)
+
+
+class Overloaded(Exception):
+    """An upstream has too many calls waiting, new work is shed"""
+    
+    def __init__(self, upstream: str):
+        super().__init__(f"{upstream} is overloaded")
+        self.upstream = upstream
+
+
+class TokenBucket:
+    """Per-user token buckets: `burst` requests at once, refilled at `per_minute`"""
+    
+    def __init__(self, burst: int, per_minute: float, max_users: int = 100000):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.max_users = max_users
+        self.buckets: OrderedDict[Any, Tuple[float, float]] = OrderedDict()
+    
+    def take(self, user_id: Any) -> float:
+        """Spend a token; 0 if allowed, otherwise seconds until the next one"""
+        if self.burst <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate if self.rate > 0 else math.inf
+        
+        self.buckets[user_id] = (tokens, now)
+        self.buckets.move_to_end(user_id)
+        if len(self.buckets) > self.max_users:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class FairLimiter:
+    """Caps concurrent calls to one upstream and shares free slots fairly
+
+    Calls over the limit wait in a queue per user, and each released slot
+    goes to the next user in round-robin order, so someone with many calls
+    waiting gets one slot per round instead of starving everyone else.
+    Once max_queue calls are waiting, new ones fail fast with Overloaded.
+    """
+    
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.waiting: OrderedDict[Any, Deque[asyncio.Future]] = OrderedDict()
+    
+    @property
+    def overloaded(self) -> bool:
+        return self.queued >= self.max_queue
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+    
+    async def acquire(self):
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        if self.overloaded:
+            metrics.ADMISSION_REJECTED.labels(f"overloaded_{self.name}").inc()
+            raise Overloaded(self.name)
+        
+        user = current_user.get()
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(user, deque()).append(future)
+        self._queued(1)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            else:
+                self._forget(user, future)
+            raise
+    
+    def release(self):
+        """Hand the slot to the next waiting user, or free it"""
+        while self.waiting:
+            user, futures = next(iter(self.waiting.items()))
+            future = futures.popleft()
+            if futures:
+                self.waiting.move_to_end(user)
+            else:
+                del self.waiting[user]
+            self._queued(-1)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+    
+    def _forget(self, user: Any, future: asyncio.Future):
+        futures = self.waiting.get(user)
+        if futures is None or future not in futures:
+            return
+        futures.remove(future)
+        if not futures:
+            del self.waiting[user]
+        self._queued(-1)
+    
+    def _queued(self, change: int):
+        self.queued += change
+        metrics.UPSTREAM_QUEUED.labels(self.name).inc(change)
+
+
+openai_limiter = FairLimiter("openai", OPENAI_CONCURRENCY, OPENAI_MAX_QUEUE)
+pastvu_limiter = FairLimiter("pastvu", PASTVU_CONCURRENCY, PASTVU_MAX_QUEUE)
+
+# Handler flag admission=<kind>: the user's token bucket and the upstreams it needs
+search_bucket = TokenBucket(THROTTLE_SEARCH_BURST, THROTTLE_SEARCH_PER_MINUTE)
+# Charged by the video handler itself, only when it enqueues a Runway job
+video_bucket = TokenBucket(THROTTLE_VIDEO_BURST, THROTTLE_VIDEO_PER_MINUTE)
+ADMISSION: Dict[str, Tuple[Optional[TokenBucket], Sequence[FairLimiter]]] = {
+    "search": (search_bucket, (pastvu_limiter,)),
+    "geocode": (search_bucket, (openai_limiter, pastvu_limiter)),
+    "video": (None, ()),
+}
+
+
+def throttled_text(wait: float) -> str:
+    """Reply for a throttled request, `wait` seconds before the next token"""
+    return THROTTLED_TEXT.format(seconds=math.ceil(min(wait, 3600)))
+
+
+async def respond(event: TelegramObject, text: str, answered: bool = False):
+    """Tell the user their request was turned away"""
+    if isinstance(event, CallbackQuery):
+        if answered:
+            await event.message.answer(text)
+        else:
+            await event.answer(text, show_alert=True)
+    else:
+        await event.answer(text)
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """Throttles users and sheds load for handlers flagged with admission=<kind>
+
+    Turned-away requests get a short reply right away instead of waiting
+    behind the backlog.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        token = current_user.set(user.id if user else None)
+        try:
+            kind = get_flag(data, "admission")
+            if kind is None:
+                return await handler(event, data)
+            bucket, limiters = ADMISSION[kind]
+            
+            wait = bucket.take(user.id if user else None) if bucket is not None else 0.0
+            if wait:
+                metrics.ADMISSION_REJECTED.labels(f"throttled_{kind}").inc()
+                await respond(event, throttled_text(wait))
+                return None
+            for limiter in limiters:
+                if limiter.overloaded:
+                    metrics.ADMISSION_REJECTED.labels(f"overloaded_{limiter.name}").inc()
+                    await respond(event, BUSY_TEXT)
+                    return None
+            
+            try:
+                return await handler(event, data)
+            except Overloaded:
+                await respond(event, BUSY_TEXT, answered=True)
+                return None
+        finally:
+            current_user.reset(token)
\ No newline at end of file
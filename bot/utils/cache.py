@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class TTLCache:
+    """In-memory LRU cache with per-entry TTL and a total byte budget"""
+    
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """Rough size of a JSON-like value in bytes"""
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return cached value or default if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        
+        expires_at, size, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return default
+        
+        # Mark as most recently used
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """Store value, evicting least recently used entries over budget"""
+        if size is None:
+            size = self.estimate_size(value)
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, size, value)
+        self.current_bytes += size
+        
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+    
+    def delete(self, key: str):
+        """Remove key if present"""
+        if key in self._entries:
+            self._remove(key)
+    
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
+        self.current_bytes = 0
+    
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+class SQLiteCache:
+    """Persistent key-value cache with TTL stored in a SQLite table"""
+    
+    def __init__(self, path: str, table: str = "cache", ttl: float = 86400):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self._connection: Optional[sqlite3.Connection] = None
+        # Guards opening, and statements issued from executor threads
+        self._lock = threading.RLock()
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the bot creates no files
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+    
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        return conn
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return cached value or default if missing or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return default
+        
+        value, expires_at = row
+        if expires_at < time.time():
+            self.delete(key)
+            return default
+        return json.loads(value)
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store JSON-serializable value"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+    
+    def delete(self, key: str):
+        """Remove key if present"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+    
+    def purge_expired(self) -> int:
+        """Delete expired rows, return how many were removed"""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),)
+            )
+        return cursor.rowcount
+    
+    def close(self):
+        """Close the underlying connection if it was opened"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class TieredCache:
+    """TTLCache in front of an optional SQLiteCache
+
+    Reads try memory first and copy disk hits into memory; writes go to
+    both. Disk access runs in the default executor so a slow disk doesn't
+    stall the event loop. `ttl_for` picks a TTL per value, e.g. a shorter
+    one for negative entries.
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        path: str = "",
+        table: str = "cache",
+        ttl_for: Optional[Callable[[Any], float]] = None
+    ):
+        self.memory = TTLCache(max_bytes=max_bytes, ttl=ttl)
+        self.disk = SQLiteCache(path, table=table, ttl=ttl) if path else None
+        self.ttl_for = ttl_for
+    
+    async def get(self, key: str) -> Any:
+        """Cached value or None"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await asyncio.get_running_loop().run_in_executor(None, self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value, ttl=self._ttl(value))
+        return value
+    
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serializable value in memory and on disk"""
+        if ttl is None:
+            ttl = self._ttl(value)
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.disk.set, key, value, ttl)
+    
+    async def delete(self, key: str):
+        """Remove key from both tiers"""
+        self.memory.delete(key)
+        if self.disk is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.disk.delete, key)
+    
+    def _ttl(self, value: Any) -> Optional[float]:
+        return self.ttl_for(value) if self.ttl_for is not None else None
\ No newline at end of file
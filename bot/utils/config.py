@@ -8,9 +8,148 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 RUNWAY_API_KEY = os.getenv("RUNWAY_API_KEY")
 WEBAPP_URL = os.getenv("WEBAPP_URL", "https://mikwiseman.github.io/wai-city-bot")
 
+# Upstream API endpoints (overridable to point at local stand-ins, e.g. for load tests)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+PASTVU_API_URL = os.getenv("PASTVU_API_URL", "https://pastvu.com/api2")
+PASTVU_PHOTO_URL = os.getenv("PASTVU_PHOTO_URL", "https://pastvu.com/_p/a/")
+RUNWAY_API_URL = os.getenv("RUNWAY_API_URL", "https://api.dev.runwayml.com/v1")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+
+# Telegram outbound limits for progress edits and result sends
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1.0"))
+
+# FSM session storage: "memory", "sqlite" or "redis"; idle sessions expire after FSM_SESSION_TTL
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", "data/fsm.sqlite3")
+FSM_SESSION_TTL = float(os.getenv("FSM_SESSION_TTL", str(14 * 86400)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Shared HTTP connection pool settings
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "180"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "300"))
+
+# PastVu nearest-photo cache settings
+PASTVU_CACHE_PRECISION = int(os.getenv("PASTVU_CACHE_PRECISION", "7"))
+PASTVU_CACHE_TTL = float(os.getenv("PASTVU_CACHE_TTL", "21600"))
+PASTVU_CACHE_MAX_BYTES = int(os.getenv("PASTVU_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PASTVU_CACHE_PATH = os.getenv("PASTVU_CACHE_PATH", "")
+
+# Runway task polling
+RUNWAY_POLL_MIN_INTERVAL = float(os.getenv("RUNWAY_POLL_MIN_INTERVAL", "1.5"))
+RUNWAY_POLL_MAX_INTERVAL = float(os.getenv("RUNWAY_POLL_MAX_INTERVAL", "10"))
+RUNWAY_POLL_CONCURRENCY = int(os.getenv("RUNWAY_POLL_CONCURRENCY", "10"))
+RUNWAY_TASK_TIMEOUT = float(os.getenv("RUNWAY_TASK_TIMEOUT", "360"))
+RUNWAY_EXPECTED_DURATION = float(os.getenv("RUNWAY_EXPECTED_DURATION", "40"))
+
+# Generated video cache
+VIDEO_CACHE_PATH = os.getenv("VIDEO_CACHE_PATH", "data/video_cache.sqlite3")
+VIDEO_CACHE_TTL = float(os.getenv("VIDEO_CACHE_TTL", str(365 * 86400)))
+VIDEO_URL_TTL = float(os.getenv("VIDEO_URL_TTL", str(12 * 3600)))
+
+# Telegram file_ids of sent photos (set FILE_ID_CACHE_PATH to empty to keep them in memory only)
+FILE_ID_CACHE_PATH = os.getenv("FILE_ID_CACHE_PATH", "data/file_ids.sqlite3")
+FILE_ID_CACHE_TTL = float(os.getenv("FILE_ID_CACHE_TTL", str(365 * 86400)))
+FILE_ID_CACHE_MAX_BYTES = int(os.getenv("FILE_ID_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Durable video job queue; size the worker pool to the Runway concurrency quota
+VIDEO_QUEUE_PATH = os.getenv("VIDEO_QUEUE_PATH", "data/video_jobs.sqlite3")
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", "4"))
+
+# Shared in-process photo records (sessions keep only cids)
+PHOTO_STORE_MAX_RECORDS = int(os.getenv("PHOTO_STORE_MAX_RECORDS", "200000"))
+
+# Geocoding cache (set GEOCODE_CACHE_PATH to empty to keep it in memory only)
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "data/geocode_cache.sqlite3")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 86400)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", "86400"))
+GEOCODE_CACHE_MAX_BYTES = int(os.getenv("GEOCODE_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Optional o3 re-ranking of the locally ranked top photos
+OPENAI_RERANK = os.getenv("OPENAI_RERANK", "0") == "1"
+OPENAI_RERANK_TOP_K = int(os.getenv("OPENAI_RERANK_TOP_K", "5"))
+OPENAI_RERANK_BUDGET = float(os.getenv("OPENAI_RERANK_BUDGET", "3.0"))
+
+# Offline PastVu photo index: "off", "prefer" (local first, remote fallback) or "only"
+PASTVU_INDEX_PATH = os.getenv("PASTVU_INDEX_PATH", "")
+PASTVU_INDEX_MODE = os.getenv("PASTVU_INDEX_MODE", "prefer" if PASTVU_INDEX_PATH else "off")
+
+# Photo density grid for random locations (built with python -m bot.services.location_sampler)
+LOCATION_GRID_PATH = os.getenv("LOCATION_GRID_PATH", "data/location_grid.json")
+# How long a cell whose search came back empty is skipped by random picks
+LOCATION_EMPTY_TTL = float(os.getenv("LOCATION_EMPTY_TTL", str(7 * 86400)))
+
+# Update delivery: "polling" or "webhook" (webhook needs WEBHOOK_BASE_URL reachable by Telegram)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "100"))
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "1000"))
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "25"))
+# Updates acknowledged but not yet handled (webhook mode, or any mode with PROCESS_WORKERS > 1), replayed after a restart
+WEBHOOK_SPOOL_PATH = os.getenv("WEBHOOK_SPOOL_PATH", "data/webhook_updates.sqlite3")
+
+# Worker processes; above 1 the main process only receives updates and shards them by chat id
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", "1"))
+
+# Prometheus metrics on GET /metrics (0 disables; equal to WEBHOOK_PORT shares the webhook server)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "data/metrics")
+
+# Event loop monitoring: lag sampling, stack snapshots of blocking calls, handler time budget
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "1") == "1"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.2"))
+LOOP_SNAPSHOT_DIR = os.getenv("LOOP_SNAPSHOT_DIR", "data/loop_snapshots")
+LOOP_SNAPSHOT_COOLDOWN = float(os.getenv("LOOP_SNAPSHOT_COOLDOWN", "60"))
+LOOP_SNAPSHOT_KEEP = int(os.getenv("LOOP_SNAPSHOT_KEEP", "50"))
+HANDLER_BUDGET = float(os.getenv("HANDLER_BUDGET", "20"))
+
+# Admission control: per-user token buckets (burst size, refill per minute; burst 0 disables)
+THROTTLE_SEARCH_BURST = int(os.getenv("THROTTLE_SEARCH_BURST", "6"))
+THROTTLE_SEARCH_PER_MINUTE = float(os.getenv("THROTTLE_SEARCH_PER_MINUTE", "20"))
+THROTTLE_VIDEO_BURST = int(os.getenv("THROTTLE_VIDEO_BURST", "3"))
+THROTTLE_VIDEO_PER_MINUTE = float(os.getenv("THROTTLE_VIDEO_PER_MINUTE", "4"))
+# Concurrent upstream calls per process, and how many may wait before new work is shed
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+OPENAI_MAX_QUEUE = int(os.getenv("OPENAI_MAX_QUEUE", "50"))
+PASTVU_CONCURRENCY = int(os.getenv("PASTVU_CONCURRENCY", "10"))
+PASTVU_MAX_QUEUE = int(os.getenv("PASTVU_MAX_QUEUE", "100"))
+# Runway runs through the video queue: VIDEO_WORKERS caps it, these bound the backlog
+VIDEO_MAX_ACTIVE_PER_USER = int(os.getenv("VIDEO_MAX_ACTIVE_PER_USER", "2"))
+VIDEO_MAX_QUEUED = int(os.getenv("VIDEO_MAX_QUEUED", "200"))
+
+# Local media cache: PastVu photos and Runway videos are downloaded once and uploaded from disk
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "data/media")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+MEDIA_UPLOAD = os.getenv("MEDIA_UPLOAD", "1") == "1"
+# Telegram's upload limits for photos and bot videos
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Video pre-flight: check and reframe photos for Runway (needs Pillow)
+IMAGE_PREFLIGHT = os.getenv("IMAGE_PREFLIGHT", "1") == "1"
+IMAGE_MIN_SIDE = int(os.getenv("IMAGE_MIN_SIDE", "320"))
+IMAGE_MIN_CROP_KEEP = float(os.getenv("IMAGE_MIN_CROP_KEEP", "0.6"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Largest original photo pre-flight will download (PastVu scans can exceed Telegram's photo limit)
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN not found in environment variables")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment variables")
 if not RUNWAY_API_KEY:
-    raise ValueError("RUNWAY_API_KEY not found in environment variables")
\ No newline at end of file
+    raise ValueError("RUNWAY_API_KEY not found in environment variables")
+if BOT_MODE == "webhook" and not WEBHOOK_BASE_URL:
+    raise ValueError("WEBHOOK_BASE_URL is required when BOT_MODE=webhook")
\ No newline at end of file
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+from bot.utils.config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_INTERVAL
+
+MessageKey = Tuple[int, int]
+# How many last-sent texts to remember for skipping unchanged edits
+LAST_TEXT_LIMIT = 10000
+
+
+class PendingEdit:
+    """Latest frame waiting to be applied to one message"""
+    
+    __slots__ = ("message", "text", "future")
+    
+    def __init__(self, message: Message, text: str, future: asyncio.Future):
+        self.message = message
+        self.text = text
+        self.future = future
+
+
+class EditScheduler:
+    """Shared outbound scheduler for progress edits and user-facing sends
+
+    Respects a global token bucket and a per-chat minimum interval, skips
+    edits that wouldn't change the text, keeps only the newest frame per
+    message while waiting, backs off on RetryAfter and lets user-facing
+    results (photos, videos, final statuses) go ahead of animation frames.
+    """
+    
+    def __init__(self, rate: float = TELEGRAM_GLOBAL_RATE, chat_interval: float = TELEGRAM_CHAT_INTERVAL):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self.pending: "OrderedDict[MessageKey, PendingEdit]" = OrderedDict()
+        self.last_text: "OrderedDict[MessageKey, str]" = OrderedDict()
+        self.chat_ready_at: Dict[int, float] = {}
+        self.priority_waiters = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._deliveries = set()
+    
+    async def edit(self, message: Message, text: str, priority: bool = False) -> bool:
+        """Edit message text through the scheduler, return False if it can't be edited"""
+        key = (message.chat.id, message.message_id)
+        
+        if priority:
+            # Results replace any frame still waiting for this message
+            pending = self.pending.pop(key, None)
+            if pending is not None and not pending.future.done():
+                pending.future.set_result(True)
+            while True:
+                await self.reserve(message.chat.id)
+                result = await self._apply(key, message, text)
+                if result is not None:
+                    return result
+        
+        pending = self.pending.get(key)
+        if pending is not None:
+            # Still waiting for a slot: newest frame wins
+            pending.text = text
+            self.coalesced += 1
+            return await asyncio.shield(pending.future)
+        
+        if self.last_text.get(key) == text:
+            self.skipped += 1
+            return True
+        
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = PendingEdit(message, text, future)
+        self._start()
+        self._wakeup.set()
+        return await asyncio.shield(future)
+    
+    async def reserve(self, chat_id: int):
+        """Wait for a send slot ahead of queued animation frames"""
+        self.priority_waiters += 1
+        try:
+            while True:
+                delay = self._delay_for(chat_id)
+                if delay <= 0:
+                    self._consume(chat_id)
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self.priority_waiters -= 1
+    
+    def forget(self, message: Message):
+        """Drop state for a message that is about to be deleted"""
+        key = (message.chat.id, message.message_id)
+        self.last_text.pop(key, None)
+        pending = self.pending.pop(key, None)
+        if pending is not None and not pending.future.done():
+            pending.future.set_result(False)
+    
+    async def stop(self):
+        """Stop the scheduler loop"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+    
+    def _start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run(), name="edit-scheduler")
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def _delay_for(self, chat_id: int, reserved: int = 0) -> float:
+        """Seconds until both a global token and the chat slot are available"""
+        self._refill()
+        needed = 1 + reserved
+        token_delay = 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+        chat_delay = self.chat_ready_at.get(chat_id, 0.0) - time.monotonic()
+        return max(token_delay, chat_delay)
+    
+    def _consume(self, chat_id: int):
+        now = time.monotonic()
+        self.tokens -= 1
+        self.chat_ready_at[chat_id] = now + self.chat_interval
+        if len(self.chat_ready_at) > LAST_TEXT_LIMIT:
+            self.chat_ready_at = {chat: ready for chat, ready in self.chat_ready_at.items() if ready > now}
+    
+    async def _run(self):
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            # Oldest pending edit whose chat is ready goes first; frames leave
+            # one global token per user-facing send waiting for a slot
+            best_key = None
+            best_delay = None
+            for key in self.pending:
+                delay = self._delay_for(key[0], reserved=self.priority_waiters)
+                if delay <= 0:
+                    best_key, best_delay = key, 0.0
+                    break
+                if best_delay is None or delay < best_delay:
+                    best_delay = delay
+            
+            if best_key is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=best_delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            pending = self.pending.pop(best_key)
+            self._consume(best_key[0])
+            delivery = asyncio.create_task(self._deliver(best_key, pending))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+    
+    async def _deliver(self, key: MessageKey, pending: PendingEdit):
+        result = await self._apply(key, pending.message, pending.text)
+        if result is None:
+            # Flood wait: requeue unless a newer frame already took its place
+            if key not in self.pending:
+                self.pending[key] = pending
+                self._wakeup.set()
+            elif not pending.future.done():
+                pending.future.set_result(True)
+            return
+        if not pending.future.done():
+            pending.future.set_result(result)
+    
+    async def _apply(self, key: MessageKey, message: Message, text: str) -> Optional[bool]:
+        """Perform the edit: True on success, False if not editable, None on RetryAfter"""
+        if self.last_text.get(key) == text:
+            return True
+        try:
+            await message.edit_text(text)
+        except TelegramRetryAfter as e:
+            self.chat_ready_at[key[0]] = time.monotonic() + e.retry_after
+            return None
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                return False
+        except Exception:
+            # Message might be deleted or can't be edited
+            return False
+        
+        self.last_text[key] = text
+        self.last_text.move_to_end(key)
+        if len(self.last_text) > LAST_TEXT_LIMIT:
+            self.last_text.popitem(last=False)
+        return True
+
+
+edit_scheduler = EditScheduler()
\ No newline at end of file
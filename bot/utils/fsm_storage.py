@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from bot.utils.config import FSM_STORAGE, FSM_SQLITE_PATH, FSM_SESSION_TTL, REDIS_URL
+
+# First byte of every encoded session, bumped if the format changes
+SESSION_FORMAT = b"\x01"
+
+
+def encode_session(data: Mapping[str, Any]) -> bytes:
+    """Serialize session data to compact compressed bytes"""
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return SESSION_FORMAT + zlib.compress(raw, 6)
+
+
+def decode_session(blob: bytes) -> Dict[str, Any]:
+    """Inverse of encode_session"""
+    if not blob or blob[:1] != SESSION_FORMAT:
+        return {}
+    return json.loads(zlib.decompress(blob[1:]).decode("utf-8"))
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage in a local SQLite file with idle-session expiry"""
+    
+    # Expired rows are purged at most this often
+    PURGE_INTERVAL = 600
+    
+    def __init__(self, path: str, session_ttl: Optional[float] = None):
+        self.path = path
+        self.session_ttl = session_ttl
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on the first update, so building a dispatcher creates no files
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+    
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_sessions ("
+            "key TEXT PRIMARY KEY, state TEXT, data BLOB, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS fsm_sessions_updated ON fsm_sessions (updated_at)")
+        return conn
+    
+    def _row(self, key: StorageKey) -> Optional[sqlite3.Row]:
+        row = self._conn.execute(
+            "SELECT state, data, updated_at FROM fsm_sessions WHERE key = ?",
+            (self.key_builder.build(key),)
+        ).fetchone()
+        if row is not None and self.session_ttl and row[2] < time.time() - self.session_ttl:
+            return None
+        return row
+    
+    def _write(self, key: StorageKey, column: str, value: Any):
+        now = time.time()
+        other = "data" if column == "state" else "state"
+        # An expired session is reset instead of partially revived
+        cutoff = now - self.session_ttl if self.session_ttl else 0
+        self._conn.execute(
+            f"INSERT INTO fsm_sessions (key, {column}, updated_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, "
+            f"{other} = CASE WHEN updated_at < ? THEN NULL ELSE {other} END, "
+            "updated_at = excluded.updated_at",
+            (self.key_builder.build(key), value, now, cutoff)
+        )
+        
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self.purge_expired()
+    
+    def purge_expired(self) -> int:
+        """Delete sessions idle for longer than session_ttl"""
+        self._last_purge = time.time()
+        if not self.session_ttl:
+            return 0
+        cursor = self._conn.execute(
+            "DELETE FROM fsm_sessions WHERE updated_at < ?", (time.time() - self.session_ttl,)
+        )
+        return cursor.rowcount
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(key, "state", state.state if isinstance(state, State) else state)
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = self._row(key)
+        return row[0] if row is not None else None
+    
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        self._write(key, "data", encode_session(data) if data else None)
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = self._row(key)
+        if row is None or row[1] is None:
+            return {}
+        return decode_session(row[1])
+    
+    async def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def create_redis_storage(url: str, session_ttl: Optional[float] = None, redis=None) -> BaseStorage:
+    """Redis-protocol storage with compact binary session encoding
+
+    Pass `redis` to use an existing client, e.g. a local stand-in in tests.
+    """
+    try:
+        from aiogram.fsm.storage.redis import RedisStorage
+        from redis.asyncio import Redis
+    except ImportError as e:
+        raise RuntimeError("FSM_STORAGE=redis requires the 'redis' package (pip install redis)") from e
+    
+    class CompactRedisStorage(RedisStorage):
+        """RedisStorage that stores data as compressed binary blobs"""
+        
+        async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+            if not isinstance(data, dict):
+                raise DataNotDictLikeError(
+                    f"Data must be a dict or dict-like object, got {type(data).__name__}"
+                )
+            redis_key = self.key_builder.build(key, "data")
+            if not data:
+                await self.redis.delete(redis_key)
+                return
+            await self.redis.set(redis_key, encode_session(data), ex=self.data_ttl)
+        
+        async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+            value = await self.redis.get(self.key_builder.build(key, "data"))
+            if value is None:
+                return {}
+            return decode_session(value)
+    
+    ttl = int(session_ttl) if session_ttl else None
+    if redis is None:
+        redis = Redis.from_url(url)
+    return CompactRedisStorage(redis=redis, state_ttl=ttl, data_ttl=ttl)
+
+
+def create_storage() -> BaseStorage:
+    """Build the FSM storage selected by FSM_STORAGE"""
+    if FSM_STORAGE == "sqlite":
+        return SQLiteStorage(FSM_SQLITE_PATH, FSM_SESSION_TTL)
+    if FSM_STORAGE == "redis":
+        return create_redis_storage(REDIS_URL, FSM_SESSION_TTL)
+    return MemoryStorage()
\ No newline at end of file
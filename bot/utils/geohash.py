@@ -0,0 +1,59 @@
+from typing import Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+DECODE_MAP = {c: i for i, c in enumerate(BASE32)}
+
+
+def encode(lat: float, lon: float, precision: int = 7) -> str:
+    """Encode coordinates into a geohash string of given precision"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    
+    return "".join(chars)
+
+
+def decode_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Decode geohash into (min_lat, min_lon, max_lat, max_lon)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    
+    for char in geohash:
+        value = DECODE_MAP[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Decode geohash into the (lat, lon) of its cell center"""
+    min_lat, min_lon, max_lat, max_lon = decode_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
\ No newline at end of file
@@ -0,0 +1,62 @@
+import os
+from typing import Any, Dict
+
+# Formats Runway accepts as a prompt image
+ALLOWED_FORMATS = ("JPEG", "PNG", "WEBP")
+# Blur radius of the fill behind photos too far from the target aspect to crop
+FILL_BLUR = 24
+
+
+def prepare_image(
+    source: str,
+    target: str,
+    width: int,
+    height: int,
+    min_side: int,
+    min_crop_keep: float
+) -> Dict[str, Any]:
+    """Check an image file and write it reframed to width x height as JPEG
+
+    Runs in a worker process, so it only takes and returns plain values:
+    {"ok": True, "width", "height", "format", "mode"} on success, where mode
+    is "crop" or "pad", or {"ok": False, "reason"} when the image is unusable.
+    """
+    from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+    
+    try:
+        with Image.open(source) as opened:
+            image_format = opened.format
+            if image_format not in ALLOWED_FORMATS:
+                return {"ok": False, "reason": "format"}
+            image = ImageOps.exif_transpose(opened)
+            source_width, source_height = image.size
+            if min(source_width, source_height) < min_side:
+                return {"ok": False, "reason": "too_small"}
+            image = image.convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        return {"ok": False, "reason": "unreadable"}
+    
+    ratio = source_width / source_height
+    target_ratio = width / height
+    # Share of the photo a centered crop to the target aspect would keep
+    keep = min(ratio, target_ratio) / max(ratio, target_ratio)
+    if keep >= min_crop_keep:
+        framed = ImageOps.fit(image, (width, height), method=Image.LANCZOS, centering=(0.5, 0.45))
+        mode = "crop"
+    else:
+        # Portrait or panorama: keep the whole photo over a blurred fill of itself
+        framed = ImageOps.fit(image, (width, height), method=Image.BILINEAR).filter(ImageFilter.GaussianBlur(FILL_BLUR))
+        foreground = ImageOps.contain(image, (width, height), method=Image.LANCZOS)
+        framed.paste(foreground, ((width - foreground.width) // 2, (height - foreground.height) // 2))
+        mode = "pad"
+    
+    temporary = f"{target}.{os.getpid()}.tmp"
+    framed.save(temporary, "JPEG", quality=90, optimize=True)
+    os.replace(temporary, target)
+    return {
+        "ok": True,
+        "width": source_width,
+        "height": source_height,
+        "format": image_format,
+        "mode": mode,
+    }
\ No newline at end of file
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from bot.utils import metrics
+from bot.utils.config import (
+    LOOP_LAG_INTERVAL,
+    LOOP_BLOCK_THRESHOLD,
+    LOOP_SNAPSHOT_DIR,
+    LOOP_SNAPSHOT_COOLDOWN,
+    LOOP_SNAPSHOT_KEEP,
+    HANDLER_BUDGET,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Stack sampling while the loop is blocked
+SAMPLE_INTERVAL = 0.005
+MAX_SAMPLE_SECONDS = 10.0
+
+
+def describe_frame(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(ROOT + os.sep):
+        path = os.path.relpath(path, ROOT)
+    else:
+        path = os.sep.join(path.split(os.sep)[-2:])
+    return f"{code.co_name} ({path}:{frame.f_lineno})"
+
+
+def collapse_stack(frame) -> Tuple[str, ...]:
+    """Frames of a stack, outermost first"""
+    frames = []
+    while frame is not None:
+        frames.append(describe_frame(frame))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class LoopMonitor:
+    """Measures event loop lag and profiles the loop while it is blocked
+
+    A coroutine on the loop wakes up every LOOP_LAG_INTERVAL and records
+    how late it ran. A watchdog thread checks that it keeps waking up: once
+    a wake-up is LOOP_BLOCK_THRESHOLD overdue, the loop thread is stuck in
+    a blocking call, and the watchdog samples its stack until it returns.
+    The samples, the running task and the handler it serves are written to
+    LOOP_SNAPSHOT_DIR (at most one file per LOOP_SNAPSHOT_COOLDOWN).
+    """
+    
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        threshold: float = LOOP_BLOCK_THRESHOLD,
+        snapshot_dir: str = LOOP_SNAPSHOT_DIR,
+        cooldown: float = LOOP_SNAPSHOT_COOLDOWN,
+        keep: int = LOOP_SNAPSHOT_KEEP
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.snapshot_dir = snapshot_dir
+        self.cooldown = cooldown
+        self.keep = keep
+        # Handler name of each task currently running a handler
+        self.handlers: Dict[asyncio.Task, str] = {}
+        self.last_snapshot: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._beats = 0
+        self._due = 0.0
+        self._snapshot_at = float("-inf")
+        self._runner: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+    
+    def start(self):
+        """Start lag sampling on the running loop and the watchdog thread"""
+        if self._runner is not None and not self._runner.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._stopping.clear()
+        self._runner = asyncio.create_task(self._run(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self):
+        """Stop sampling and wait for the watchdog thread"""
+        self._stopping.set()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._watchdog is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._watchdog.join)
+            self._watchdog = None
+    
+    async def _run(self):
+        while True:
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._due)
+            self._beats += 1
+            metrics.LOOP_LAG.observe(lag)
+    
+    def _culprit(self) -> Tuple[str, Optional[str]]:
+        """Name of the task running on the loop and the handler it serves, if any"""
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            return "(callback)", None
+        return task.get_name(), self.handlers.get(task)
+    
+    def _watch(self):
+        handled = -1
+        check = min(self.threshold / 4, 0.05)
+        while not self._stopping.wait(check):
+            beats = self._beats
+            if beats == handled or time.monotonic() - self._due < self.threshold:
+                continue
+            handled = beats
+            due = self._due
+            task_name, handler = self._culprit()
+            metrics.LOOP_BLOCKS.inc()
+            
+            # One snapshot per cooldown; in between blocks are only logged
+            sampling = time.monotonic() - self._snapshot_at >= self.cooldown
+            samples: Counter = Counter()
+            started = time.monotonic()
+            while self._beats == beats and not self._stopping.is_set():
+                if time.monotonic() - started > MAX_SAMPLE_SECONDS:
+                    break
+                if sampling:
+                    frame = sys._current_frames().get(self._thread_id)
+                    if frame is not None:
+                        samples[collapse_stack(frame)] += 1
+                    del frame
+                time.sleep(SAMPLE_INTERVAL)
+            
+            lag = time.monotonic() - due
+            still = " and counting" if self._beats == beats else ""
+            where = f"{task_name}, handler {handler}" if handler else task_name
+            if not samples:
+                logging.warning("Event loop lag %.3fs%s in %s", lag, still, where)
+                continue
+            try:
+                path = self._write_snapshot(samples, lag, task_name, handler)
+            except OSError as e:
+                logging.warning("Event loop lag %.3fs%s in %s; snapshot failed: %s", lag, still, where, e)
+                continue
+            self._snapshot_at = time.monotonic()
+            self.last_snapshot = path
+            logging.warning("Event loop lag %.3fs%s in %s; stack snapshot %s", lag, still, where, path)
+    
+    def _write_snapshot(self, samples: Counter, lag: float, task_name: str, handler: Optional[str]) -> str:
+        """Write the sampled stacks as a report with folded stacks for flame graphs"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        now = datetime.now()
+        path = os.path.join(self.snapshot_dir, f"loop-block-{now:%Y%m%d-%H%M%S}-{os.getpid()}.txt")
+        total = sum(samples.values())
+        ranked = samples.most_common()
+        hottest, hottest_count = ranked[0]
+        
+        lines: List[str] = [
+            f"Event loop lag {lag:.3f}s at {now.isoformat(timespec='seconds')} (pid {os.getpid()})",
+            f"Task: {task_name}",
+            f"Handler: {handler or '-'}",
+            f"Samples: {total} every {SAMPLE_INTERVAL * 1000:.0f}ms",
+            "",
+            f"Hottest stack ({hottest_count} of {total} samples), outermost first:",
+        ]
+        lines.extend(f"  {frame}" for frame in hottest)
+        lines.append("")
+        lines.append("Folded stacks (flamegraph.pl / speedscope format):")
+        lines.extend(f"{';'.join(stack)} {count}" for stack, count in ranked)
+        
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self._prune()
+        return path
+    
+    def _prune(self):
+        """Keep only the newest snapshots"""
+        names = sorted(name for name in os.listdir(self.snapshot_dir) if name.startswith("loop-block-"))
+        for name in names[:max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.snapshot_dir, name))
+            except OSError:
+                pass
+
+
+class HandlerBudgetMiddleware(BaseMiddleware):
+    """Flags handler calls over HANDLER_BUDGET and tells the loop monitor which handler a task runs"""
+    
+    def __init__(self, monitor: LoopMonitor, budget: float = HANDLER_BUDGET):
+        self.monitor = monitor
+        self.budget = budget
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = metrics.handler_name(event, data)
+        task = asyncio.current_task()
+        self.monitor.handlers[task] = name
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.monitor.handlers.pop(task, None)
+            elapsed = time.perf_counter() - started
+            if elapsed > self.budget:
+                metrics.SLOW_HANDLERS.labels(name).inc()
+                logging.warning("Handler %s took %.1fs, over the %.1fs budget", name, elapsed, self.budget)
+
+
+loop_monitor = LoopMonitor()
\ No newline at end of file
@@ -0,0 +1,231 @@
+import functools
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.types import TelegramObject
+from bot.utils.config import (
+    BOT_MODE,
+    WEBHOOK_PORT,
+    PROCESS_WORKERS,
+    METRICS_PORT,
+    METRICS_HOST,
+    METRICS_MULTIPROC_DIR,
+)
+
+if PROCESS_WORKERS > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    # Workers write metrics to shared files that the supervisor aggregates;
+    # prometheus_client reads this when imported, so it is set first
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = METRICS_MULTIPROC_DIR
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+    multiprocess,
+)
+
+# Upstream calls range from milliseconds (cache, Telegram) to minutes (Runway)
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "bot_stage_seconds",
+    "Duration of hot-path stages (geocode, pastvu_fetch, photo_selection, telegram.*, runway_*)",
+    ["stage"],
+    buckets=BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "bot_stage_errors_total",
+    "Failed hot-path stages",
+    ["stage"]
+)
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds",
+    "Duration of update handlers",
+    ["handler"],
+    buckets=BUCKETS
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Handlers that raised",
+    ["handler"]
+)
+CACHE_REQUESTS = Counter(
+    "bot_cache_requests_total",
+    "Cache lookups by result (hit or miss)",
+    ["cache", "result"]
+)
+LOOP_LAG = Histogram(
+    "bot_loop_lag_seconds",
+    "How late the event loop runs a timer, sampled every LOOP_LAG_INTERVAL",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+LOOP_BLOCKS = Counter(
+    "bot_loop_blocks_total",
+    "Times the event loop was blocked longer than LOOP_BLOCK_THRESHOLD"
+)
+SLOW_HANDLERS = Counter(
+    "bot_slow_handlers_total",
+    "Handler calls that took longer than HANDLER_BUDGET",
+    ["handler"]
+)
+ADMISSION_REJECTED = Counter(
+    "bot_admission_rejected_total",
+    "Requests turned away by throttling or load shedding",
+    ["reason"]
+)
+UPSTREAM_QUEUED = Gauge(
+    "bot_upstream_queued",
+    "Calls waiting for an upstream concurrency slot",
+    ["upstream"],
+    multiprocess_mode="livesum"
+)
+IN_FLIGHT = Gauge(
+    "bot_in_flight",
+    "Work currently in progress (updates, video_jobs)",
+    ["kind"],
+    multiprocess_mode="livesum"
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of a stage, and an error if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def track(stage: str):
+    """Decorator form of timed() for coroutine functions"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def stage_error(stage: str):
+    """Count a stage failure that was reported rather than raised"""
+    STAGE_ERRORS.labels(stage).inc()
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def handler_name(event: TelegramObject, data: Dict[str, Any]) -> str:
+    """Name of the handler function an update was routed to"""
+    handler_object = data.get("handler")
+    return handler_object.callback.__name__ if handler_object is not None else type(event).__name__
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Times each handler call and counts the ones that raise"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = handler_name(event, data)
+        started = time.perf_counter()
+        IN_FLIGHT.labels("updates").inc()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            IN_FLIGHT.labels("updates").dec()
+            HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Times every Bot API call as stage telegram.<method>"""
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot,
+        method: TelegramMethod[Any]
+    ) -> Any:
+        # Long polling waits by design, its duration says nothing
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+        with timed(f"telegram.{method.__api_method__}"):
+            return await make_request(bot, method)
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def reset_multiprocess_dir():
+    """Start a multi-process run with an empty metrics directory"""
+    directory = multiprocess_dir()
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def mark_process_dead(pid: int):
+    """Drop live gauges of a worker process that exited"""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+def render() -> bytes:
+    """Current metrics in Prometheus text format, aggregated across worker processes if any"""
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    response = web.Response(body=render())
+    response.content_type = CONTENT_TYPE_LATEST.split(";")[0]
+    response.charset = "utf-8"
+    return response
+
+
+def on_webhook_server() -> bool:
+    """Whether /metrics is served by the webhook server rather than its own"""
+    return BOT_MODE == "webhook" and METRICS_PORT == WEBHOOK_PORT
+
+
+async def start_metrics_server() -> Optional[web.AppRunner]:
+    """Serve GET /metrics on METRICS_PORT, if enabled and not shared with the webhook"""
+    if not METRICS_PORT or on_webhook_server():
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    return runner
\ No newline at end of file
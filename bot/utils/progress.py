@@ -1,6 +1,8 @@
 import asyncio
 from typing import Optional
 from aiogram.types import Message
+from bot.utils.admission import Overloaded
+from bot.utils.edit_scheduler import edit_scheduler
 
 
 class ProgressAnimator:
@@ -25,6 +27,10 @@ class ProgressAnimator:
         emoji_pattern: Optional[str] = None
     ) -> Message:
         """Send initial progress message"""
+        return await message.answer(self.prepare_progress_text(text, emoji_pattern))
+    
+    def prepare_progress_text(self, text: str, emoji_pattern: Optional[str] = None) -> str:
+        """Reset animation state and return the initial progress text"""
         # Auto-detect emoji pattern from text
         if emoji_pattern is None and text:
             if "🔍" in text or "🔎" in text:
@@ -57,8 +63,7 @@ class ProgressAnimator:
         self.dots_index = 0
         self.emoji_index = 0
         
-        # Send message
-        return await message.answer(initial_text)
+        return initial_text
     
     async def update_animation_frame(self, progress_message: Message) -> bool:
         """Update message with next animation frame"""
@@ -74,8 +79,9 @@ class ProgressAnimator:
             else:
                 animated_text = f"{self.base_text}{dots}"
             
-            # Update message
-            await progress_message.edit_text(animated_text)
+            # Update message through the shared rate-limited scheduler
+            if not await edit_scheduler.edit(progress_message, animated_text):
+                return False
             
             # Update indices for next frame
             self.dots_index = (self.dots_index + 1) % len(self.dots_states)
@@ -103,19 +109,31 @@ class ProgressAnimator:
                 await asyncio.sleep(update_interval)
         
         # Run operation and animation concurrently
-        animation_task = asyncio.create_task(animate())
+        animation_task = asyncio.create_task(animate(), name="progress-animation")
+        shed = False
         
         try:
             # Wait for operation to complete
             result = await operation
             return result
+        except Overloaded:
+            # The admission middleware tells the user; the progress message goes
+            shed = True
+            raise
         finally:
-            # Stop animation
+            # Stop animation and drop any frame still waiting to be sent
             animation_task.cancel()
             try:
                 await animation_task
             except asyncio.CancelledError:
                 pass
+            edit_scheduler.forget(progress_message)
+            if shed:
+                try:
+                    await progress_message.delete()
+                except Exception:
+                    # Already gone or too old to delete
+                    pass
 
 
 class PercentageProgressAnimator(ProgressAnimator):
@@ -133,6 +151,17 @@ class PercentageProgressAnimator(ProgressAnimator):
         emoji_pattern: str = "clock"
     ) -> Message:
         """Send initial progress message with percentage"""
+        return await message.answer(
+            self.prepare_percentage_text(text, initial_percentage, emoji_pattern)
+        )
+    
+    def prepare_percentage_text(
+        self,
+        text: str,
+        initial_percentage: int = 0,
+        emoji_pattern: str = "clock"
+    ) -> str:
+        """Reset animation state and return the initial percentage text"""
         self.current_percentage = initial_percentage
         self.current_emoji_pattern = emoji_pattern
         self.base_text = text
@@ -154,8 +183,7 @@ class PercentageProgressAnimator(ProgressAnimator):
         self.dots_index = 0
         self.emoji_index = 0
         
-        # Send message
-        return await message.answer(initial_text)
+        return initial_text
     
     async def update_percentage(self, percentage: int):
         """Update the percentage value"""
@@ -175,8 +203,9 @@ class PercentageProgressAnimator(ProgressAnimator):
             else:
                 animated_text = f"{self.base_text} {self.current_percentage}%{dots}"
             
-            # Update message
-            await progress_message.edit_text(animated_text)
+            # Update message through the shared rate-limited scheduler
+            if not await edit_scheduler.edit(progress_message, animated_text):
+                return False
             
             # Update indices for next frame
             self.dots_index = (self.dots_index + 1) % len(self.dots_states)
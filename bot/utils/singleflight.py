@@ -0,0 +1,44 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key"""
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    def __len__(self) -> int:
+        return len(self._calls)
+    
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run func once per key; concurrent callers await the same result or error"""
+        task = self._calls.get(key)
+        if task is None:
+            # Run in its own task so one caller's cancellation doesn't cancel the rest
+            task = asyncio.create_task(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Avoid "exception was never retrieved" when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+def singleflight(key_func: Callable[..., Hashable]):
+    """Decorate an async function so identical concurrent calls are coalesced"""
+    def decorator(func):
+        group = SingleFlight()
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await group.do(key_func(*args, **kwargs), func, *args, **kwargs)
+        
+        wrapper.singleflight = group
+        return wrapper
+    return decorator
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+# Only the standard library is imported here so the timings below start cold
+
+ImportTime = Tuple[str, int, int]
+
+
+def import_times(module: str = "bot.app") -> List[ImportTime]:
+    """(module, self_us, cumulative_us) for every import made by `module`, via -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+async def measure_phases() -> List[Tuple[str, float]]:
+    """Wall time of each startup phase, without contacting Telegram
+
+    Databases are opened on first use and the video queue isn't started,
+    so this doesn't touch the state of a bot running from the same directory.
+    """
+    phases = []
+    started = time.perf_counter()
+    
+    def mark(name: str):
+        nonlocal started
+        now = time.perf_counter()
+        phases.append((name, now - started))
+        started = now
+    
+    from bot.app import create_bot, create_dispatcher, start_services, stop_services
+    mark("imports")
+    bot = create_bot()
+    mark("bot")
+    dp = create_dispatcher()
+    mark("dispatcher")
+    # Video workers would claim real jobs and message users
+    await start_services(bot, run_video_queue=False)
+    mark("services")
+    await stop_services(bot)
+    await dp.storage.close()
+    return phases
+
+
+def main(argv: Optional[List[str]] = None):
+    """Print an import-time and startup-time report"""
+    parser = argparse.ArgumentParser(description="Startup time report")
+    parser.add_argument("--top", type=int, default=15, help="How many slowest imports to list")
+    parser.add_argument("--budget", type=float, default=None, help="Exit with status 1 if startup exceeds this many seconds")
+    args = parser.parse_args(argv)
+    
+    times = import_times()
+    total_us = sum(self_us for _, self_us, _ in times)
+    print(f"Imports: {len(times)} modules, {total_us / 1e6:.3f}s (-X importtime)")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(times, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+    
+    phases = asyncio.run(measure_phases())
+    total = sum(seconds for _, seconds in phases)
+    print()
+    print("Startup phases:")
+    for name, seconds in phases:
+        print(f"{seconds:9.3f}s  {name}")
+    print(f"{total:9.3f}s  total")
+    
+    if args.budget is not None and total > args.budget:
+        print(f"Startup took {total:.3f}s, over the {args.budget:.3f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
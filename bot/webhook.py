@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import signal
+import sqlite3
+import time
+from typing import Any, Dict, List
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from bot.utils import metrics
+from bot.utils.config import (
+    BOT_TOKEN,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS,
+    UPDATE_CONCURRENCY,
+    UPDATE_MAX_PENDING,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    WEBHOOK_SPOOL_PATH,
+)
+
+
+def webhook_secret() -> str:
+    """Configured secret, or one derived from the bot token (stable across restarts)"""
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    return hashlib.sha256(f"webhook:{BOT_TOKEN}".encode("utf-8")).hexdigest()
+
+
+class UpdateSpool:
+    """SQLite journal of updates acknowledged to Telegram but not yet handled"""
+    
+    def __init__(self, path: str = WEBHOOK_SPOOL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS updates ("
+            "update_id INTEGER PRIMARY KEY, update_json TEXT NOT NULL, received_at REAL NOT NULL)"
+        )
+    
+    def add(self, update: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO updates (update_id, update_json, received_at) VALUES (?, ?, ?)",
+            (update["update_id"], json.dumps(update, ensure_ascii=False), time.time())
+        )
+    
+    def remove(self, update_id: int):
+        self._conn.execute("DELETE FROM updates WHERE update_id = ?", (update_id,))
+    
+    def pending(self) -> List[Dict[str, Any]]:
+        """Spooled updates, oldest first"""
+        rows = self._conn.execute("SELECT update_json FROM updates ORDER BY update_id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def close(self):
+        self._conn.close()
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Webhook handler with bounded concurrent processing and graceful drain
+
+    Updates are written to the spool, acknowledged and processed in
+    background tasks, at most UPDATE_CONCURRENCY at a time. Telegram never
+    resends an acknowledged update, so ones still unfinished when the drain
+    times out stay in the spool and are replayed on the next start. Past
+    UPDATE_MAX_PENDING waiting updates, or while draining, requests get 503
+    and Telegram redelivers them later.
+    """
+    
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        concurrency: int,
+        max_pending: int,
+        spool: UpdateSpool
+    ):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, secret_token=secret_token)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self.spool = spool
+        self.accepting = True
+    
+    @property
+    def pending(self) -> int:
+        return len(self._background_feed_update_tasks)
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        # Reject forged requests before telling anyone we're busy
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(status=401, text="Unauthorized")
+        if not self.accepting or self.pending >= self.max_pending:
+            return web.Response(status=503, text="Busy")
+        return await super().handle(request)
+    
+    def replay(self, bot: Bot) -> int:
+        """Process updates left in the spool by the previous run, return how many"""
+        updates = self.spool.pending()
+        for update in updates:
+            self._start(bot, update)
+        return len(updates)
+    
+    def _start(self, bot: Bot, update: Dict[str, Any]):
+        task = asyncio.create_task(self._background_feed_update(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+    
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        # Journal before the 200: after it Telegram won't send this update again
+        self.spool.add(update)
+        self._start(bot, update)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+    
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self.semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except asyncio.CancelledError:
+                # Cut off by shutdown: left in the spool for the next start
+                raise
+            except Exception:
+                logging.exception("Update %s failed", update.get("update_id"))
+        self.spool.remove(update["update_id"])
+    
+    async def drain(self, timeout: float):
+        """Stop accepting updates and wait for in-flight ones to finish"""
+        self.accepting = False
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logging.info("Draining %d in-flight updates", len(tasks))
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logging.warning("Drain timed out, %d unfinished updates stay spooled for the next start", len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def close(self) -> None:
+        # The bot session is closed by main() after everything else shuts down
+        pass
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Serve updates over an aiohttp webhook until SIGTERM/SIGINT"""
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dp,
+        bot,
+        secret_token=webhook_secret(),
+        concurrency=UPDATE_CONCURRENCY,
+        max_pending=UPDATE_MAX_PENDING,
+        spool=UpdateSpool()
+    )
+    handler.register(app, path=WEBHOOK_PATH)
+    
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+    
+    async def ready(request: web.Request) -> web.Response:
+        if not handler.accepting:
+            return web.Response(status=503, text="draining")
+        return web.json_response({"status": "ready", "in_flight": handler.pending})
+    
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/readyz", ready)
+    if metrics.on_webhook_server():
+        app.router.add_get("/metrics", metrics.metrics_handler)
+    app["webhook_handler"] = handler
+    setup_application(app, dp, bot=bot)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    
+    replayed = handler.replay(bot)
+    if replayed:
+        logging.info("Replaying %d updates left unfinished by the previous run", replayed)
+    
+    # Keep pending updates: Telegram holds them while we restart
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=webhook_secret(),
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=False
+    )
+    logging.info("Webhook server listening on %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    
+    try:
+        await stop_event.wait()
+    finally:
+        await handler.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await runner.cleanup()
+        handler.spool.close()
\ No newline at end of file
@@ -0,0 +1,388 @@
+"""Local stand-ins for the Telegram Bot API, PastVu, OpenAI and Runway
+
+Each fake is an aiohttp application with latency and failure-rate knobs.
+Nothing here imports the bot, so the fakes can start before the bot's
+configuration is read.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from aiohttp import web
+
+
+class Knobs:
+    """Per-service latency (seconds, mean with +-50% jitter) and failure rate (0..1)"""
+    
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+    
+    async def delay(self):
+        self.requests += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+    
+    def should_fail(self) -> bool:
+        if random.random() < self.failure_rate:
+            self.failures += 1
+            return True
+        return False
+
+
+class SentEvent:
+    """One Bot API call made by the bot"""
+    
+    __slots__ = ("method", "chat_id", "payload", "message", "at")
+    
+    def __init__(self, method: str, chat_id: Optional[int], payload: Dict[str, Any], message: Optional[Dict[str, Any]]):
+        self.method = method
+        self.chat_id = chat_id
+        self.payload = payload
+        self.message = message
+        self.at = time.monotonic()
+
+
+class FakeTelegram:
+    """Bot API server: serves getUpdates from an injected queue and records everything the bot sends"""
+    
+    BOT_USER = {"id": 1000, "is_bot": True, "first_name": "LoadTestBot", "username": "load_test_bot"}
+    # Methods that return the sent or edited message
+    MESSAGE_METHODS = {
+        "sendMessage", "sendPhoto", "sendVideo", "sendVenue", "sendLocation",
+        "sendAnimation", "sendDocument", "editMessageText", "editMessageCaption",
+    }
+    # Failures are injected as flood waits on these
+    FAILABLE_METHODS = MESSAGE_METHODS
+    
+    def __init__(self, knobs: Knobs):
+        self.knobs = knobs
+        self.updates: List[Dict[str, Any]] = []
+        self.next_update_id = 1
+        self.next_message_id = defaultdict(lambda: 1)
+        self.events: Dict[int, List[SentEvent]] = defaultdict(list)
+        self.calls = defaultdict(int)
+        self.polling = asyncio.Event()
+        self._changed = asyncio.Condition()
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+    
+    # --- load generator side ---
+    
+    async def push_update(self, update: Dict[str, Any]) -> int:
+        """Queue an update for the bot, return its update_id"""
+        update["update_id"] = self.next_update_id
+        self.next_update_id += 1
+        async with self._changed:
+            self.updates.append(update)
+            self._changed.notify_all()
+        return update["update_id"]
+    
+    def user_message(self, chat_id: int, **fields) -> Dict[str, Any]:
+        """A message from user chat_id, as it would appear in an update"""
+        message = {
+            "message_id": self._message_id(chat_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+        }
+        message.update(fields)
+        return message
+    
+    def callback_query(self, chat_id: int, message: Dict[str, Any], data: str) -> Dict[str, Any]:
+        """A button press on a message the bot sent"""
+        return {
+            "id": uuid.uuid4().hex,
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+            "chat_instance": str(chat_id),
+            "message": message,
+            "data": data,
+        }
+    
+    def mark(self, chat_id: int) -> int:
+        """Position in the chat's event log, for waiting on what comes next"""
+        return len(self.events[chat_id])
+    
+    async def wait_for(
+        self,
+        chat_id: int,
+        match: Callable[[SentEvent], bool],
+        since: int,
+        timeout: float
+    ) -> SentEvent:
+        """Wait for the first call for chat_id after position since that satisfies match"""
+        def find() -> Optional[SentEvent]:
+            for event in self.events[chat_id][since:]:
+                if match(event):
+                    return event
+            return None
+        
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(find), timeout=timeout)
+            return find()
+    
+    # --- Bot API side ---
+    
+    def _message_id(self, chat_id: int) -> int:
+        message_id = self.next_message_id[chat_id]
+        self.next_message_id[chat_id] += 1
+        return message_id
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        payload = await self._payload(request)
+        
+        if method == "getUpdates":
+            return await self._get_updates(payload)
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": self.BOT_USER})
+        if method in ("deleteWebhook", "setWebhook"):
+            return web.json_response({"ok": True, "result": True})
+        
+        await self.knobs.delay()
+        if method in self.FAILABLE_METHODS and self.knobs.should_fail():
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        
+        chat_id = int(payload["chat_id"]) if payload.get("chat_id") not in (None, "") else None
+        message = self._result_message(method, chat_id, payload) if method in self.MESSAGE_METHODS else None
+        
+        if chat_id is not None:
+            async with self._changed:
+                self.events[chat_id].append(SentEvent(method, chat_id, payload, message))
+                self._changed.notify_all()
+        
+        return web.json_response({"ok": True, "result": message if message is not None else True})
+    
+    async def _payload(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        form = await request.post()
+        # Uploaded files are reduced to their size
+        return {
+            key: value if isinstance(value, str) else f"<file {len(value.file.read())} bytes>"
+            for key, value in form.items()
+        }
+    
+    async def _get_updates(self, payload: Dict[str, Any]) -> web.Response:
+        self.polling.set()
+        offset = int(payload.get("offset") or 0)
+        timeout = float(payload.get("timeout") or 0)
+        
+        def ready() -> bool:
+            return any(update["update_id"] >= offset for update in self.updates)
+        
+        async with self._changed:
+            # Confirmed updates are dropped, like the real server does
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            try:
+                await asyncio.wait_for(self._changed.wait_for(ready), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            result = self.updates[:100]
+        return web.json_response({"ok": True, "result": result})
+    
+    def _result_message(self, method: str, chat_id: Optional[int], payload: Dict[str, Any]) -> Dict[str, Any]:
+        message = {
+            "message_id": int(payload["message_id"]) if method.startswith("edit") else self._message_id(chat_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"},
+            "from": self.BOT_USER,
+        }
+        if "text" in payload:
+            message["text"] = payload["text"]
+        if "caption" in payload:
+            message["caption"] = payload["caption"]
+        if payload.get("reply_markup"):
+            markup = payload["reply_markup"]
+            markup = json.loads(markup) if isinstance(markup, str) else markup
+            if "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        
+        file_id = f"{method}-{uuid.uuid4().hex}"
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id[-16:], "width": 1280, "height": 720}]
+        elif method == "sendVideo":
+            message["video"] = {
+                "file_id": file_id, "file_unique_id": file_id[-16:], "width": 1280, "height": 720, "duration": 5
+            }
+        elif method == "sendVenue":
+            message["venue"] = {
+                "location": {"latitude": float(payload["latitude"]), "longitude": float(payload["longitude"])},
+                "title": payload.get("title", ""),
+                "address": payload.get("address", ""),
+            }
+        return message
+
+
+class FakePastVu:
+    """photo.giveNearestPhotos with deterministic photos around the requested point"""
+    
+    TITLES = [
+        "Улица и дома", "Вид на собор", "Площадь с трамваем", "Набережная у моста",
+        "Доходный дом", "Вокзал", "Бульвар", "Торговые ряды", "Портрет", "Интерьер",
+    ]
+    
+    def __init__(self, knobs: Knobs, photos_per_response: int = 30):
+        self.knobs = knobs
+        self.photos_per_response = photos_per_response
+        self._image: Optional[bytes] = None
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api2", self.handle)
+        app.router.add_get("/_p/a/{path:.*}", self.photo)
+        return app
+    
+    async def photo(self, request: web.Request) -> web.Response:
+        """Every photo file is the same generated landscape JPEG"""
+        await self.knobs.delay()
+        if self.knobs.should_fail():
+            return web.Response(status=502, text="Bad Gateway")
+        if self._image is None:
+            from io import BytesIO
+            from PIL import Image
+            buffer = BytesIO()
+            Image.linear_gradient("L").resize((1024, 683)).save(buffer, "JPEG")
+            self._image = buffer.getvalue()
+        return web.Response(body=self._image, content_type="image/jpeg")
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        await self.knobs.delay()
+        if self.knobs.should_fail():
+            return web.Response(status=502, text="Bad Gateway")
+        
+        params = json.loads(request.query.get("params", "{}"))
+        lat, lon = params.get("geo", [55.75, 37.61])
+        rng = random.Random(f"{lat:.3f}:{lon:.3f}")
+        photos = []
+        for i in range(self.photos_per_response):
+            cid = rng.randint(1, 2_000_000)
+            year = rng.randint(1860, min(1960, params.get("year2", 1960)))
+            photos.append({
+                "cid": cid,
+                "geo": [lat + rng.uniform(-0.005, 0.005), lon + rng.uniform(-0.005, 0.005)],
+                "year": year,
+                "year2": year + rng.randint(0, 5),
+                "title": rng.choice(self.TITLES),
+                "file": f"{cid % 16:x}/{cid % 256:x}/{cid:08x}.jpg",
+                "dir": "n",
+            })
+        return web.json_response({"result": {"photos": photos}})
+
+
+class FakeOpenAI:
+    """chat.completions answering geocoding and re-rank prompts"""
+    
+    def __init__(self, knobs: Knobs):
+        self.knobs = knobs
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        return app
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        await self.knobs.delay()
+        if self.knobs.should_fail():
+            return web.json_response({"error": {"message": "Overloaded", "type": "server_error"}}, status=503)
+        
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        if "Address:" in prompt:
+            content = json.dumps({"latitude": 55.75 + random.uniform(-0.05, 0.05), "longitude": 37.61 + random.uniform(-0.05, 0.05)})
+        else:
+            content = "0"
+        
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "o3"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 5, "total_tokens": 55},
+        })
+
+
+class FakeRunway:
+    """image_to_video tasks that go PENDING -> RUNNING -> SUCCEEDED (or FAILED) over time"""
+    
+    def __init__(self, knobs: Knobs, duration: float = 30.0, task_failure_rate: float = 0.0):
+        self.knobs = knobs
+        self.duration = duration
+        self.task_failure_rate = task_failure_rate
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.base_url = ""
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/image_to_video", self.create)
+        app.router.add_get("/v1/tasks/{task_id}", self.status)
+        app.router.add_get("/videos/{name}", self.video)
+        return app
+    
+    async def video(self, request: web.Request) -> web.Response:
+        """Output files are 512 KB of filler; the bot only stores and uploads them"""
+        await self.knobs.delay()
+        return web.Response(body=bytes(512 * 1024), content_type="video/mp4")
+    
+    async def create(self, request: web.Request) -> web.Response:
+        await self.knobs.delay()
+        if self.knobs.should_fail():
+            return web.json_response({"error": "Service unavailable"}, status=503)
+        
+        await request.json()
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {
+            "created": time.monotonic(),
+            "duration": self.duration * random.uniform(0.7, 1.3),
+            "fails": random.random() < self.task_failure_rate,
+        }
+        return web.json_response({"id": task_id})
+    
+    async def status(self, request: web.Request) -> web.Response:
+        await self.knobs.delay()
+        task_id = request.match_info["task_id"]
+        task = self.tasks.get(task_id)
+        if task is None:
+            return web.json_response({"error": "Task not found"}, status=404)
+        
+        progress = (time.monotonic() - task["created"]) / task["duration"]
+        if progress < 0.1:
+            return web.json_response({"id": task_id, "status": "PENDING"})
+        if progress < 1:
+            return web.json_response({"id": task_id, "status": "RUNNING", "progress": round(progress, 2)})
+        if task["fails"]:
+            return web.json_response({"id": task_id, "status": "FAILED", "failure": "Fake failure"})
+        return web.json_response({
+            "id": task_id,
+            "status": "SUCCEEDED",
+            "output": [f"{self.base_url}/videos/{task_id}.mp4"],
+        })
+
+
+async def serve(app: web.Application, host: str = "127.0.0.1") -> Tuple[web.AppRunner, str]:
+    """Start app on a free port, return (runner, base URL)"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
\ No newline at end of file
@@ -0,0 +1,299 @@
+"""End-to-end load test of the real bot against local fakes
+
+    python -m loadtest.run --users 50 --ramp 10
+    python -m loadtest.run --users 200 --telegram-fail 0.02 --runway-duration 20 --bot-env PROCESS_WORKERS=4
+
+Starts fake Telegram/PastVu/OpenAI/Runway servers, runs `python main.py`
+against them in long-polling mode, and walks N simulated users through
+start -> location -> photo -> another photo -> make video, reporting
+latency percentiles per step. A share of users types an address instead
+(start -> address -> another photo -> make video), which goes through
+OpenAI geocoding.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from loadtest.fakes import FakeOpenAI, FakePastVu, FakeRunway, FakeTelegram, Knobs, serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_TOKEN = "123456:LOADTEST"
+STEPS = ["start", "location", "photo", "address", "another_photo", "make_video"]
+# Typed by address users; house numbers vary so not every lookup is a geocode cache hit
+STREETS = ["Тверская улица", "Арбат", "Мясницкая улица", "Пятницкая улица", "Покровка"]
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Stats:
+    """Latency samples and failures per funnel step"""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    
+    def record(self, step: str, seconds: float):
+        self.latencies[step].append(seconds)
+    
+    def fail(self, step: str, reason: str):
+        self.errors[step][reason] += 1
+    
+    @staticmethod
+    def percentile(samples: List[float], q: float) -> float:
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def report(self, elapsed: float):
+        print()
+        print(f"{'step':<15} {'ok':>6} {'fail':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for step in STEPS:
+            samples = self.latencies.get(step, [])
+            failed = sum(self.errors[step].values())
+            if samples:
+                p50, p90, p99 = (self.percentile(samples, q) for q in (0.5, 0.9, 0.99))
+                print(f"{step:<15} {len(samples):>6} {failed:>6} {p50:>7.2f}s {p90:>7.2f}s {p99:>7.2f}s {max(samples):>7.2f}s")
+            else:
+                print(f"{step:<15} {0:>6} {failed:>6} {'-':>8} {'-':>8} {'-':>8} {'-':>8}")
+        for step in STEPS:
+            for reason, count in self.errors[step].items():
+                print(f"  {step}: {count} x {reason}")
+        print(f"\nTotal time {elapsed:.1f}s")
+
+
+class User:
+    """One simulated user walking the funnel"""
+    
+    def __init__(
+        self,
+        chat_id: int,
+        telegram: FakeTelegram,
+        stats: Stats,
+        timeout: float,
+        video_timeout: float,
+        by_address: bool = False
+    ):
+        self.chat_id = chat_id
+        self.telegram = telegram
+        self.stats = stats
+        self.timeout = timeout
+        self.video_timeout = video_timeout
+        self.by_address = by_address
+    
+    async def step(self, name: str, update: Dict, expected: str, timeout: Optional[float] = None):
+        """Send an update and time until the bot answers with the expected method or an error message"""
+        def match(event) -> bool:
+            if event.method == expected:
+                return True
+            return event.method in ("sendMessage", "editMessageText") and event.payload.get("text", "").startswith("❌")
+        
+        since = self.telegram.mark(self.chat_id)
+        started = time.monotonic()
+        await self.telegram.push_update(update)
+        try:
+            event = await self.telegram.wait_for(self.chat_id, match, since, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.fail(name, "timeout")
+            raise StepFailed(name)
+        
+        if event.method != expected:
+            self.stats.fail(name, event.payload["text"].splitlines()[0])
+            raise StepFailed(name)
+        self.stats.record(name, event.at - started)
+        return event
+    
+    async def run(self, think_time: float):
+        telegram = self.telegram
+        
+        try:
+            await self.step("start", {"message": telegram.user_message(self.chat_id, text="/start")}, "sendMessage")
+            await asyncio.sleep(think_time)
+            
+            if self.by_address:
+                photo = await self.type_address()
+            else:
+                photo = await self.share_location(think_time)
+            if photo is None:
+                return
+            await asyncio.sleep(think_time)
+            
+            another = await self.step(
+                "another_photo",
+                {"callback_query": telegram.callback_query(self.chat_id, photo.message, "another_photo")},
+                "sendPhoto"
+            )
+            await asyncio.sleep(think_time)
+            
+            await self.step(
+                "make_video",
+                {"callback_query": telegram.callback_query(self.chat_id, another.message, "make_video")},
+                "sendVideo",
+                timeout=self.video_timeout
+            )
+        except StepFailed:
+            pass
+    
+    async def share_location(self, think_time: float):
+        """Share a location and pick "use this place", up to the first photo"""
+        telegram = self.telegram
+        lat = 55.75 + random.uniform(-0.05, 0.05)
+        lon = 37.61 + random.uniform(-0.08, 0.08)
+        
+        options = await self.step(
+            "location",
+            {"message": telegram.user_message(self.chat_id, location={"latitude": lat, "longitude": lon})},
+            "sendMessage"
+        )
+        buttons = [
+            button["callback_data"]
+            for row in (options.message or {}).get("reply_markup", {}).get("inline_keyboard", [])
+            for button in row if "callback_data" in button
+        ]
+        use_location = next((data for data in buttons if data.startswith("use_location:")), None)
+        if use_location is None:
+            self.stats.fail("photo", "no location options")
+            return None
+        await asyncio.sleep(think_time)
+        
+        return await self.step(
+            "photo",
+            {"callback_query": telegram.callback_query(self.chat_id, options.message, use_location)},
+            "sendPhoto"
+        )
+    
+    async def type_address(self):
+        """Type an address: geocoded by OpenAI, then searched, up to the first photo"""
+        address = f"{random.choice(STREETS)} {random.randint(1, 100)}, Москва"
+        return await self.step(
+            "address",
+            {"message": self.telegram.user_message(self.chat_id, text=address)},
+            "sendPhoto"
+        )
+
+
+def bot_environment(urls: Dict[str, str], data_dir: str, args) -> Dict[str, str]:
+    """Environment for the bot process, pointing every upstream at the fakes"""
+    env = os.environ.copy()
+    env.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "OPENAI_API_KEY": "loadtest",
+        "RUNWAY_API_KEY": "loadtest",
+        "BOT_MODE": "polling",
+        "TELEGRAM_API_URL": urls["telegram"],
+        "PASTVU_API_URL": f"{urls['pastvu']}/api2",
+        "PASTVU_PHOTO_URL": f"{urls['pastvu']}/_p/a/",
+        "OPENAI_BASE_URL": f"{urls['openai']}/v1",
+        "RUNWAY_API_URL": f"{urls['runway']}/v1",
+        "RUNWAY_EXPECTED_DURATION": str(args.runway_duration),
+        "FSM_SQLITE_PATH": os.path.join(data_dir, "fsm.sqlite3"),
+        "VIDEO_CACHE_PATH": os.path.join(data_dir, "video_cache.sqlite3"),
+        "VIDEO_QUEUE_PATH": os.path.join(data_dir, "video_jobs.sqlite3"),
+        "GEOCODE_CACHE_PATH": os.path.join(data_dir, "geocode_cache.sqlite3"),
+        "WEBHOOK_SPOOL_PATH": os.path.join(data_dir, "updates.sqlite3"),
+        "PASTVU_CACHE_PATH": "",
+        "OPENAI_RERANK": "1" if args.rerank else "0",
+        "PYTHONUNBUFFERED": "1",
+    })
+    for assignment in args.bot_env:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+    return env
+
+
+async def main_async(args):
+    telegram = FakeTelegram(Knobs(args.telegram_latency, args.telegram_fail))
+    pastvu = FakePastVu(Knobs(args.pastvu_latency, args.pastvu_fail))
+    openai = FakeOpenAI(Knobs(args.openai_latency, args.openai_fail))
+    runway = FakeRunway(Knobs(args.runway_latency, args.runway_fail), args.runway_duration, args.runway_task_fail)
+    
+    runners = []
+    urls = {}
+    for name, fake in (("telegram", telegram), ("pastvu", pastvu), ("openai", openai), ("runway", runway)):
+        runner, urls[name] = await serve(fake.app())
+        runners.append(runner)
+    runway.base_url = urls["runway"]
+    
+    data_dir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    env = bot_environment(urls, data_dir, args)
+    log_path = os.path.join(data_dir, "bot.log")
+    process = None
+    
+    try:
+        if args.no_bot:
+            print("Start the bot with:")
+            for name in ("TELEGRAM_API_URL", "PASTVU_API_URL", "OPENAI_BASE_URL", "RUNWAY_API_URL", "BOT_TOKEN"):
+                print(f"  export {name}={env[name]}")
+        else:
+            log_file = open(log_path, "w")
+            process = subprocess.Popen(
+                [sys.executable, "main.py"], cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT
+            )
+            print(f"Bot pid {process.pid}, log {log_path}")
+        
+        await asyncio.wait_for(telegram.polling.wait(), timeout=args.startup_timeout)
+        print(f"Bot is polling; starting {args.users} users over {args.ramp:.0f}s")
+        
+        stats = Stats()
+        started = time.monotonic()
+        users = []
+        for index in range(args.users):
+            by_address = random.random() < args.address_share
+            user = User(index + 1, telegram, stats, args.step_timeout, args.video_timeout, by_address)
+            users.append(asyncio.create_task(user.run(args.think_time)))
+            if args.ramp and args.users > 1:
+                await asyncio.sleep(args.ramp / (args.users - 1))
+        await asyncio.gather(*users)
+        stats.report(time.monotonic() - started)
+        
+        calls = ", ".join(f"{method}={count}" for method, count in sorted(telegram.calls.items()))
+        print(f"Bot API calls: {calls}")
+        for name, fake in (("telegram", telegram), ("pastvu", pastvu), ("openai", openai), ("runway", runway)):
+            print(f"{name}: {fake.knobs.requests} requests, {fake.knobs.failures} injected failures")
+        
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({step: sorted(samples) for step, samples in stats.latencies.items()}, f)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="End-to-end load test against local fakes")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Pause between a user's steps")
+    parser.add_argument("--step-timeout", type=float, default=60.0)
+    parser.add_argument("--video-timeout", type=float, default=600.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    for service, latency in (("telegram", 0.03), ("pastvu", 0.3), ("openai", 1.0), ("runway", 0.2)):
+        parser.add_argument(f"--{service}-latency", type=float, default=latency, help="Mean response delay, seconds")
+        parser.add_argument(f"--{service}-fail", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--runway-duration", type=float, default=30.0, help="Mean video generation time")
+    parser.add_argument("--runway-task-fail", type=float, default=0.0, help="Fraction of tasks that end FAILED")
+    parser.add_argument("--address-share", type=float, default=0.3, help="Fraction of users who type an address")
+    parser.add_argument("--rerank", action="store_true", help="Re-rank photos with OpenAI (OPENAI_RERANK=1)")
+    parser.add_argument("--bot-env", action="append", default=[], metavar="NAME=VALUE", help="Extra bot setting")
+    parser.add_argument("--no-bot", action="store_true", help="Don't start the bot, print its settings instead")
+    parser.add_argument("--json", help="Write raw latency samples to this file")
+    args = parser.parse_args(argv)
+    
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,11 +1,14 @@
+import time
+
+# Measured from before the heavy imports below
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
 import sys
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from bot.utils.config import BOT_TOKEN
-from bot.handlers import location, photo, video
+from bot.utils.config import BOT_MODE, UPDATE_CONCURRENCY, PROCESS_WORKERS
+from bot.app import create_bot, create_dispatcher, start_services, stop_services
+from bot.utils.metrics import start_metrics_server
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, stream=sys.stdout)
@@ -13,28 +16,36 @@ logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
 async def main():
     """Main function to start the bot"""
-    # Initialize bot with default properties
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+    # Several processes: this one only receives updates and routes them
+    if PROCESS_WORKERS > 1:
+        from bot.supervisor import run_supervisor
+        await run_supervisor(PROCESS_WORKERS)
+        return
     
-    # Initialize dispatcher
-    dp = Dispatcher()
+    # Initialize bot with default properties
+    bot = create_bot()
     
-    # Register routers
-    dp.include_router(location.router)
-    dp.include_router(photo.router)
-    dp.include_router(video.router)
+    # Initialize dispatcher with configured FSM storage and routers
+    dp = create_dispatcher()
     
-    # Delete webhook and start polling
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Open shared clients and start video workers
+    await start_services(bot)
+    metrics_server = await start_metrics_server()
     
     try:
         logging.info("Бот запущен")
-        await dp.start_polling(bot)
+        logging.info("Startup took %.2fs", time.perf_counter() - STARTED_AT)
+        if BOT_MODE == "webhook":
+            from bot.webhook import run_webhook
+            await run_webhook(bot, dp)
+        else:
+            # Delete webhook and start polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot, tasks_concurrency_limit=UPDATE_CONCURRENCY)
     finally:
-        await bot.session.close()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await stop_services(bot)
 
 
 if __name__ == "__main__":
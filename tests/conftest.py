@@ -0,0 +1,6 @@
+import os
+
+# bot.utils.config refuses to load without these
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("RUNWAY_API_KEY", "test")
\ No newline at end of file
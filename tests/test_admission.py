@@ -0,0 +1,169 @@
+import asyncio
+import math
+import pytest
+from bot.utils import admission
+from bot.utils.admission import FairLimiter, Overloaded, TokenBucket, current_user
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_burst_then_wait(clock):
+    bucket = TokenBucket(burst=2, per_minute=60)
+    assert bucket.take(1) == 0
+    assert bucket.take(1) == 0
+    assert bucket.take(1) == pytest.approx(1.0)
+    # Other users have their own bucket
+    assert bucket.take(2) == 0
+
+
+def test_token_bucket_refills(clock):
+    bucket = TokenBucket(burst=1, per_minute=30)
+    assert bucket.take(1) == 0
+    clock.now += 1
+    assert bucket.take(1) == pytest.approx(1.0)
+    clock.now += 2
+    assert bucket.take(1) == 0
+
+
+def test_token_bucket_disabled_and_no_refill(clock):
+    assert TokenBucket(burst=0, per_minute=0).take(1) == 0
+    bucket = TokenBucket(burst=1, per_minute=0)
+    assert bucket.take(1) == 0
+    assert bucket.take(1) == math.inf
+
+
+def test_token_bucket_forgets_oldest_users(clock):
+    bucket = TokenBucket(burst=1, per_minute=1, max_users=2)
+    for user in (1, 2, 3):
+        bucket.take(user)
+    assert list(bucket.buckets) == [2, 3]
+    # User 1 starts over with a full bucket
+    assert bucket.take(1) == 0
+
+
+async def wait_for_slot(limiter: FairLimiter, user: int, name: str, order: list):
+    current_user.set(user)
+    await limiter.acquire()
+    order.append(name)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_fair_limiter_round_robin():
+    async def scenario():
+        limiter = FairLimiter("test", limit=1, max_queue=10)
+        await limiter.acquire()
+        order = []
+        tasks = [
+            asyncio.create_task(wait_for_slot(limiter, user, name, order))
+            for user, name in ((1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1"))
+        ]
+        await settle()
+        assert order == []
+        assert limiter.queued == 5
+        
+        for _ in tasks:
+            limiter.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        # One slot per user per round, in the order users started waiting
+        assert order == ["a1", "b1", "c1", "a2", "a3"]
+        assert limiter.active == 1
+        assert limiter.queued == 0
+        limiter.release()
+        assert limiter.active == 0
+    
+    asyncio.run(scenario())
+
+
+def test_fair_limiter_cancelled_waiter_leaves_queue():
+    async def scenario():
+        limiter = FairLimiter("test", limit=1, max_queue=10)
+        await limiter.acquire()
+        order = []
+        waiter = asyncio.create_task(wait_for_slot(limiter, 1, "a", order))
+        await settle()
+        assert limiter.queued == 1
+        
+        waiter.cancel()
+        await settle()
+        assert limiter.queued == 0
+        assert not limiter.waiting
+        # Nobody is waiting, so the slot is freed
+        limiter.release()
+        assert limiter.active == 0
+    
+    asyncio.run(scenario())
+
+
+def test_fair_limiter_cancelled_after_handover_passes_slot_on():
+    async def scenario():
+        limiter = FairLimiter("test", limit=1, max_queue=10)
+        await limiter.acquire()
+        order = []
+        first = asyncio.create_task(wait_for_slot(limiter, 1, "a", order))
+        second = asyncio.create_task(wait_for_slot(limiter, 2, "b", order))
+        await settle()
+        
+        # The slot goes to the first waiter, which is cancelled before it runs
+        limiter.release()
+        first.cancel()
+        await settle()
+        assert first.cancelled()
+        assert order == ["b"]
+        assert limiter.active == 1
+        assert limiter.queued == 0
+        await second
+    
+    asyncio.run(scenario())
+
+
+def test_fair_limiter_sheds_when_queue_is_full():
+    async def scenario():
+        limiter = FairLimiter("test", limit=1, max_queue=2)
+        await limiter.acquire()
+        order = []
+        tasks = [asyncio.create_task(wait_for_slot(limiter, user, str(user), order)) for user in (1, 2)]
+        await settle()
+        assert limiter.overloaded
+        
+        with pytest.raises(Overloaded) as error:
+            await limiter.acquire()
+        assert error.value.upstream == "test"
+        assert limiter.queued == 2
+        
+        for _ in tasks:
+            limiter.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        assert not limiter.overloaded
+    
+    asyncio.run(scenario())
+
+
+def test_fair_limiter_slot_releases_on_error():
+    async def scenario():
+        limiter = FairLimiter("test", limit=2, max_queue=1)
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                assert limiter.active == 1
+                raise RuntimeError
+        assert limiter.active == 0
+    
+    asyncio.run(scenario())
\ No newline at end of file
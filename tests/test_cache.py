@@ -0,0 +1,47 @@
+import asyncio
+from bot.utils.cache import TieredCache
+
+
+def test_tiered_cache_reads_through_to_disk(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "cache.sqlite3")
+        first = TieredCache(max_bytes=1024, ttl=60, path=path, table="items")
+        await first.set("key", {"value": 1})
+        assert first.memory.get("key") == {"value": 1}
+        
+        # A fresh process has an empty memory tier
+        second = TieredCache(max_bytes=1024, ttl=60, path=path, table="items")
+        assert await second.get("key") == {"value": 1}
+        assert second.memory.get("key") == {"value": 1}
+        
+        await second.delete("key")
+        assert await second.get("key") is None
+        assert await TieredCache(max_bytes=1024, ttl=60, path=path, table="items").get("key") is None
+    
+    asyncio.run(scenario())
+
+
+def test_tiered_cache_ttl_per_value(tmp_path):
+    async def scenario():
+        cache = TieredCache(
+            max_bytes=1024,
+            ttl=60,
+            path=str(tmp_path / "cache.sqlite3"),
+            ttl_for=lambda value: -1 if value == "negative" else 60
+        )
+        await cache.set("miss", "negative")
+        await cache.set("hit", "positive")
+        assert await cache.get("miss") is None
+        assert await cache.get("hit") == "positive"
+    
+    asyncio.run(scenario())
+
+
+def test_tiered_cache_memory_only():
+    async def scenario():
+        cache = TieredCache(max_bytes=1024, ttl=60)
+        assert cache.disk is None
+        await cache.set("key", [1, 2])
+        assert await cache.get("key") == [1, 2]
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,122 @@
+import asyncio
+import types
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import EditMessageText
+from bot.utils.edit_scheduler import EditScheduler
+
+
+class FakeMessage:
+    def __init__(self, chat_id: int = 1, message_id: int = 1, errors=()):
+        self.chat = types.SimpleNamespace(id=chat_id)
+        self.message_id = message_id
+        self.texts = []
+        self.errors = list(errors)
+    
+    async def edit_text(self, text: str):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.texts.append(text)
+
+
+def method() -> EditMessageText:
+    return EditMessageText(text="frame", chat_id=1, message_id=1)
+
+
+def test_frames_waiting_for_a_slot_are_coalesced():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=0.05)
+        message = FakeMessage()
+        assert await scheduler.edit(message, "frame 0")
+        # The chat slot is taken now: later frames collapse into the newest one
+        frames = [asyncio.create_task(scheduler.edit(message, f"frame {i}")) for i in range(1, 5)]
+        results = await asyncio.gather(*frames)
+        await scheduler.stop()
+        assert message.texts == ["frame 0", "frame 4"]
+        assert scheduler.coalesced == 3
+        assert results == [True] * 4
+    
+    asyncio.run(scenario())
+
+
+def test_unchanged_text_is_skipped():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=0)
+        message = FakeMessage()
+        assert await scheduler.edit(message, "same")
+        assert await scheduler.edit(message, "same")
+        await scheduler.stop()
+        assert message.texts == ["same"]
+        assert scheduler.skipped == 1
+    
+    asyncio.run(scenario())
+
+
+def test_chats_do_not_wait_for_each_other():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=10)
+        first, second = FakeMessage(chat_id=1), FakeMessage(chat_id=2)
+        await asyncio.wait_for(asyncio.gather(
+            scheduler.edit(first, "a"),
+            scheduler.edit(second, "b")
+        ), timeout=1)
+        await scheduler.stop()
+        assert first.texts == ["a"] and second.texts == ["b"]
+    
+    asyncio.run(scenario())
+
+
+def test_priority_edit_replaces_waiting_frame():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=0.05)
+        message = FakeMessage()
+        await scheduler.edit(message, "frame 1")
+        frame = asyncio.create_task(scheduler.edit(message, "frame 2"))
+        await asyncio.sleep(0)
+        assert await scheduler.edit(message, "done", priority=True)
+        assert await frame
+        await scheduler.stop()
+        assert message.texts == ["frame 1", "done"]
+    
+    asyncio.run(scenario())
+
+
+def test_retry_after_requeues_the_frame():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=0)
+        message = FakeMessage(errors=[TelegramRetryAfter(method(), "Flood control exceeded", retry_after=0)])
+        assert await asyncio.wait_for(scheduler.edit(message, "frame"), timeout=1)
+        await scheduler.stop()
+        assert message.texts == ["frame"]
+    
+    asyncio.run(scenario())
+
+
+def test_bad_request_results():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=0)
+        not_modified = FakeMessage(message_id=1, errors=[
+            TelegramBadRequest(method(), "Bad Request: message is not modified")
+        ])
+        deleted = FakeMessage(message_id=2, errors=[
+            TelegramBadRequest(method(), "Bad Request: message to edit not found")
+        ])
+        assert await scheduler.edit(not_modified, "frame") is True
+        assert await scheduler.edit(deleted, "frame") is False
+        await scheduler.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_forget_releases_waiting_frame():
+    async def scenario():
+        scheduler = EditScheduler(rate=100, chat_interval=10)
+        message = FakeMessage()
+        await scheduler.edit(message, "frame 1")
+        frame = asyncio.create_task(scheduler.edit(message, "frame 2"))
+        await asyncio.sleep(0)
+        scheduler.forget(message)
+        assert await frame is False
+        await scheduler.stop()
+        assert message.texts == ["frame 1"]
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import types
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from bot.utils import fsm_storage
+from bot.utils.fsm_storage import SQLiteStorage, decode_session, encode_session
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+OTHER_KEY = StorageKey(bot_id=1, chat_id=20, user_id=20)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fsm_storage, "time", types.SimpleNamespace(time=clock))
+    return clock
+
+
+def test_session_encoding_round_trip():
+    data = {"photo_queue": [1, 2, 3], "address": "Москва, Тверская"}
+    blob = encode_session(data)
+    assert decode_session(blob) == data
+    assert decode_session(b"") == {}
+    assert decode_session(b"\x00legacy") == {}
+
+
+def test_sessions_survive_reopening(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "fsm.sqlite3")
+        storage = SQLiteStorage(path, session_ttl=3600)
+        await storage.set_state(KEY, "PhotoStates:viewing")
+        await storage.set_data(KEY, {"photo_cursor": 2})
+        await storage.close()
+        
+        storage = SQLiteStorage(path, session_ttl=3600)
+        assert await storage.get_state(KEY) == "PhotoStates:viewing"
+        assert await storage.get_data(KEY) == {"photo_cursor": 2}
+        await storage.close()
+    
+    asyncio.run(scenario())
+
+
+def test_idle_session_expires(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), session_ttl=3600)
+        await storage.set_state(KEY, "PhotoStates:viewing")
+        await storage.set_data(KEY, {"photo_cursor": 2})
+        
+        clock.now += 3000
+        assert await storage.get_state(KEY) == "PhotoStates:viewing"
+        # Reading doesn't extend the session, writing does
+        await storage.set_data(KEY, {"photo_cursor": 3})
+        clock.now += 3000
+        assert await storage.get_data(KEY) == {"photo_cursor": 3}
+        
+        clock.now += 3601
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {}
+        await storage.close()
+    
+    asyncio.run(scenario())
+
+
+def test_write_to_expired_session_resets_the_rest(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), session_ttl=3600)
+        await storage.set_state(KEY, "PhotoStates:viewing")
+        await storage.set_data(KEY, {"photo_cursor": 2})
+        clock.now += 4000
+        await storage.set_state(KEY, "PhotoStates:waiting_location")
+        assert await storage.get_state(KEY) == "PhotoStates:waiting_location"
+        assert await storage.get_data(KEY) == {}
+        await storage.close()
+    
+    asyncio.run(scenario())
+
+
+def test_expired_rows_are_purged(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), session_ttl=3600)
+        await storage.set_data(KEY, {"photo_cursor": 1})
+        clock.now += 1800
+        await storage.set_data(OTHER_KEY, {"photo_cursor": 1})
+        clock.now += 2000
+        assert storage.purge_expired() == 1
+        rows = storage._conn.execute("SELECT COUNT(*) FROM fsm_sessions").fetchone()[0]
+        assert rows == 1
+        await storage.close()
+    
+    asyncio.run(scenario())
+
+
+def test_sessions_without_ttl_never_expire(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"))
+        await storage.set_data(KEY, {"photo_cursor": 1})
+        clock.now += 10 ** 8
+        assert storage.purge_expired() == 0
+        assert await storage.get_data(KEY) == {"photo_cursor": 1}
+        await storage.close()
+    
+    asyncio.run(scenario())
+
+def test_redis_storage_stores_compact_sessions():
+    fakeredis = pytest.importorskip("fakeredis")
+    
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis()
+        storage = fsm_storage.create_redis_storage("redis://unused", session_ttl=3600, redis=redis)
+        await storage.set_state(KEY, "PhotoStates:viewing")
+        await storage.set_data(KEY, {"photo_queue": [1, 2, 3], "photo_cursor": 1})
+        assert await storage.get_state(KEY) == "PhotoStates:viewing"
+        assert await storage.get_data(KEY) == {"photo_queue": [1, 2, 3], "photo_cursor": 1}
+        
+        data_key = storage.key_builder.build(KEY, "data")
+        assert (await redis.get(data_key)).startswith(fsm_storage.SESSION_FORMAT)
+        assert 0 < await redis.ttl(data_key) <= 3600
+        
+        await storage.set_data(KEY, {})
+        assert await redis.exists(data_key) == 0
+        assert await storage.get_data(KEY) == {}
+        await storage.close()
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from bot.services import geocode_cache
+from bot.services.geocode_cache import GeocodeCache
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Москва, Красная площадь", "Красная площадь, Москва"),
+    ("10 Downing Street, London", "london,10  Downing street"),
+    ("ул. Ленина, 5", "Ул Ленина , 5"),
+    ("Улица Королёва 12", "улица королева 12"),
+])
+def test_normalize_matches_reordered_parts(first, second):
+    assert GeocodeCache.normalize(first) == GeocodeCache.normalize(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("New York Street, London", "London Street, New York"),
+    ("Ленина улица 5, Москва", "Москва улица 5, Ленина"),
+    ("Ленина 10 корп 2", "Ленина 2 корп 10"),
+    ("Тверская 1", "1 Тверская"),
+])
+def test_normalize_keeps_distinct_addresses_apart(first, second):
+    assert GeocodeCache.normalize(first) != GeocodeCache.normalize(second)
+
+def test_cache_stores_coordinates_and_negative_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(geocode_cache, "GEOCODE_CACHE_PATH", str(tmp_path / "geocode.sqlite3"))
+    
+    async def scenario():
+        cache = GeocodeCache()
+        await cache.set("Москва, Красная площадь", {"latitude": 55.75, "longitude": 37.62})
+        await cache.set("Нигде", None)
+        assert await cache.get("красная площадь, москва") == (True, {"latitude": 55.75, "longitude": 37.62})
+        assert await cache.get("нигде") == (True, None)
+        assert await cache.get("Тверская 1") == (False, None)
+        # Read back from disk by a fresh instance
+        assert await GeocodeCache().get("Красная площадь, Москва") == (True, {"latitude": 55.75, "longitude": 37.62})
+        assert cache.stats()["hits"] == 2
+    
+    asyncio.run(scenario())
\ No newline at end of file
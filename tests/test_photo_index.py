@@ -0,0 +1,83 @@
+import random
+import pytest
+from bot.services.photo_index import PhotoIndex, _haversine_km, build_index
+
+
+def make_photos(lat: float, lon: float, count: int, spread: float, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        {
+            "cid": cid,
+            "geo": [lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread * 4, spread * 4)],
+            "year": rng.randint(1850, 1990),
+            "title": f"Photo {cid}",
+            "file": f"a/b/{cid}.jpg"
+        }
+        for cid in range(1, count + 1)
+    ]
+
+
+def brute_force(index: PhotoIndex, lat: float, lon: float, year: int, limit: int, max_distance_km: float):
+    hits = []
+    for row in range(len(index.cids)):
+        if index.years[row] > year:
+            continue
+        distance = _haversine_km(lat, lon, index.lats[row], index.lons[row])
+        if distance <= max_distance_km:
+            hits.append((distance, index.cids[row]))
+    return [cid for _, cid in sorted(hits)[:limit]]
+
+
+@pytest.fixture
+def index_at(tmp_path):
+    opened = []
+    
+    def build(photos, cell_size: float = 0.05) -> PhotoIndex:
+        path = str(tmp_path / f"photos{len(opened)}.idx")
+        build_index(photos, path, cell_size=cell_size)
+        index = PhotoIndex(path)
+        opened.append(index)
+        return index
+    
+    yield build
+    for index in opened:
+        index.close()
+
+
+def test_nearest_matches_brute_force(index_at):
+    index = index_at(make_photos(55.75, 37.62, 2000, spread=0.3))
+    for year in (1900, 1928, 2000):
+        result = index.nearest(55.75, 37.62, year=year, limit=30, max_distance_km=20)
+        expected = brute_force(index, 55.75, 37.62, year, 30, 20)
+        assert [photo["cid"] for photo in result] == expected
+
+
+@pytest.mark.parametrize("lat", [69.0, -78.0])
+def test_nearest_widens_columns_at_high_latitude(index_at, lat):
+    # At these latitudes 20 km spans several times more 0.05° columns than rows;
+    # photos due east and west must still be found
+    photos = make_photos(lat, 20.0, 1500, spread=0.2, seed=7)
+    photos.append({"cid": 9001, "geo": [lat, 20.0 + 15 / (111.32 * 0.36)], "year": 1900})
+    index = index_at(photos)
+    result = index.nearest(lat, 20.0, year=2000, limit=500, max_distance_km=20)
+    expected = brute_force(index, lat, 20.0, 2000, 500, 20)
+    assert [photo["cid"] for photo in result] == expected
+    assert 9001 in expected
+
+
+def test_nearest_wraps_the_antimeridian(index_at):
+    photos = [
+        {"cid": 1, "geo": [10.0, 179.99], "year": 1900},
+        {"cid": 2, "geo": [10.0, -179.99], "year": 1900},
+        {"cid": 3, "geo": [10.0, 179.0], "year": 1900}
+    ]
+    index = index_at(photos)
+    result = index.nearest(10.0, -179.995, year=2000, limit=2, max_distance_km=5)
+    assert [photo["cid"] for photo in result] == [2, 1]
+
+
+def test_nearest_returns_pastvu_shaped_records(index_at):
+    index = index_at([{"cid": 5, "geo": [55.0, 37.0], "year": 1910, "title": "Кремль", "file": "x/y.jpg"}])
+    assert index.nearest(55.0, 37.0) == [
+        {"cid": 5, "geo": [55.0, 37.0], "year": 1910, "year2": 1910, "title": "Кремль", "file": "x/y.jpg"}
+    ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+import pytest
+from bot.services.ranking import PhotoRanker
+
+
+def photo(cid: int, title: str, year: int = 1900, **extra) -> dict:
+    return {"cid": cid, "title": title, "year": year, "geo": [55.75, 37.62], **extra}
+
+
+def title_score(title: str) -> float:
+    """Score of a title with year, distance and direction held fixed"""
+    return PhotoRanker.score([photo(1, title)])[0]
+
+
+@pytest.mark.parametrize("title", [
+    "Конкурс проектов",            # "конк" is a horse tram only as a word
+    "Перед заводом",               # "дом" inside another word
+    "Review of the mapping",       # "view" and "map" inside other words
+    "Broom factory",               # "room"
+])
+def test_keywords_inside_other_words_do_not_match(title):
+    assert title_score(title) == title_score("Без названия")
+
+
+@pytest.mark.parametrize("title", [
+    "Улица Тверская",
+    "На улице Тверской",
+    "Вид на Кремль",
+    "Старый дом",
+    "Streets of Moscow",
+])
+def test_stems_words_and_phrases_match(title):
+    assert title_score(title) > title_score("Без названия")
+
+
+def test_negative_keywords_lower_the_score():
+    assert title_score("Семья в комнате") < title_score("Без названия")
+    assert title_score("Карта города") < title_score("Без названия")
+
+
+def test_rank_prefers_old_street_views_near_the_point():
+    photos = [
+        photo(1, "Портрет семьи", year=1890),
+        photo(2, "Трамвай на Тверской улице", year=1905, dir="n"),
+        photo(3, "Трамвай на Тверской улице", year=1925, dir="n"),
+        photo(4, "Трамвай на Тверской улице", year=1905, dir="n", geo=[55.9, 37.9]),
+    ]
+    ranked = PhotoRanker.rank(photos, 55.75, 37.62)
+    assert [p["cid"] for p in ranked] == [2, 3, 4, 1]
+
+
+def test_rank_is_deterministic_on_ties():
+    photos = [photo(3, "Дом"), photo(1, "Дом"), photo(2, "Дом", year=1880)]
+    assert [p["cid"] for p in PhotoRanker.rank(photos)] == [2, 1, 3]
\ No newline at end of file
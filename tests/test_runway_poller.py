@@ -0,0 +1,161 @@
+import asyncio
+import types
+import pytest
+from bot.services import runway_poller
+from bot.services.runway_poller import PolledTask, RunwayPoller
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Patch the poller's view of time only, the event loop keeps the real clock
+    monkeypatch.setattr(runway_poller, "time", types.SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(runway_poller, "RUNWAY_POLL_MIN_INTERVAL", 1.5)
+    monkeypatch.setattr(runway_poller, "RUNWAY_POLL_MAX_INTERVAL", 10.0)
+    monkeypatch.setattr(runway_poller, "RUNWAY_EXPECTED_DURATION", 40.0)
+    monkeypatch.setattr(runway_poller, "RUNWAY_TASK_TIMEOUT", 360.0)
+    return clock
+
+
+async def no_status(task_id):
+    raise AssertionError("the scheduler loop must not run in this test")
+
+
+def make_task(poller: RunwayPoller, task_id: str = "task") -> PolledTask:
+    poller.watch(task_id)
+    poller._runner.cancel()
+    return poller.tasks[task_id]
+
+
+@pytest.mark.parametrize("elapsed, expected", [
+    (0, 10.0),     # far from the expected finish: capped at the max interval
+    (30, 5.0),     # halve the gap to the expected finish
+    (39, 1.5),     # close to it: floored at the min interval
+    (55, 1.5)      # overdue
+])
+def test_next_interval_backs_off_towards_expected_finish(clock, elapsed, expected):
+    async def scenario():
+        poller = RunwayPoller(no_status)
+        task = make_task(poller)
+        clock.now += elapsed
+        assert poller.next_interval(task) == pytest.approx(expected)
+    
+    asyncio.run(scenario())
+
+
+def test_next_interval_extrapolates_running_progress(clock):
+    async def scenario():
+        poller = RunwayPoller(no_status)
+        task = make_task(poller)
+        clock.now += 10
+        poller._update(task, {"status": "RUNNING", "progress": 0.5})
+        # Half done after 10 s: 10 s left, poll again in 5 s
+        assert task.next_poll_at == pytest.approx(clock.now + 5.0)
+    
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.42, 0.42), ("0.5", 0.5), (None, 0.0), ("", 0.0), ("n/a", 0.0),
+    (float("nan"), 0.0), (-1, 0.0), (3, 1.0), ([1], 0.0)
+])
+def test_parse_progress(value, expected):
+    assert RunwayPoller.parse_progress(value) == expected
+
+
+@pytest.mark.parametrize("status_data, expected", [
+    ({"status": "SUCCEEDED", "output": ["https://cdn/video.mp4"]}, "https://cdn/video.mp4"),
+    ({"status": "SUCCEEDED", "output": []}, None),
+    ({"status": "FAILED", "failure": "moderation"}, None),
+    ({"status": "CANCELLED"}, None)
+])
+def test_terminal_states_resolve_the_future(clock, status_data, expected):
+    async def scenario():
+        poller = RunwayPoller(no_status)
+        future = poller.watch("task")
+        poller._runner.cancel()
+        poller._update(poller.tasks["task"], status_data)
+        assert future.done() and future.result() == expected
+        assert "task" not in poller.tasks
+    
+    asyncio.run(scenario())
+
+
+def test_task_times_out_while_running(clock):
+    async def scenario():
+        poller = RunwayPoller(no_status)
+        future = poller.watch("task")
+        poller._runner.cancel()
+        task = poller.tasks["task"]
+        clock.now += 100
+        poller._update(task, {"status": "RUNNING", "progress": 0.2})
+        assert not future.done()
+        clock.now += 300
+        poller._update(task, {"status": "RUNNING", "progress": 0.3})
+        assert future.result() is None
+    
+    asyncio.run(scenario())
+
+
+def test_errors_and_malformed_answers_keep_polling(clock):
+    async def scenario():
+        answers = [RuntimeError("502"), ["not", "a", "dict"]]
+        
+        async def get_status(task_id):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+        
+        poller = RunwayPoller(get_status)
+        future = poller.watch("task")
+        poller._runner.cancel()
+        task = poller.tasks["task"]
+        for _ in range(2):
+            await poller._poll(task)
+            assert not future.done()
+            assert task.next_poll_at > clock.now
+        assert poller.polls == 2
+    
+    asyncio.run(scenario())
+
+
+def test_waiters_share_one_poll_loop(monkeypatch):
+    monkeypatch.setattr(runway_poller, "RUNWAY_POLL_MIN_INTERVAL", 0.01)
+    monkeypatch.setattr(runway_poller, "RUNWAY_POLL_MAX_INTERVAL", 0.02)
+    monkeypatch.setattr(runway_poller, "RUNWAY_EXPECTED_DURATION", 0.05)
+    
+    async def scenario():
+        answers = [
+            {"status": "PENDING"},
+            {"status": "RUNNING", "progress": 0.5},
+            {"status": "SUCCEEDED", "output": ["https://cdn/video.mp4"]}
+        ]
+        
+        async def get_status(task_id):
+            return answers.pop(0)
+        
+        seen = []
+        
+        async def on_progress(progress):
+            seen.append(progress)
+        
+        poller = RunwayPoller(get_status)
+        results = await asyncio.wait_for(asyncio.gather(
+            poller.wait("task", on_progress),
+            poller.wait("task")
+        ), timeout=5)
+        await poller.stop()
+        assert results == ["https://cdn/video.mp4"] * 2
+        assert poller.polls == 3
+        assert seen == [0.0, 0.5]
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from bot.utils.singleflight import SingleFlight, singleflight
+
+
+class Backend:
+    def __init__(self, result="ok", error: Exception = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+    
+    async def fetch(self, *args):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        group = SingleFlight()
+        backend = Backend(result={"cid": 1})
+        callers = [asyncio.create_task(group.do("key", backend.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert len(group) == 1
+        backend.release.set()
+        results = await asyncio.gather(*callers)
+        assert backend.calls == 1
+        assert all(result is results[0] for result in results)
+        assert len(group) == 0
+    
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        group = SingleFlight()
+        backend = Backend()
+        backend.release.set()
+        await asyncio.gather(group.do("a", backend.fetch), group.do("b", backend.fetch))
+        assert backend.calls == 2
+    
+    asyncio.run(scenario())
+
+
+def test_error_is_shared_and_not_cached():
+    async def scenario():
+        group = SingleFlight()
+        backend = Backend(error=ValueError("boom"))
+        callers = [asyncio.create_task(group.do("key", backend.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        backend.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert backend.calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        
+        # The next call after a failure goes to the backend again
+        backend.error = None
+        assert await group.do("key", backend.fetch) == "ok"
+        assert backend.calls == 2
+    
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        group = SingleFlight()
+        backend = Backend()
+        first = asyncio.create_task(group.do("key", backend.fetch))
+        second = asyncio.create_task(group.do("key", backend.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        backend.release.set()
+        assert await second == "ok"
+        assert first.cancelled()
+        assert backend.calls == 1
+    
+    asyncio.run(scenario())
+
+
+def test_call_finishes_when_every_caller_is_cancelled():
+    async def scenario():
+        group = SingleFlight()
+        backend = Backend(error=RuntimeError("late"))
+        caller = asyncio.create_task(group.do("key", backend.fetch))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert len(group) == 1
+        backend.release.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert len(group) == 0
+    
+    asyncio.run(scenario())
+
+
+def test_decorator_coalesces_by_key_func():
+    async def scenario():
+        backend = Backend()
+        
+        @singleflight(lambda lat, lon: (round(lat, 3), round(lon, 3)))
+        async def lookup(lat, lon):
+            return await backend.fetch(lat, lon)
+        
+        callers = [
+            asyncio.create_task(lookup(55.7512, 37.6184)),
+            asyncio.create_task(lookup(55.7514, 37.6181)),
+            asyncio.create_task(lookup(59.9386, 30.3141))
+        ]
+        await asyncio.sleep(0)
+        assert len(lookup.singleflight) == 2
+        backend.release.set()
+        await asyncio.gather(*callers)
+        assert backend.calls == 2
+    
+    asyncio.run(scenario())
\ No newline at end of file
@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_creates_no_files(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run(
+        [sys.executable, "-c", "import bot.app; bot.app.create_dispatcher()"],
+        cwd=tmp_path,
+        env=env,
+        check=True
+    )
+    assert os.listdir(tmp_path) == []
\ No newline at end of file
@@ -0,0 +1,114 @@
+import sqlite3
+import pytest
+from bot.services.video_queue import FAIR_ORDER_SQL, QUEUED, SUBMITTED, SUBMITTING, VideoJobQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def enqueue(queue: VideoJobQueue, chat_id: int) -> int:
+    job_id, _ = queue.enqueue(chat_id, chat_id, {"cid": chat_id}, f"key-{chat_id}")
+    return job_id
+
+
+def fair_order(queue: VideoJobQueue):
+    return [row[0] for row in queue._conn.execute(FAIR_ORDER_SQL, queue._fair_order_params())]
+
+
+def expire_leases(queue: VideoJobQueue):
+    queue._conn.execute("UPDATE video_jobs SET lease_until = 0 WHERE lease_until IS NOT NULL")
+
+
+def test_fair_order_interleaves_chats(path):
+    queue = VideoJobQueue(path, workers=1)
+    a1, a2, a3 = (enqueue(queue, 1) for _ in range(3))
+    b1 = enqueue(queue, 2)
+    c1 = enqueue(queue, 3)
+    assert fair_order(queue) == [a1, b1, c1, a2, a3]
+    assert queue.position(c1) == 2
+
+
+def test_fair_order_counts_running_jobs(path):
+    queue = VideoJobQueue(path, workers=1)
+    a1, a2 = enqueue(queue, 1), enqueue(queue, 1)
+    b1 = enqueue(queue, 2)
+    queue.update(a1, status=SUBMITTED)
+    # Chat 1 already has a job running, so chat 2 goes first
+    assert fair_order(queue) == [b1, a2]
+
+
+def test_claim_marks_submitting_in_fair_order(path):
+    queue = VideoJobQueue(path, workers=1)
+    a1, a2 = enqueue(queue, 1), enqueue(queue, 1)
+    b1 = enqueue(queue, 2)
+    claimed = [queue._claim()["id"] for _ in range(3)]
+    assert claimed == [a1, b1, a2]
+    assert queue._claim() is None
+    assert queue.find_active(1, "key-1")["status"] == SUBMITTING
+
+
+def test_only_one_process_claims_a_job(path):
+    first = VideoJobQueue(path, workers=1)
+    second = VideoJobQueue(path, workers=1)
+    job_id = enqueue(first, 1)
+    assert first._claim()["id"] == job_id
+    assert second._claim() is None
+
+
+def test_submitted_job_is_not_shared_while_leased(path):
+    first = VideoJobQueue(path, workers=1)
+    second = VideoJobQueue(path, workers=1)
+    job_id = enqueue(first, 1)
+    first._claim()
+    first.update(job_id, status=SUBMITTED, task_id="task")
+    assert second._claim() is None
+    
+    # The owner died: its lease runs out and another process resumes polling
+    expire_leases(first)
+    job = second._claim()
+    assert job["id"] == job_id
+    assert job["status"] == SUBMITTED
+    assert job["owner"] == second.owner
+    assert not first._renew(job_id)
+
+
+def test_released_job_is_resumed_at_once(path):
+    first = VideoJobQueue(path, workers=1)
+    second = VideoJobQueue(path, workers=1)
+    job_id = enqueue(first, 1)
+    first._claim()
+    first.update(job_id, status=SUBMITTED, task_id="task")
+    first._release(job_id)
+    assert second._claim()["id"] == job_id
+
+
+def test_expired_submitting_job_is_retried(path):
+    first = VideoJobQueue(path, workers=1)
+    second = VideoJobQueue(path, workers=1)
+    job_id = enqueue(first, 1)
+    first._claim()
+    expire_leases(first)
+    job = second._claim()
+    assert job["id"] == job_id
+    assert job["status"] == SUBMITTING
+
+
+def test_old_queue_file_gains_lease_columns(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE video_jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+        "user_id INTEGER, photo TEXT NOT NULL, cache_key TEXT NOT NULL, status TEXT NOT NULL, "
+        "task_id TEXT, status_message_id INTEGER, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO video_jobs (chat_id, photo, cache_key, status, created_at, updated_at) "
+        "VALUES (1, '{}', 'key', ?, 0, 0)",
+        (QUEUED,)
+    )
+    conn.commit()
+    conn.close()
+    
+    queue = VideoJobQueue(path, workers=1)
+    assert queue._claim()["status"] == SUBMITTING
\ No newline at end of file
@@ -0,0 +1,149 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from bot.webhook import BoundedRequestHandler, UpdateSpool
+
+SECRET = "test-secret"
+
+
+def make_update(update_id: int, text: str = "/start") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1_700_000_000,
+            "chat": {"id": 10, "type": "private"},
+            "from": {"id": 10, "is_bot": False, "first_name": "Test"},
+            "text": text
+        }
+    }
+
+
+class Recorder:
+    """Dispatcher with one message handler that can be held"""
+    
+    def __init__(self):
+        self.handled = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.dispatcher = Dispatcher()
+        self.dispatcher.message.register(self.on_message)
+    
+    async def on_message(self, message: Message):
+        await self.release.wait()
+        self.handled.append(message.message_id)
+
+
+def make_handler(recorder: Recorder, bot: Bot, spool: UpdateSpool, max_pending: int = 10) -> BoundedRequestHandler:
+    return BoundedRequestHandler(
+        recorder.dispatcher,
+        bot,
+        secret_token=SECRET,
+        concurrency=2,
+        max_pending=max_pending,
+        spool=spool
+    )
+
+
+async def wait_for_tasks(handler: BoundedRequestHandler):
+    await asyncio.wait_for(asyncio.gather(*handler._background_feed_update_tasks), timeout=5)
+
+
+def test_spool_keeps_updates_across_reopening(tmp_path):
+    path = str(tmp_path / "spool.sqlite3")
+    spool = UpdateSpool(path)
+    spool.add(make_update(2))
+    spool.add(make_update(1))
+    spool.add(make_update(3))
+    spool.remove(3)
+    spool.close()
+    
+    spool = UpdateSpool(path)
+    assert [update["update_id"] for update in spool.pending()] == [1, 2]
+    spool.close()
+
+
+def test_updates_are_spooled_until_handled(tmp_path):
+    async def scenario():
+        recorder = Recorder()
+        recorder.release.clear()
+        bot = Bot("1:test")
+        spool = UpdateSpool(str(tmp_path / "spool.sqlite3"))
+        app = web.Application()
+        handler = make_handler(recorder, bot, spool)
+        handler.register(app, path="/webhook")
+        
+        async with TestClient(TestServer(app)) as client:
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            response = await client.post("/webhook", json=make_update(1), headers=headers)
+            assert response.status == 200
+            assert [update["update_id"] for update in spool.pending()] == [1]
+            
+            recorder.release.set()
+            await wait_for_tasks(handler)
+            assert recorder.handled == [1]
+            assert spool.pending() == []
+        
+        spool.close()
+        await bot.session.close()
+    
+    asyncio.run(scenario())
+
+
+def test_secret_is_checked_before_backpressure(tmp_path):
+    async def scenario():
+        bot = Bot("1:test")
+        spool = UpdateSpool(str(tmp_path / "spool.sqlite3"))
+        app = web.Application()
+        handler = make_handler(Recorder(), bot, spool)
+        handler.register(app, path="/webhook")
+        handler.accepting = False
+        
+        async with TestClient(TestServer(app)) as client:
+            forged = await client.post("/webhook", json=make_update(1), headers={
+                "X-Telegram-Bot-Api-Secret-Token": "wrong"
+            })
+            assert forged.status == 401
+            busy = await client.post("/webhook", json=make_update(1), headers={
+                "X-Telegram-Bot-Api-Secret-Token": SECRET
+            })
+            assert busy.status == 503
+        
+        assert spool.pending() == []
+        spool.close()
+        await bot.session.close()
+    
+    asyncio.run(scenario())
+
+
+def test_drain_timeout_leaves_updates_for_replay(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "spool.sqlite3")
+        bot = Bot("1:test")
+        
+        # First run: the handler is stuck when shutdown begins
+        recorder = Recorder()
+        recorder.release.clear()
+        spool = UpdateSpool(path)
+        spool.add(make_update(5))
+        spool.add(make_update(6))
+        handler = make_handler(recorder, bot, spool)
+        assert handler.replay(bot) == 2
+        await handler.drain(timeout=0.05)
+        assert recorder.handled == []
+        spool.close()
+        
+        # Next start replays what the drain cut off
+        recorder = Recorder()
+        spool = UpdateSpool(path)
+        handler = make_handler(recorder, bot, spool)
+        assert handler.replay(bot) == 2
+        await wait_for_tasks(handler)
+        assert sorted(recorder.handled) == [5, 6]
+        assert spool.pending() == []
+        spool.close()
+        await bot.session.close()
+    
+    asyncio.run(scenario())
\ No newline at end of file